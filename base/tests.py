@@ -1,7 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from context_managers import query_stats
+
+from django.db import connection
 from django.test import TestCase
 
 from django.urls.base import reverse
 
+import identity_map as identity_map_module
+import parallelism
+from identity_map import identity_map, writing, get_instance, get_instances
+from organization.models.organization import Organization
+from unit.models import WorldUnit
+from world.models.geography import World, Tile, Settlement
+
 
 class HomepageTestCase(TestCase):
     fixtures = ['simple_world']
@@ -21,3 +34,142 @@ class HomepageTestCase(TestCase):
         self.assertEqual(response.redirect_chain[0][1], 302)
         self.assertEqual(
             response.redirect_chain[0][0], reverse('account:home'))
+
+
+def square(x):
+    return x * x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError("three")
+    return x
+
+
+def select_one(x):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return x
+
+
+def bypasses_organization_lookups(x):
+    current_map = identity_map_module._active_map()
+    return current_map is not None and \
+        current_map.bypassed['organization_violence_monopoly'] > 0
+
+
+class ParallelTestCase(TestCase):
+    def test_serial_results_keep_order(self):
+        self.assertEqual(
+            parallelism.parallel(square, [3, 1, 2], weight=lambda x: x),
+            [9, 1, 4]
+        )
+
+    @mock.patch('parallelism.parallelism_enabled', return_value=True)
+    def test_pool_results_keep_order(self, _):
+        with parallelism.worker_pool() as pool:
+            self.assertIsNotNone(pool)
+            self.assertEqual(
+                parallelism.parallel(square, [3, 1, 2], weight=lambda x: x),
+                [9, 1, 4]
+            )
+            with parallelism.worker_pool() as nested_pool:
+                self.assertIs(nested_pool, pool)
+        self.assertIsNone(parallelism._pool)
+
+    @mock.patch('parallelism.parallelism_enabled', return_value=True)
+    def test_worker_exception_is_raised(self, _):
+        with self.assertRaises(ValueError):
+            parallelism.parallel(fail_on_three, range(5))
+
+    @mock.patch('parallelism.parallelism_enabled', return_value=True)
+    def test_worker_queries_are_counted(self, _):
+        with query_stats() as stats:
+            parallelism.parallel(select_one, range(3))
+        self.assertEqual(stats.query_count, 3)
+
+
+class IdentityMapTestCase(TestCase):
+    fixtures = ['simple_world']
+
+    def test_lookups_are_memoized(self):
+        world = World.objects.get(id=2)
+        unit = WorldUnit.objects.get(id=1)
+        with identity_map():
+            barbarians = world.get_barbaric_state()
+            state = unit.get_violence_monopoly()
+            with self.assertNumQueries(0):
+                self.assertEqual(world.get_barbaric_state(), barbarians)
+                self.assertEqual(unit.get_violence_monopoly(), state)
+            self.assertIs(get_instance(World, 2), get_instance(World, 2))
+
+    def test_memoized_results_are_copies(self):
+        world = World.objects.get(id=2)
+        with identity_map():
+            barbarians = world.get_barbaric_state()
+            barbarians.name = "Changed by a caller"
+            with self.assertNumQueries(0):
+                self.assertNotEqual(
+                    world.get_barbaric_state().name, "Changed by a caller")
+
+    def test_instance_maps(self):
+        tile = Tile.objects.get(id=105)
+        settlement_ids = sorted(s.id for s in tile.settlement_set.all())
+        with identity_map():
+            settlements = tile.get_settlements()
+            mapped_tile = get_instance(Tile, 105)
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    [s.id for s in settlements], settlement_ids)
+                self.assertEqual(
+                    get_instances(Settlement, settlement_ids), settlements)
+                for settlement, same_settlement in zip(
+                        settlements, tile.get_settlements()):
+                    self.assertIs(settlement, same_settlement)
+                self.assertIs(get_instance(Tile, 105), mapped_tile)
+            with writing({'tile'}):
+                with self.assertNumQueries(2):
+                    self.assertIsNot(
+                        get_instance(Tile, 105), get_instance(Tile, 105))
+
+    def test_threads_of_later_stages_get_their_own_instances(self):
+        # Thread idents of finished threads are usually reused by the
+        # threads started next.
+        def in_new_thread(function):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(function).result()
+
+        with identity_map(), mock.patch.object(
+                Tile.objects, 'in_bulk',
+                side_effect=lambda pks: {pk: Tile(id=pk) for pk in pks}):
+            first = in_new_thread(lambda: get_instance(Tile, 105))
+            second = in_new_thread(lambda: get_instance(Tile, 105))
+            self.assertIsNot(first, second)
+            self.assertIsNot(get_instance(Tile, 105), first)
+
+    def test_writes_invalidate_lookups(self):
+        kingdom = Organization.objects.get(id=101)
+        king = Organization.objects.get(id=102)
+        with identity_map():
+            self.assertEqual(king.get_violence_monopoly(), kingdom)
+            with writing({'organization'}):
+                kingdom.leader = None
+                kingdom.save()
+                self.assertIsNone(king.get_violence_monopoly())
+            self.assertIsNone(king.get_violence_monopoly())
+            with writing({'election'}):
+                with self.assertNumQueries(0):
+                    self.assertIsNone(king.get_violence_monopoly())
+
+    @mock.patch('parallelism.parallelism_enabled', return_value=True)
+    def test_workers_bypass_the_same_lookups(self, _):
+        with identity_map():
+            self.assertEqual(
+                parallelism.parallel(bypasses_organization_lookups, [1]),
+                [False]
+            )
+            with writing({'organization'}):
+                self.assertEqual(
+                    parallelism.parallel(bypasses_organization_lookups, [1]),
+                    [True]
+                )
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from battle.battle_init import start_battle
-from battle.battle_tick import battle_tick, battle_turn
+from battle.battle_simulation import battle_turn
+from battle.battle_tick import battle_tick
 from battle.models import Battle, BattleFormation
 
 admin.site.register(BattleFormation)
@@ -0,0 +1,92 @@
+from django.db import transaction
+
+from battle.battle_renderer import get_battle_replay, update_battle_replay
+from battle.models import Battle, BattleReplay, BattleSideSummary, \
+    BattleTurn, BattleCharacterInTurn, BattleUnitInTurn, \
+    BattleContuberniumInTurn, BattleSoldierInTurn
+
+SUMMARY_FIELDS = {
+    BattleSoldierInTurn.UNINJURED: 'uninjured',
+    BattleSoldierInTurn.LIGHT_WOUND: 'light_wounds',
+    BattleSoldierInTurn.MEDIUM_WOUND: 'medium_wounds',
+    BattleSoldierInTurn.HEAVY_WOUND: 'heavy_wounds',
+    BattleSoldierInTurn.DEAD: 'dead',
+}
+
+
+class BattleNotFinishedException(Exception):
+    pass
+
+
+def battles_to_archive():
+    return Battle.objects.filter(current=False, started=True).exclude(
+        battlereplay__archived=True
+    )
+
+
+@transaction.atomic
+def archive_battle(battle: Battle) -> BattleReplay:
+    """
+    Compacts a finished battle: its replay is brought up to date and kept
+    as the only record of the battle's course, the final wound statuses of
+    each side are stored in a BattleSideSummary, and all the turn rows of
+    the battle are deleted. The battlefield view keeps working from the
+    replay.
+    """
+    if battle.current:
+        raise BattleNotFinishedException(
+            "Battle {} is not finished!".format(battle.id)
+        )
+
+    replay = get_battle_replay(battle)
+    if replay is not None and replay.archived:
+        return replay
+
+    replay = update_battle_replay(battle)
+
+    create_side_summaries(battle)
+    delete_turns(battle)
+
+    replay.archived = True
+    replay.save()
+    return replay
+
+
+def create_side_summaries(battle: Battle):
+    # Soldier rows are only written when the state changes, so the last
+    # row of each soldier holds its final wound status
+    final_states = {}
+    for battle_soldier_id, side_id, wound_status in \
+            BattleSoldierInTurn.objects.filter(
+                battle_turn__battle=battle
+            ).order_by('battle_turn__num').values_list(
+                'battle_soldier_id',
+                'battle_soldier__battle_contubernium__battle_unit__'
+                'battle_side_id',
+                'wound_status'
+            ):
+        final_states[battle_soldier_id] = (side_id, wound_status)
+
+    summaries = {
+        side.id: BattleSideSummary(battle_side=side)
+        for side in battle.battleside_set.all()
+    }
+    for side_id, wound_status in final_states.values():
+        field = SUMMARY_FIELDS[wound_status]
+        summary = summaries[side_id]
+        setattr(summary, field, getattr(summary, field) + 1)
+    BattleSideSummary.objects.filter(battle_side__battle=battle).delete()
+    BattleSideSummary.objects.bulk_create(summaries.values())
+
+
+def delete_turns(battle: Battle):
+    # Children first, so that each delete finds nothing left to cascade to
+    BattleSoldierInTurn.objects.filter(battle_turn__battle=battle).delete()
+    contubernia = BattleContuberniumInTurn.objects.filter(
+        battle_turn__battle=battle)
+    contubernia.update(contubernium_attacked_this_turn=None)
+    contubernia.delete()
+    BattleUnitInTurn.objects.filter(battle_turn__battle=battle).delete()
+    BattleCharacterInTurn.objects.filter(
+        battle_turn__battle=battle).delete()
+    BattleTurn.objects.filter(battle=battle).delete()
@@ -1,8 +1,10 @@
 import math
+from collections import defaultdict
 
 from django.db import transaction
-from django.db.models.aggregates import Avg
 
+from battle.battle_renderer import update_battle_replay
+from battle.battle_simulation import bulk_create_with_ids, BULK_BATCH_SIZE
 from battle.models import BattleFormation, BattleUnit, BattleContubernium, \
     BattleSoldier, BattleOrganization, \
     BattleSide, BattleCharacter, Coordinates, BattleTurn, \
@@ -12,21 +14,54 @@ from unit.models import WorldUnit
 
 
 def create_contubernia(unit: BattleUnit):
-    soldiers = unit.world_unit.get_fighting_soldiers()
-    num_contubernia = math.ceil(soldiers.count() / 8)
-    rest = soldiers.count() % 8
+    """
+    Splits the fighting soldiers of the unit in contubernia of 7 or 8, in
+    memory. Each contubernium keeps the NPCs of its soldiers in world_npcs
+    until save_contubernia() is called.
+    """
+    soldiers = list(unit.world_unit.get_fighting_soldiers())
+    num_contubernia = math.ceil(len(soldiers) / 8)
+    rest = len(soldiers) % 8
     pointer = 0
+    result = []
     for i in range(num_contubernia):
         start = pointer
         end = pointer + (8 if i < rest else 7)
-        contubernium_soldiers = soldiers[start:end]
-        contubernium = BattleContubernium.objects.create(battle_unit=unit)
-        for soldier in contubernium_soldiers:
-            BattleSoldier.objects.create(
-                battle_contubernium=contubernium,
-                world_npc=soldier
-            )
+        contubernium = BattleContubernium(battle_unit=unit)
+        contubernium.world_npcs = soldiers[start:end]
+        result.append(contubernium)
         pointer = end
+    return result
+
+
+def save_contubernia(battle: Battle, contubernia):
+    """
+    Inserts positioned contubernia and their soldiers with a bulk insert
+    per model. The soldiers of each contubernium are left in its soldiers
+    attribute.
+    """
+    bulk_create_with_ids(
+        BattleContubernium, contubernia,
+        BattleContubernium.objects.filter(
+            battle_unit__battle_side__battle=battle),
+        ('battle_unit_id', 'starting_x_pos', 'starting_z_pos')
+    )
+    for contubernium in contubernia:
+        contubernium.soldiers = [
+            BattleSoldier(battle_contubernium=contubernium, world_npc=npc)
+            for npc in contubernium.world_npcs
+        ]
+    bulk_create_with_ids(
+        BattleSoldier,
+        [
+            soldier
+            for contubernium in contubernia
+            for soldier in contubernium.soldiers
+        ],
+        BattleSoldier.objects.filter(
+            battle_contubernium__battle_unit__battle_side__battle=battle),
+        ('world_npc_id', )
+    )
 
 
 @transaction.atomic
@@ -70,14 +105,16 @@ def initialize_from_conflict(battle, conflict, tile):
             )
 
 
-def initialize_side_positioning(side: BattleSide):
+def initialize_side_positioning(side: BattleSide, units, contubernia_by_unit):
     formation_settings = side.get_formation()
-    if formation_settings.formation == BattleFormation.LINE:
-        formation = LineFormation(side, formation_settings)
-    else:
+    try:
+        formation_class = FORMATIONS[formation_settings.formation]
+    except KeyError:
         raise Exception(
             "Formation {} not known".format(formation_settings.formation)
         )
+    formation = formation_class(
+        side, formation_settings, units, contubernia_by_unit)
     formation.make_formation()
 
     for coords, contub in formation.output_formation():
@@ -85,25 +122,32 @@ def initialize_side_positioning(side: BattleSide):
         contub.z_offset_to_formation = coords.z
         contub.starting_x_pos = coords.x if side.z else -coords.x
         contub.starting_z_pos = coords.z + 10 if side.z else -coords.z - 10
-        contub.save()
-
-    for unit in side.battleunit_set.all()\
-            .annotate(avg_x=Avg('battlecontubernium__starting_x_pos'))\
-            .annotate(avg_z=Avg('battlecontubernium__starting_z_pos')):
-        unit.starting_x_pos = math.floor(unit.avg_x)
-        unit.starting_z_pos = math.floor(unit.avg_z)
-        unit.save()
-
-        set_contubernia_starting_pos(unit)
 
-
-def set_contubernia_starting_pos(unit: BattleUnit):
-    for contub in unit.battlecontubernium_set.all():
+    units = [unit for unit in units if contubernia_by_unit[unit.id]]
+    for unit in units:
+        set_unit_starting_pos(unit, contubernia_by_unit[unit.id])
+    BattleUnit.objects.bulk_update(
+        units, ['starting_x_pos', 'starting_z_pos'])
+
+
+def set_unit_starting_pos(unit: BattleUnit, contubernia):
+    """
+    Places the unit at the average position of its contubernia, and sets
+    the offsets of the contubernia to it.
+    """
+    unit.starting_x_pos = math.floor(
+        sum(contub.starting_x_pos for contub in contubernia) /
+        len(contubernia)
+    )
+    unit.starting_z_pos = math.floor(
+        sum(contub.starting_z_pos for contub in contubernia) /
+        len(contubernia)
+    )
+    for contub in contubernia:
         contub.x_offset_to_unit = contub.starting_x_pos - \
                                   unit.starting_x_pos
         contub.z_offset_to_unit = contub.starting_z_pos - \
                                   unit.starting_z_pos
-        contub.save()
 
 
 class Line:
@@ -133,8 +177,8 @@ class Line:
         else:
             self.push_contubernium_on_right_side(contubernium)
 
-    def push_unit(self, unit, side):
-        for contubernium in unit.battlecontubernium_set.all():
+    def push_unit(self, contubernia, side):
+        for contubernium in contubernia:
             self.push_contubernium(contubernium, side)
 
     @property
@@ -142,84 +186,102 @@ class Line:
         return len(self.columns)
 
 
-class LineFormation:
-    def __init__(self, battle_side, formation_object):
+BATTLE_LINES = range(5)
+# Units of a battle line are pushed from the center outwards
+SIDE_POSITIONS = [0, 1, -1, 2, -2, 3, -3, -4, 4, -5, 5]
+
+
+class Formation:
+    """
+    Places the contubernia of a battle side. Each formation has a slot
+    template, computed once per formation, that assigns every battle line
+    and side position to one of its Lines and the side the units are pushed
+    from. make_formation() groups the units of the side by slot and fills
+    the Lines in a single pass; output_formation() places the Lines.
+    """
+    # Used by formations that have no element size setting
+    default_element_size = 2
+    slot_template = None
+
+    def __init__(self, battle_side, formation_object, units,
+                 contubernia_by_unit):
         self.formation_object = formation_object
         self.battle_side = battle_side
-        self.main_lines = [
-            self.new_line(), self.new_line(), self.new_line(),
-            self.new_line(), self.new_line(),
-        ]
-        self.flanks = [
-            [self.new_line(), self.new_line(), self.new_line(),
-             self.new_line(), self.new_line(), ],
-            [self.new_line(), self.new_line(), self.new_line(),
-             self.new_line(), self.new_line(), ],
-        ]
-        self.far_flanks = [
-            [self.new_line(), self.new_line(), self.new_line(),
-             self.new_line(), self.new_line(), ],
-            [self.new_line(), self.new_line(), self.new_line(),
-             self.new_line(), self.new_line(), ],
-        ]
+        self.units = units
+        self.contubernia_by_unit = contubernia_by_unit
+        self.element_size = formation_object.element_size or \
+            self.default_element_size
+        self.spacing = formation_object.spacing or 0
+        self.lines = defaultdict(self.new_line)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.slot_template = {}
+        for line_index in BATTLE_LINES:
+            for side_index in SIDE_POSITIONS:
+                cls.slot_template[(line_index, side_index)] = (
+                    len(cls.slot_template),
+                ) + cls.slot(line_index, side_index)
+
+    @staticmethod
+    def slot(line_index, side_index):
+        """
+        Returns the key of the Line the units in this battle line and side
+        position go to, and the side they are pushed from.
+        """
+        raise NotImplementedError
 
     def new_line(self):
-        return Line(self.formation_object.element_size)
+        return Line(self.element_size)
+
+    def unit_slot(self, unit):
+        return self.slot_template[
+            (unit.world_unit.battle_line, unit.world_unit.battle_side_pos)
+        ]
 
     def make_formation(self):
-        for line_index in range(5):
-            for side_index in [0, 1, -1, 2, -2, 3, -3]:
-                units = self.get_battle_units_by_battle_settings(
-                    line_index, side_index
-                )
-                for unit in units:
-                    self.main_lines[line_index].push_unit(unit, side_index)
-
-            for side_index in [-4, 4]:
-                far_flank_index = 0 if side_index < 0 else 1
-                units = self.get_battle_units_by_battle_settings(
-                    line_index, side_index
-                )
-                for unit in units:
-                    self.flanks[far_flank_index][line_index].push_unit(unit, 0)
-
-            for side_index in [-5, 5]:
-                far_flank_index = 0 if side_index < 0 else 1
-                units = self.get_battle_units_by_battle_settings(
-                    line_index, side_index
-                )
-                for unit in units:
-                    self.far_flanks[far_flank_index][line_index].push_unit(
-                        unit, 0
-                    )
+        for unit in sorted(
+                self.units,
+                key=lambda unit: (self.unit_slot(unit)[0], unit.id)
+        ):
+            _, line_key, side = self.unit_slot(unit)
+            self.lines[line_key].push_unit(
+                self.contubernia_by_unit[unit.id], side)
+
+    def output_formation(self):
+        raise NotImplementedError
 
-    def get_battle_units_by_battle_settings(self, line_index, side_index):
-        return BattleUnit.objects.filter(
-            battle_side=self.battle_side,
-            world_unit__battle_line=line_index,
-            world_unit__battle_side_pos=side_index
-        )
+
+class LineFormation(Formation):
+    @staticmethod
+    def slot(line_index, side_index):
+        if side_index in (-4, 4):
+            return ('flank', 0 if side_index < 0 else 1, line_index), 0
+        if side_index in (-5, 5):
+            return ('far_flank', 0 if side_index < 0 else 1, line_index), 0
+        return ('main', line_index), side_index
 
     def output_formation(self):
-        widest_main_line_width = max([line.width for line in self.main_lines])
-        full_size_of_line = (self.formation_object.element_size +
-                             self.formation_object.spacing)
-        flanks_x_offset = round(widest_main_line_width / 2) + \
-                                self.formation_object.spacing
+        main_lines = [self.lines[('main', line_index)]
+                      for line_index in BATTLE_LINES]
+        widest_main_line_width = max([line.width for line in main_lines])
+        full_size_of_line = self.element_size + self.spacing
+        flanks_x_offset = round(widest_main_line_width / 2) + self.spacing
         min_x = 0
         max_x = 0
 
-        for line_index, line in enumerate(self.main_lines):
+        for line_index, line in enumerate(main_lines):
             for col_index, column in enumerate(line.columns):
                 for contub_index, contub in enumerate(column):
                     x = col_index - round(line.width / 2)
                     z = line_index * full_size_of_line + contub_index
                     yield Coordinates(x, z), contub
 
-        for flank_index, flank in enumerate(self.flanks):
+        for flank_index in (0, 1):
             x_multiplier = -1 if flank_index == 0 else 1
             x_offset = flanks_x_offset * x_multiplier
-            for line_index, line in enumerate(flank):
+            for line_index in BATTLE_LINES:
+                line = self.lines[('flank', flank_index, line_index)]
                 for col_index, column in enumerate(line.columns):
                     for contub_index, contub in enumerate(column):
                         x = x_offset + col_index * x_multiplier
@@ -228,14 +290,15 @@ class LineFormation:
                         max_x = max(x, max_x)
                         yield Coordinates(x, z), contub
 
-        for far_flank_index, far_flank in enumerate(self.far_flanks):
+        for far_flank_index in (0, 1):
             if far_flank_index == 0:
                 x_multiplier = -1
-                x_offset = min_x - self.formation_object.spacing * 2
+                x_offset = min_x - self.spacing * 2
             else:
                 x_multiplier = 1
-                x_offset = max_x + self.formation_object.spacing * 2
-            for line_index, line in enumerate(far_flank):
+                x_offset = max_x + self.spacing * 2
+            for line_index in BATTLE_LINES:
+                line = self.lines[('far_flank', far_flank_index, line_index)]
                 for col_index, column in enumerate(line.columns):
                     for contub_index, contub in enumerate(column):
                         x = x_offset + col_index * x_multiplier
@@ -243,64 +306,219 @@ class LineFormation:
                         yield Coordinates(x, z), contub
 
 
-def initialize_battle_positioning(battle):
+class ColumnFormation(Formation):
+    """
+    Every battle line is a block element_size contubernia wide, one behind
+    the other. The columns of the Lines are used as ranks.
+    """
+    @staticmethod
+    def slot(line_index, side_index):
+        return line_index, 1
+
+    def output_formation(self):
+        z_offset = 0
+        for line_index in BATTLE_LINES:
+            line = self.lines[line_index]
+            for rank_index, rank in enumerate(line.columns):
+                for file_index, contub in enumerate(rank):
+                    x = file_index - self.element_size // 2
+                    z = z_offset + rank_index
+                    yield Coordinates(x, z), contub
+            if line.width:
+                z_offset += line.width + self.spacing
+
+
+class SquareFormation(Formation):
+    """
+    A hollow square: the first two battle lines form the front face, the
+    other ones the rear face, and the flanks the left and right faces. The
+    hollow is as wide as the widest face, and at least as wide as the
+    spacing.
+    """
+    @staticmethod
+    def slot(line_index, side_index):
+        if side_index <= -4:
+            return 'left', 0
+        if side_index >= 4:
+            return 'right', 0
+        if line_index <= 1:
+            return 'front', side_index
+        return 'rear', side_index
+
+    def output_formation(self):
+        faces = [self.lines[face]
+                 for face in ('front', 'rear', 'left', 'right')]
+        hollow_size = max([face.width for face in faces] + [self.spacing])
+        hollow_min_x = -(hollow_size // 2)
+        hollow_min_z = self.element_size
+
+        for face_z, face in ((0, self.lines['front']),
+                             (hollow_min_z + hollow_size, self.lines['rear'])):
+            for col_index, column in enumerate(face.columns):
+                for contub_index, contub in enumerate(column):
+                    x = col_index - round(face.width / 2)
+                    z = face_z + contub_index
+                    yield Coordinates(x, z), contub
+
+        for x_multiplier, face_x, face in (
+                (-1, hollow_min_x - 1, self.lines['left']),
+                (1, hollow_min_x + hollow_size, self.lines['right'])
+        ):
+            for col_index, column in enumerate(face.columns):
+                for contub_index, contub in enumerate(column):
+                    x = face_x + contub_index * x_multiplier
+                    z = hollow_min_z + col_index
+                    yield Coordinates(x, z), contub
+
+
+class WedgeFormation(Formation):
+    """
+    Every battle line is a Line whose columns step back the further they
+    are from the center, forming a wedge pointing at the enemy. Battle lines
+    are placed one behind the other.
+    """
+    @staticmethod
+    def slot(line_index, side_index):
+        return line_index, side_index
+
+    @staticmethod
+    def column_step_back(distance_to_center, max_distance_to_center):
+        return distance_to_center
+
+    def output_formation(self):
+        z_offset = 0
+        for line_index in BATTLE_LINES:
+            line = self.lines[line_index]
+            if not line.width:
+                continue
+            center = round(line.width / 2)
+            max_distance_to_center = max(center, line.width - 1 - center)
+            for col_index, column in enumerate(line.columns):
+                x = col_index - center
+                step_back = self.column_step_back(
+                    abs(x), max_distance_to_center)
+                for contub_index, contub in enumerate(column):
+                    z = z_offset + step_back + contub_index
+                    yield Coordinates(x, z), contub
+            z_offset += max_distance_to_center + self.element_size + \
+                self.spacing
+
+
+class InvertedWedgeFormation(WedgeFormation):
+    """
+    A wedge whose columns step forward the further they are from the
+    center, so its flanks reach the enemy first.
+    """
+    @staticmethod
+    def column_step_back(distance_to_center, max_distance_to_center):
+        return max_distance_to_center - distance_to_center
+
+
+FORMATIONS = {
+    BattleFormation.LINE: LineFormation,
+    BattleFormation.COLUMN: ColumnFormation,
+    BattleFormation.SQUARE: SquareFormation,
+    BattleFormation.WEDGE: WedgeFormation,
+    BattleFormation.IWEDGE: InvertedWedgeFormation,
+}
+
+
+def initialize_battle_positioning(battle, units, contubernia_by_unit):
     for side in battle.battleside_set.all():
-        initialize_side_positioning(side)
+        initialize_side_positioning(
+            side,
+            [unit for unit in units if unit.battle_side_id == side.id],
+            contubernia_by_unit
+        )
 
 
-def generate_in_turn_objects(battle):
+def generate_in_turn_objects(battle, units, contubernia_by_unit):
     turn = BattleTurn.objects.create(
         battle=battle,
         num=0
     )
-    for side in battle.battleside_set.all():
-        for organization in side.battleorganization_set.all():
-            for character in organization.battlecharacter_set.all():
-                bcit = BattleCharacterInTurn.objects.create(
-                    battle_character=character,
-                    battle_turn=turn
-                )
-            for unit in organization.battleunit_set.all():
-                generate_in_turn_objects_for_unit(turn, unit)
-    for barbarian_unit in BattleUnitInTurn.objects.filter(
-        battle_unit__owner=None,
-        battle_turn=turn
-    ):
-        barbarian_unit.order = barbarian_unit.battle_unit.get_order()
-        barbarian_unit.save()
-
-
-def generate_in_turn_objects_for_unit(turn: BattleTurn, unit: BattleUnit):
-    if unit.world_unit.owner_character:
-        owner_in_turn = BattleCharacterInTurn.objects.get(
-            battle_character=unit.owner,
-            battle_turn=turn
+    characters_in_turn = [
+        BattleCharacterInTurn(battle_character=character, battle_turn=turn)
+        for character in BattleCharacter.objects.filter(
+            battle_organization__side__battle=battle)
+    ]
+    bulk_create_with_ids(
+        BattleCharacterInTurn, characters_in_turn,
+        BattleCharacterInTurn.objects.filter(battle_turn=turn),
+        ('battle_character_id', )
+    )
+
+    # Every soldier starts uninjured, so all of them count
+    manpower = {side.id: 0 for side in battle.battleside_set.all()}
+    for unit in units:
+        manpower[unit.battle_side_id] += sum(
+            len(contubernium.soldiers)
+            for contubernium in contubernia_by_unit[unit.id]
         )
-    else:
-        owner_in_turn = None
-    buit = BattleUnitInTurn.objects.create(
-        battle_unit=unit,
-        battle_character_in_turn=owner_in_turn,
-        battle_turn=turn,
-        x_pos=unit.starting_x_pos,
-        z_pos=unit.starting_z_pos,
-        order=unit.get_order()
+
+    generate_in_turn_objects_for_units(
+        turn,
+        [
+            (unit, contubernia_by_unit[unit.id], unit.get_order(manpower))
+            for unit in units
+        ],
+        {
+            character_in_turn.battle_character_id: character_in_turn
+            for character_in_turn in characters_in_turn
+        }
     )
-    for contubernium in unit.battlecontubernium_set.all():
-        bcontubit = BattleContuberniumInTurn.objects.create(
-            battle_contubernium=contubernium,
-            battle_unit_in_turn=buit,
+
+
+def generate_in_turn_objects_for_units(turn: BattleTurn, units,
+                                       characters_in_turn):
+    """
+    Creates the rows of the units, contubernia and soldiers in the turn,
+    with a bulk insert per model. units holds (unit, contubernia, order)
+    tuples; characters_in_turn the rows of the owners by BattleCharacter id.
+    """
+    units_in_turn = []
+    contubernia_in_turn = []
+    soldiers_in_turn = []
+    for unit, contubernia, order in units:
+        buit = BattleUnitInTurn(
+            battle_unit=unit,
+            battle_character_in_turn=characters_in_turn.get(unit.owner_id)
+            if unit.world_unit.owner_character_id else None,
             battle_turn=turn,
-            x_pos=contubernium.starting_x_pos,
-            z_pos=contubernium.starting_z_pos,
-            ammo_remaining=unit.world_unit.starting_ammo()
+            x_pos=unit.starting_x_pos,
+            z_pos=unit.starting_z_pos,
+            order=order
         )
-        for soldier in contubernium.battlesoldier_set.all():
-            BattleSoldierInTurn.objects.create(
+        units_in_turn.append(buit)
+        for contubernium in contubernia:
+            bcontubit = BattleContuberniumInTurn(
+                battle_contubernium=contubernium,
+                battle_unit_in_turn=buit,
                 battle_turn=turn,
-                battle_contubernium_in_turn=bcontubit,
-                battle_soldier=soldier
+                x_pos=contubernium.starting_x_pos,
+                z_pos=contubernium.starting_z_pos,
+                ammo_remaining=unit.world_unit.starting_ammo()
             )
+            contubernia_in_turn.append(bcontubit)
+            for soldier in contubernium.soldiers:
+                soldiers_in_turn.append(BattleSoldierInTurn(
+                    battle_turn=turn,
+                    battle_contubernium_in_turn=bcontubit,
+                    battle_soldier=soldier
+                ))
+
+    bulk_create_with_ids(
+        BattleUnitInTurn, units_in_turn,
+        BattleUnitInTurn.objects.filter(battle_turn=turn),
+        ('battle_unit_id', )
+    )
+    bulk_create_with_ids(
+        BattleContuberniumInTurn, contubernia_in_turn,
+        BattleContuberniumInTurn.objects.filter(battle_turn=turn),
+        ('battle_contubernium_id', )
+    )
+    BattleSoldierInTurn.objects.bulk_create(
+        soldiers_in_turn, batch_size=BULK_BATCH_SIZE)
 
 
 def joining_contubernium_position_generator():
@@ -323,7 +541,7 @@ def add_unit_to_battle_in_progress(
                 world_unit.owner_character.location.tile == world_unit.location.tile
             )
         )[0]
-        battle_character_in_turn = BattleCharacterInTurn.objects.get_or_create(
+        BattleCharacterInTurn.objects.get_or_create(
             battle_character=battle_character,
             battle_turn=battle.get_latest_turn()
         )
@@ -338,26 +556,27 @@ def add_unit_to_battle_in_progress(
         name=world_unit.name,
         type=world_unit.type
     )
-    create_contubernia(battle_unit)
+    contubernia = create_contubernia(battle_unit)
 
     position_generator = joining_contubernium_position_generator()
+    occupied = set(BattleContuberniumInTurn.objects.filter(
+        battle_turn=battle.get_latest_turn()
+    ).values_list('x_pos', 'z_pos'))
 
-    for contub in battle_unit.battlecontubernium_set.all():
+    for contub in contubernia:
         coords = next(position_generator)
-        while battle.get_latest_turn().get_contubernium_in_position(coords) is not None:
+        while coords in occupied:
             coords = next(position_generator)
 
         contub.x_offset_to_formation = coords.x
         contub.z_offset_to_formation = coords.z
         contub.starting_x_pos = coords.x if battle_organization.side.z else -coords.x
         contub.starting_z_pos = coords.z + 10 if battle_organization.side.z else -coords.z - 10
-        contub.save()
-
-    battle_unit.starting_x_pos = math.floor(battle_unit.battlecontubernium_set.all().aggregate(Avg('starting_x_pos'))['starting_x_pos__avg'])
-    battle_unit.starting_z_pos = math.floor(battle_unit.battlecontubernium_set.all().aggregate(Avg('starting_z_pos'))['starting_z_pos__avg'])
-    battle_unit.save()
 
-    set_contubernia_starting_pos(battle_unit)
+    if contubernia:
+        set_unit_starting_pos(battle_unit, contubernia)
+        battle_unit.save()
+    save_contubernia(battle, contubernia)
 
 
 class BattleAlreadyStartedException(Exception):
@@ -371,10 +590,19 @@ def start_battle(battle: Battle):
             "Battle {} already started!".format(battle.id)
         )
 
-    for unit in battle.get_units_in_battle().all():
-        create_contubernia(unit)
-    initialize_battle_positioning(battle)
-    generate_in_turn_objects(battle)
+    units = list(battle.get_units_in_battle().select_related(
+        'world_unit__default_battle_orders').order_by('id'))
+    contubernia_by_unit = {
+        unit.id: create_contubernia(unit) for unit in units
+    }
+    initialize_battle_positioning(battle, units, contubernia_by_unit)
+    save_contubernia(battle, [
+        contubernium
+        for unit in units
+        for contubernium in contubernia_by_unit[unit.id]
+    ])
+    generate_in_turn_objects(battle, units, contubernia_by_unit)
 
     battle.started = True
     battle.save()
+    update_battle_replay(battle)
@@ -1,6 +1,14 @@
+import base64
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+from django.db import transaction
 from django.utils.html import conditional_escape
 
-from battle.models import Battle
+from battle.models import Battle, BattleReplay, BattleReplayChunk, \
+    BattleContubernium, BattleCharacterInTurn, BattleUnitInTurn, \
+    BattleContuberniumInTurn
 from finem_imperii.app_settings import BATTlE_TICKS_PER_TURN
 
 
@@ -24,8 +32,6 @@ def render_battle_for_view(battle: Battle):
                         battle_character.character.name),
                     'in_turn': {}
                 }
-                for battle_character_in_turn in battle_character.battlecharacterinturn_set.all():
-                    characters[battle_character.id]['in_turn'][battle_character_in_turn.battle_turn.num] = {}
 
             for battle_unit in battle_organization.battleunit_set.all():
                 units[battle_unit.id] = {
@@ -35,41 +41,12 @@ def render_battle_for_view(battle: Battle):
                     'type': conditional_escape(battle_unit.type),
                     'in_turn': {}
                 }
-                for battle_unit_in_turn in battle_unit.battleunitinturn_set.all():
-                    units[battle_unit.id]['in_turn'][battle_unit_in_turn.battle_turn.num] = {
-                        'x_pos': battle_unit_in_turn.x_pos,
-                        'z_pos': battle_unit_in_turn.z_pos,
-                    }
 
                 for contubernium in battle_unit.battlecontubernium_set.all():
                     contubernia[contubernium.id] = {
                         'unit_id': battle_unit.id,
-                        'in_turn': {}
                     }
 
-                    for contubernium_in_turn in contubernium.battlecontuberniuminturn_set.all():
-                        contubernia[contubernium.id]['in_turn'][contubernium_in_turn.battle_turn.num] = {
-                            'x_pos': contubernium_in_turn.x_pos,
-                            'z_pos': contubernium_in_turn.z_pos,
-                            'ammo_remaining': contubernium_in_turn.ammo_remaining,
-                            'attack_type': conditional_escape(
-                                contubernium_in_turn.attack_type_this_turn),
-                            'attack_target':
-                                contubernium_in_turn.contubernium_attacked_this_turn.battle_contubernium_id
-                                if contubernium_in_turn.contubernium_attacked_this_turn
-                                else None,
-                            'soldiers': []
-                        }
-
-                        for soldier in contubernium_in_turn.battlesoldierinturn_set.all():
-                            contubernia[contubernium.id]['in_turn'][
-                                contubernium_in_turn.battle_turn.num][
-                                'soldiers'].append(
-                                {
-                                    'wound_status': soldier.wound_status
-                                }
-                            )
-
     result = {
         'battle_ticks_per_turn': BATTlE_TICKS_PER_TURN,
         'organizations': organizations,
@@ -79,3 +56,181 @@ def render_battle_for_view(battle: Battle):
         'turn_count': battle.battleturn_set.count(),
     }
     return result
+
+
+def render_battle_turns(battle: Battle, first_turn: int):
+    """
+    The turns of the battle from first_turn on, as a chunk of its replay:
+    the in_turn of the characters and units and the contubernia replay.
+    """
+    characters = defaultdict(lambda: {'in_turn': {}})
+    for battle_character_id, num in BattleCharacterInTurn.objects.filter(
+            battle_turn__battle=battle,
+            battle_turn__num__gte=first_turn
+    ).values_list('battle_character_id', 'battle_turn__num'):
+        characters[battle_character_id]['in_turn'][num] = {}
+
+    units = defaultdict(lambda: {'in_turn': {}})
+    for battle_unit_id, num, x_pos, z_pos in BattleUnitInTurn.objects.filter(
+            battle_turn__battle=battle,
+            battle_turn__num__gte=first_turn
+    ).values_list('battle_unit_id', 'battle_turn__num', 'x_pos', 'z_pos'):
+        units[battle_unit_id]['in_turn'][num] = {
+            'x_pos': x_pos,
+            'z_pos': z_pos,
+        }
+
+    contubernium_ids = sorted(BattleContubernium.objects.filter(
+        battle_unit__battle_side__battle=battle
+    ).values_list('id', flat=True))
+    replay = encode_contubernia_replay(battle, contubernium_ids, first_turn)
+
+    return {
+        'first_turn': first_turn,
+        'last_turn': battle.battleturn_set.count() - 1,
+        'characters': characters,
+        'units': units,
+        'replay': replay,
+    }
+
+
+# x_pos of a contubernium that is not in the battlefield in a turn
+ABSENT = -2 ** 15
+ATTACK_TYPES = [
+    None,
+    BattleContuberniumInTurn.MELEE_ATTACK,
+    BattleContuberniumInTurn.RANGED_ATTACK
+]
+# Little-endian type of every array in the contubernia replay
+REPLAY_ARRAYS = {
+    'x_pos': '<i2',
+    'z_pos': '<i2',
+    'ammo_remaining': '<i2',
+    'attack_type': 'u1',
+    'attack_target': '<i4',
+    'soldier_offsets': '<i4',
+    'soldier_counts': 'u1',
+    'wound_status': 'u1',
+}
+
+
+def encode_array(array, dtype):
+    return base64.b64encode(
+        np.ascontiguousarray(array, dtype=dtype).tobytes()).decode()
+
+
+def decode_array(data, dtype):
+    return np.frombuffer(base64.b64decode(data), dtype=dtype)
+
+
+def encode_contubernia_replay(battle: Battle, contubernium_ids,
+                              first_turn=0):
+    """
+    State of every contubernium in every turn from first_turn on as base64
+    encoded typed arrays. All arrays but wound_status have one row per turn
+    and one column per contubernium, in the order of contubernium_ids; x_pos
+    is ABSENT where the contubernium is not in the battlefield. The wound
+    statuses of the soldiers of a contubernium in a turn are the
+    soldier_counts elements of wound_status starting at soldier_offsets.
+    """
+    turn_count = battle.battleturn_set.filter(num__gte=first_turn).count()
+    index = {
+        contubernium_id: i
+        for i, contubernium_id in enumerate(contubernium_ids)
+    }
+    shape = (turn_count, len(contubernium_ids))
+    arrays = {
+        'x_pos': np.full(shape, ABSENT),
+        'z_pos': np.zeros(shape),
+        'ammo_remaining': np.zeros(shape),
+        'attack_type': np.zeros(shape),
+        'attack_target': np.full(shape, -1),
+        'soldier_counts': np.zeros(shape, dtype=np.int64),
+    }
+
+    for num, contubernium_id, x_pos, z_pos, ammo, attack_type, target_id \
+            in BattleContuberniumInTurn.objects.filter(
+                battle_turn__battle=battle,
+                battle_turn__num__gte=first_turn
+            ).values_list(
+                'battle_turn__num',
+                'battle_contubernium_id',
+                'x_pos',
+                'z_pos',
+                'ammo_remaining',
+                'attack_type_this_turn',
+                'contubernium_attacked_this_turn__battle_contubernium_id'
+            ):
+        row = num - first_turn
+        i = index[contubernium_id]
+        arrays['x_pos'][row, i] = x_pos
+        arrays['z_pos'][row, i] = z_pos
+        arrays['ammo_remaining'][row, i] = ammo
+        arrays['attack_type'][row, i] = ATTACK_TYPES.index(attack_type)
+        if target_id is not None:
+            arrays['attack_target'][row, i] = index[target_id]
+
+    wound_status = []
+    for battle_turn, soldiers in battle.get_soldier_states_by_turn(
+            first_num=first_turn):
+        for battle_soldier_id, soldier in sorted(
+                soldiers.items(),
+                key=lambda item: (
+                    index[item[1].battle_contubernium_id], item[0])
+        ):
+            arrays['soldier_counts'][
+                battle_turn.num - first_turn,
+                index[soldier.battle_contubernium_id]
+            ] += 1
+            wound_status.append(soldier.wound_status)
+    arrays['wound_status'] = wound_status
+    arrays['soldier_offsets'] = (
+        arrays['soldier_counts'].cumsum() -
+        arrays['soldier_counts'].ravel()
+    ).reshape(shape)
+
+    result = {
+        'first_turn': first_turn,
+        'contubernium_ids': contubernium_ids,
+        'attack_types': ATTACK_TYPES,
+    }
+    for name, dtype in REPLAY_ARRAYS.items():
+        result[name] = encode_array(arrays[name], dtype)
+    return result
+
+
+@transaction.atomic
+def update_battle_replay(battle: Battle) -> BattleReplay:
+    """
+    Appends the turns the battle got since its replay was stored as a new
+    chunk. The latest stored turn is rendered again, as units that join the
+    battle add their contubernia to it. Only called where battle turns are
+    written and when archiving; the replay row is locked so that two updates
+    can't append the same turns twice.
+    """
+    replay, created = BattleReplay.objects.select_for_update().get_or_create(
+        battle=battle, defaults={'turn_count': 0, 'data': b''}
+    )
+    if created:
+        first_turn = 0
+    elif replay.archived or \
+            replay.turn_count == battle.battleturn_set.count():
+        return replay
+    else:
+        first_turn = max(replay.turn_count - 1, 0)
+    replay.set_data(render_battle_for_view(battle))
+    replay.save()
+    if replay.turn_count > first_turn:
+        chunk = BattleReplayChunk(replay=replay)
+        chunk.set_data(render_battle_turns(battle, first_turn))
+        chunk.save()
+    return replay
+
+
+def get_battle_replay(battle: Battle) -> Optional[BattleReplay]:
+    """
+    Stored replay of the battle, as of the last time its turns were
+    written, or None if it has none yet. Never writes, so that views can
+    use it.
+    """
+    return BattleReplay.objects.filter(battle=battle).first()
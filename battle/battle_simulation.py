@@ -0,0 +1,771 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from battle.combat import resolve_attack, MELEE_HIT_CHANCE, \
+    RANGED_HIT_CHANCE
+from battle.battle_renderer import update_battle_replay
+from battle.flow_field import DistanceField, flow_step
+from battle.models import Battle, BattleTurn, BattleCharacterInTurn, \
+    BattleUnitInTurn, BattleContuberniumInTurn, BattleSoldierInTurn, \
+    BattleUnit, Coordinates, Order, SoldierState, BATTLEFIELD_LIMIT
+from battle.move_resolution import resolve_move_desires
+from battle.pathfinding import euclidean_distance, find_path, \
+    coordinate_neighbours
+from battle.spatial_index import SpatialIndex
+from context_managers import perf_timer
+from finem_imperii.app_settings import BATTlE_TICKS_PER_TURN
+from unit.models import WorldUnit
+from world.models.npcs import NPC
+from world.npc_columns import NPCColumns
+
+BULK_BATCH_SIZE = 1000
+
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class ContuberniumState:
+    __slots__ = (
+        'battle_contubernium', 'unit', 'x_pos', 'z_pos', 'moved_this_turn',
+        'desires_pos', 'desired_x_pos', 'desired_z_pos', 'ammo_remaining',
+        'attack_type_this_turn', 'contubernium_attacked_this_turn',
+        'battle_soldier_ids', 'world_npc_ids', 'wounds', 'saved_wounds'
+    )
+
+    def __init__(self, battle_contubernium, unit, row):
+        self.battle_contubernium = battle_contubernium
+        self.unit = unit
+        self.x_pos = row.x_pos
+        self.z_pos = row.z_pos
+        self.moved_this_turn = row.moved_this_turn
+        self.desires_pos = row.desires_pos
+        self.desired_x_pos = row.desired_x_pos
+        self.desired_z_pos = row.desired_z_pos
+        self.ammo_remaining = row.ammo_remaining
+        self.attack_type_this_turn = row.attack_type_this_turn
+        self.contubernium_attacked_this_turn = None
+        # One entry per soldier, in the same order in the three arrays
+        self.battle_soldier_ids = EMPTY
+        self.world_npc_ids = EMPTY
+        self.wounds = EMPTY
+        # Wound statuses as of the last saved turn
+        self.saved_wounds = EMPTY
+
+    def coordinates(self):
+        return Coordinates(self.x_pos, self.z_pos)
+
+    def desired_coordinates(self):
+        return Coordinates(self.desired_x_pos, self.desired_z_pos) \
+            if self.desires_pos else None
+
+    def in_battlefield(self):
+        return (
+            -BATTLEFIELD_LIMIT <= self.x_pos <= BATTLEFIELD_LIMIT and
+            -BATTLEFIELD_LIMIT <= self.z_pos <= BATTLEFIELD_LIMIT
+        )
+
+    def has_living_soldiers(self):
+        return bool((self.wounds < BattleSoldierInTurn.DEAD).any())
+
+    def set_soldiers(self, battle_soldier_ids, world_npc_ids, wounds):
+        self.battle_soldier_ids = np.array(battle_soldier_ids, dtype=np.int64)
+        self.world_npc_ids = np.array(world_npc_ids, dtype=np.int64)
+        self.wounds = np.array(wounds, dtype=np.int64)
+        self.saved_wounds = self.wounds.copy()
+
+    def remove_dead_soldiers(self):
+        alive = self.wounds < BattleSoldierInTurn.DEAD
+        self.battle_soldier_ids = self.battle_soldier_ids[alive]
+        self.world_npc_ids = self.world_npc_ids[alive]
+        self.wounds = self.wounds[alive]
+        self.saved_wounds = self.saved_wounds[alive]
+
+
+class UnitState:
+    __slots__ = (
+        'battle_unit', 'battle_character_id', 'x_pos', 'z_pos', 'order',
+        'contubernia'
+    )
+
+    def __init__(self, battle_unit, row):
+        self.battle_unit = battle_unit
+        self.battle_character_id = \
+            row.battle_character_in_turn.battle_character_id \
+            if row.battle_character_in_turn is not None else None
+        self.x_pos = row.x_pos
+        self.z_pos = row.z_pos
+        self.order = row.order
+        self.contubernia = []
+
+    @property
+    def side_id(self):
+        return self.battle_unit.battle_side_id
+
+    @property
+    def world_unit(self):
+        return self.battle_unit.world_unit
+
+    def coordinates(self):
+        return Coordinates(self.x_pos, self.z_pos)
+
+
+class TickRecord:
+    """
+    The state of a battle at the end of a tick, as rows waiting to be
+    inserted.
+    """
+    def __init__(self, turn):
+        self.turn = turn
+        self.characters = []
+        self.units = []
+        self.contubernia = []
+        self.soldiers = []
+
+
+class BattleSimulation:
+    """
+    Runs battle ticks on an in-memory copy of the latest turn of a battle.
+    The rows of every simulated tick are only written by save(), with a
+    few bulk inserts.
+    """
+    def __init__(self, battle: Battle):
+        self.battle = battle
+        self.turn = battle.get_latest_turn()
+        self.units = []
+        self.character_ids = []
+        self.records = []
+        self.dirty_orders = {}
+        self.units_out_of_battle = []
+        self.npc_hits = defaultdict(int)
+        self.sides = []
+        self.index = None
+        self.distance_fields = {}
+        self.rng = np.random.default_rng(self.seed())
+        if self.turn is not None:
+            self.load()
+
+    def seed(self):
+        """
+        Seed of the random generator, fixed by the battle and the turn the
+        simulation starts from so that a battle plays out the same way
+        whatever process runs it and whatever runs alongside it.
+        """
+        return [self.battle.id, self.turn.num if self.turn else 0]
+
+    def load(self):
+        self.character_ids = list(BattleCharacterInTurn.objects.filter(
+            battle_turn=self.turn
+        ).order_by('id').values_list('battle_character_id', flat=True))
+
+        units = {}
+        for row in BattleUnitInTurn.objects.filter(
+                battle_turn=self.turn
+        ).select_related(
+            'battle_unit__world_unit__default_battle_orders',
+            'battle_unit__battle_side',
+            'battle_character_in_turn',
+            'order',
+        ).order_by(
+            'battle_unit__battle_side_id',
+            'battle_unit__battle_organization_id',
+            'battle_unit_id'
+        ):
+            unit = UnitState(row.battle_unit, row)
+            units[row.battle_unit_id] = unit
+            self.units.append(unit)
+
+        contubernia = {}
+        for row in BattleContuberniumInTurn.objects.filter(
+                battle_turn=self.turn
+        ).select_related('battle_contubernium').order_by(
+            'battle_contubernium_id'
+        ):
+            unit = units.get(row.battle_contubernium.battle_unit_id)
+            if unit is None:
+                continue
+            contubernium = ContuberniumState(
+                row.battle_contubernium, unit, row)
+            contubernia[row.battle_contubernium_id] = contubernium
+            unit.contubernia.append(contubernium)
+
+        soldiers = defaultdict(list)
+        for battle_soldier_id, state in sorted(
+                self.turn.get_soldier_states().items()):
+            soldiers[state.battle_contubernium_id].append(
+                (battle_soldier_id, state.world_npc_id, state.wound_status))
+        for battle_contubernium_id, contubernium in contubernia.items():
+            if soldiers[battle_contubernium_id]:
+                contubernium.set_soldiers(
+                    *zip(*soldiers[battle_contubernium_id]))
+
+        self.sides = list(self.battle.battleside_set.order_by('id'))
+
+    @property
+    def contubernia(self):
+        return [
+            contubernium
+            for unit in self.units
+            for contubernium in unit.contubernia
+        ]
+
+    def run(self, ticks):
+        for i in range(ticks):
+            if not self.battle.current or self.turn is None:
+                break
+            with perf_timer("Tick {} for {}".format(
+                    self.turn.num + 1, self.battle)):
+                self.tick()
+
+    def tick(self):
+        self.next_turn()
+        self.unit_movement()
+        self.unit_attack()
+        self.record_tick()
+        if self.check_end():
+            self.battle.current = False
+
+    def next_turn(self):
+        self.turn = BattleTurn(battle=self.battle, num=self.turn.num + 1)
+
+        staying_units = []
+        for unit in self.units:
+            if not any(c.in_battlefield() for c in unit.contubernia) or \
+                    not any(c.has_living_soldiers()
+                            for c in unit.contubernia):
+                self.units_out_of_battle.append(unit)
+                continue
+            staying_units.append(unit)
+        self.units = staying_units
+
+        # Computed once per tick for all the barbarian decisions
+        manpower = self.side_manpower()
+        strengths = {
+            side.id: self.proportional_strength(side.id, manpower)
+            for side in self.sides
+        }
+        for unit in self.units:
+            unit.order = self.get_order(unit, strengths[unit.side_id])
+            unit.contubernia = [
+                contubernium for contubernium in unit.contubernia
+                if contubernium.has_living_soldiers() and
+                contubernium.in_battlefield()
+            ]
+            for contubernium in unit.contubernia:
+                contubernium.moved_this_turn = False
+                contubernium.desires_pos = False
+                contubernium.attack_type_this_turn = None
+                contubernium.contubernium_attacked_this_turn = None
+                contubernium.remove_dead_soldiers()
+
+    def side_manpower(self):
+        manpower = {side.id: 0 for side in self.sides}
+        for unit in self.units:
+            for contubernium in unit.contubernia:
+                manpower[unit.side_id] += int((
+                    contubernium.wounds < BattleSoldierInTurn.HEAVY_WOUND
+                ).sum())
+        return manpower
+
+    def proportional_strength(self, side_id, manpower):
+        opponent_manpower = sum(
+            side_manpower for opponent_id, side_manpower in manpower.items()
+            if opponent_id != side_id
+        )
+        if opponent_manpower == 0:
+            return None
+        return manpower[side_id] / opponent_manpower
+
+    def get_order(self, unit: UnitState, strength_proportion):
+        """
+        Same decision as BattleUnit.get_order(), made on the simulated
+        state. The order is only saved if the decision changes.
+        """
+        world_unit = unit.world_unit
+        if world_unit.owner_character_id:
+            return world_unit.default_battle_orders
+
+        what = Order.barbarian_decision(strength_proportion, self.turn.num)
+        order = world_unit.default_battle_orders
+        if order.what != what:
+            order.what = what
+            self.dirty_orders[order.id] = order
+        return order
+
+    def get_target_distance_function(self, contubernium: ContuberniumState):
+        unit = contubernium.unit
+        order = unit.order
+        if not order:
+            return None
+        index = self.index
+        side_id = unit.side_id
+        battle_contubernium = contubernium.battle_contubernium
+
+        if order.what == Order.STAND or (
+            order.what == Order.RANGED_AND_STAND and
+            contubernium.ammo_remaining == 0
+        ):
+            return None
+
+        if order.what == Order.MOVE:
+            unit_target = order.target_location_coordinates()
+            target = Coordinates(
+                x=unit_target.x + battle_contubernium.x_offset_to_unit,
+                z=unit_target.z + battle_contubernium.z_offset_to_unit
+            )
+
+            def result(coords: Coordinates):
+                return euclidean_distance(coords, target)
+            return result
+
+        if order.what == Order.FLEE or (
+            order.what == Order.RANGED_AND_FLEE and
+            contubernium.ammo_remaining == 0
+        ):
+            enemy_distance = self.enemy_distance_field(side_id)
+            original_enemy_distance = enemy_distance(
+                contubernium.coordinates())
+
+            def result(coords: Coordinates):
+                distance = enemy_distance(coords)
+                return (original_enemy_distance + 10) - distance \
+                    if distance is not None else 0
+            return result
+
+        if order.what == Order.CHARGE or (
+            order.what == Order.RANGED_AND_CHARGE and
+            contubernium.ammo_remaining == 0
+        ):
+            enemy_distance = self.enemy_distance_field(side_id)
+
+            def result(coords: Coordinates):
+                distance = enemy_distance(coords)
+                return distance \
+                    if distance is not None and distance >= 2 else 0
+            return result
+
+        if order.what == Order.ADVANCE_IN_FORMATION:
+            z_direction = -1 if unit.battle_unit.battle_side.z else 1
+            target = Coordinates(
+                x=battle_contubernium.starting_x_pos,
+                z=battle_contubernium.starting_z_pos +
+                self.turn.num * z_direction
+            )
+
+            def result(coords: Coordinates):
+                return euclidean_distance(coords, target)
+            return result
+
+        shot_range = unit.world_unit.shot_range()
+
+        if order.what in (
+            Order.RANGED_AND_CHARGE,
+            Order.RANGED_AND_FLEE,
+            Order.RANGED_AND_STAND
+        ) and contubernium.ammo_remaining > 0:
+            def result(coords: Coordinates):
+                closest, distance = index.closest_enemy(coords, side_id)
+                if distance > shot_range:
+                    return distance - shot_range
+                if distance < shot_range - 1:
+                    return shot_range - distance
+                return 0
+            return result
+
+        if order.what == Order.STAND_AND_DISTANCE:
+            min_enemy_distance = 7 if shot_range == 0 else shot_range - 1
+
+            def result(coords: Coordinates):
+                closest, enemy_distance = index.closest_enemy(
+                    coords, side_id)
+                if enemy_distance > min_enemy_distance:
+                    return 0
+                return min_enemy_distance - enemy_distance
+            return result
+
+    def enemy_distance_field(self, side_id):
+        """
+        Distance to the closest enemy of side_id, for every cell around the
+        contubernia in the battle. Computed once per side and movement pass.
+        """
+        if side_id not in self.distance_fields:
+            positions = [
+                contubernium.coordinates()
+                for contubernium in self.contubernia
+            ]
+            self.distance_fields[side_id] = DistanceField(
+                [
+                    contubernium.coordinates()
+                    for contubernium in self.contubernia
+                    if contubernium.unit.side_id != side_id
+                ],
+                min(x for x, z in positions) - 1,
+                min(z for x, z in positions) - 1,
+                max(x for x, z in positions) + 1,
+                max(z for x, z in positions) + 1
+            )
+        return self.distance_fields[side_id]
+
+    @staticmethod
+    def moves_by_flow(contubernium: ContuberniumState):
+        """
+        Whether the order of the contubernium only needs the next step
+        towards its goal, which can be read from a distance field instead
+        of searching a path.
+        """
+        what = contubernium.unit.order.what
+        return what in (
+            Order.CHARGE, Order.FLEE, Order.ADVANCE_IN_FORMATION
+        ) or (
+            what in (Order.RANGED_AND_CHARGE, Order.RANGED_AND_FLEE) and
+            contubernium.ammo_remaining == 0
+        )
+
+    def next_step(self, contubernium, tile_availability_test):
+        target_distance_function = \
+            self.get_target_distance_function(contubernium)
+        if not target_distance_function or target_distance_function(
+                contubernium.coordinates()) <= 0:
+            return None
+        if self.moves_by_flow(contubernium):
+            step = flow_step(
+                contubernium.coordinates(),
+                target_distance_function,
+                coordinate_neighbours,
+                tile_availability_test
+            )
+            if step is not None:
+                return step
+            # Blocked: no neighbour gets closer, search a way around
+        path = find_path(
+            contubernium, target_distance_function, tile_availability_test)
+        return path[1] if len(path) > 1 else None
+
+    def unit_movement(self):
+        self.index = SpatialIndex(
+            self.contubernia, lambda contubernium: contubernium.unit.side_id)
+
+        # first pass: desire positions / optimistic move
+        self.distance_fields = {}
+        for contubernium in self.contubernia:
+            step = self.next_step(contubernium, lambda coords: True)
+            if step is not None:
+                contubernium.desires_pos = True
+                contubernium.desired_x_pos = step.x
+                contubernium.desired_z_pos = step.z
+        self.resolve_move_desires()
+
+        # second pass: if could not move, do "safe" move
+        self.distance_fields = {}
+        for contubernium in self.contubernia:
+            if contubernium.moved_this_turn:
+                continue
+            step = self.next_step(
+                contubernium, lambda coords: coords not in self.index)
+            if step is not None and step not in self.index:
+                self.move(contubernium, step)
+
+        # finalize
+        for unit in self.units:
+            if unit.contubernia:
+                unit.x_pos = math.floor(
+                    sum(c.x_pos for c in unit.contubernia) /
+                    len(unit.contubernia)
+                )
+                unit.z_pos = math.floor(
+                    sum(c.z_pos for c in unit.contubernia) /
+                    len(unit.contubernia)
+                )
+            order = unit.order
+            if order and order.what == Order.MOVE and euclidean_distance(
+                    unit.coordinates(),
+                    order.target_location_coordinates()
+            ) == 0:
+                order.done = True
+                self.dirty_orders[order.id] = order
+
+    def resolve_move_desires(self):
+        moves = resolve_move_desires(
+            self.contubernia, self.move_priority)
+        for contubernium, position in moves:
+            self.move(contubernium, position)
+        for contubernium in self.contubernia:
+            contubernium.desires_pos = False
+
+    @staticmethod
+    def move_priority(contubernium):
+        order = contubernium.unit.order
+        what = order.what if order else Order.STAND
+        return Order.ORDER_PRIORITY.get(what, 0)
+
+    def move(self, contubernium, position):
+        self.index.move(contubernium, position)
+        contubernium.desires_pos = False
+        contubernium.moved_this_turn = True
+        contubernium.x_pos = position.x
+        contubernium.z_pos = position.z
+
+    def unit_attack(self):
+        contubernia = self.contubernia
+        self.rng.shuffle(contubernia)
+        for contubernium in contubernia:
+            world_unit = contubernium.unit.world_unit
+            target_contubernium, distance = self.index.closest_enemy(
+                contubernium.coordinates(), contubernium.unit.side_id)
+
+            if target_contubernium is None:
+                continue
+
+            if distance < 2:
+                self.attack(
+                    contubernium, target_contubernium, MELEE_HIT_CHANCE)
+                contubernium.attack_type_this_turn = \
+                    BattleContuberniumInTurn.MELEE_ATTACK
+                contubernium.contubernium_attacked_this_turn = \
+                    target_contubernium
+            elif (
+                    world_unit.is_ranged() and
+                    distance <= world_unit.shot_range() and
+                    contubernium.ammo_remaining > 0 and
+                    not contubernium.moved_this_turn
+            ):
+                self.attack(
+                    contubernium, target_contubernium, RANGED_HIT_CHANCE)
+                contubernium.ammo_remaining -= 1
+                contubernium.attack_type_this_turn = \
+                    BattleContuberniumInTurn.RANGED_ATTACK
+                contubernium.contubernium_attacked_this_turn = \
+                    target_contubernium
+
+    def attack(self, contubernium, target_contubernium, hit_chance):
+        if not len(target_contubernium.wounds):
+            return
+        target_contubernium.wounds, hits = resolve_attack(
+            contubernium.wounds,
+            target_contubernium.wounds,
+            hit_chance,
+            self.rng
+        )
+        for world_npc_id, npc_hits in zip(
+                target_contubernium.world_npc_ids[hits > 0].tolist(),
+                hits[hits > 0].tolist()):
+            self.npc_hits[world_npc_id] += npc_hits
+
+    def check_end(self):
+        for side in self.sides:
+            if not any(
+                contubernium.has_living_soldiers()
+                for unit in self.units if unit.side_id == side.id
+                for contubernium in unit.contubernia
+            ):
+                return True
+        return False
+
+    def record_tick(self):
+        record = TickRecord(self.turn)
+        characters = {}
+        for battle_character_id in self.character_ids:
+            characters[battle_character_id] = BattleCharacterInTurn(
+                battle_character_id=battle_character_id,
+                battle_turn=self.turn
+            )
+            record.characters.append(characters[battle_character_id])
+
+        contubernia = {}
+        for unit in self.units:
+            unit_row = BattleUnitInTurn(
+                battle_unit=unit.battle_unit,
+                battle_character_in_turn=characters.get(
+                    unit.battle_character_id),
+                battle_turn=self.turn,
+                x_pos=unit.x_pos,
+                z_pos=unit.z_pos,
+                order=unit.order
+            )
+            record.units.append(unit_row)
+            for contubernium in unit.contubernia:
+                contubernium_row = BattleContuberniumInTurn(
+                    battle_contubernium=contubernium.battle_contubernium,
+                    battle_unit_in_turn=unit_row,
+                    battle_turn=self.turn,
+                    x_pos=contubernium.x_pos,
+                    z_pos=contubernium.z_pos,
+                    moved_this_turn=contubernium.moved_this_turn,
+                    desires_pos=contubernium.desires_pos,
+                    desired_x_pos=contubernium.desired_x_pos,
+                    desired_z_pos=contubernium.desired_z_pos,
+                    ammo_remaining=contubernium.ammo_remaining,
+                    attack_type_this_turn=contubernium.attack_type_this_turn
+                )
+                contubernia[contubernium] = contubernium_row
+                record.contubernia.append(
+                    (contubernium_row,
+                     contubernium.contubernium_attacked_this_turn)
+                )
+                # Only soldiers whose state changed get a row
+                changed = contubernium.wounds != contubernium.saved_wounds
+                contubernium.saved_wounds = contubernium.wounds.copy()
+                for battle_soldier_id, wound_status in zip(
+                        contubernium.battle_soldier_ids[changed].tolist(),
+                        contubernium.wounds[changed].tolist()):
+                    record.soldiers.append(BattleSoldierInTurn(
+                        battle_soldier_id=battle_soldier_id,
+                        battle_contubernium_in_turn=contubernium_row,
+                        battle_turn=self.turn,
+                        wound_status=wound_status
+                    ))
+        record.contubernia = [
+            (row, contubernia.get(attacked)) for row, attacked
+            in record.contubernia
+        ]
+        self.records.append(record)
+
+    def soldier_states(self):
+        """
+        States of the soldiers in the battle as of the last tick, as
+        BattleTurn.get_soldier_states() would rebuild them.
+        """
+        states = {}
+        for contubernium in self.contubernia:
+            for battle_soldier_id, wound_status, world_npc_id in zip(
+                    contubernium.battle_soldier_ids.tolist(),
+                    contubernium.wounds.tolist(),
+                    contubernium.world_npc_ids.tolist()):
+                states[battle_soldier_id] = SoldierState(
+                    wound_status,
+                    contubernium.battle_contubernium.id,
+                    world_npc_id
+                )
+        return states
+
+    @transaction.atomic
+    def save(self):
+        """
+        Inserts the rows of the simulated ticks and applies their effects
+        outside of the battle tables.
+        """
+        turns = [record.turn for record in self.records]
+        if turns:
+            turns[-1].set_soldier_snapshot(self.soldier_states())
+        bulk_create_with_ids(
+            BattleTurn, turns,
+            BattleTurn.objects.filter(battle=self.battle),
+            ('num',)
+        )
+        turn_ids = [turn.id for turn in turns]
+
+        bulk_create_with_ids(
+            BattleCharacterInTurn,
+            [row for record in self.records for row in record.characters],
+            BattleCharacterInTurn.objects.filter(battle_turn_id__in=turn_ids),
+            ('battle_turn_id', 'battle_character_id')
+        )
+        bulk_create_with_ids(
+            BattleUnitInTurn,
+            [row for record in self.records for row in record.units],
+            BattleUnitInTurn.objects.filter(battle_turn_id__in=turn_ids),
+            ('battle_turn_id', 'battle_unit_id')
+        )
+        contubernium_rows = [
+            row for record in self.records for row, _ in record.contubernia
+        ]
+        bulk_create_with_ids(
+            BattleContuberniumInTurn,
+            contubernium_rows,
+            BattleContuberniumInTurn.objects.filter(
+                battle_turn_id__in=turn_ids),
+            ('battle_turn_id', 'battle_contubernium_id')
+        )
+        attacking_rows = []
+        for record in self.records:
+            for row, attacked_row in record.contubernia:
+                if attacked_row is not None:
+                    row.contubernium_attacked_this_turn = attacked_row
+                    attacking_rows.append(row)
+        BattleContuberniumInTurn.objects.bulk_update(
+            attacking_rows,
+            ['contubernium_attacked_this_turn'],
+            batch_size=BULK_BATCH_SIZE
+        )
+        BattleSoldierInTurn.objects.bulk_create(
+            [row for record in self.records for row in record.soldiers],
+            batch_size=BULK_BATCH_SIZE
+        )
+
+        Order.objects.bulk_update(
+            list(self.dirty_orders.values()), ['what', 'done'])
+
+        for unit in self.units_out_of_battle:
+            unit.battle_unit.in_battle = False
+            unit.world_unit.status = WorldUnit.REGROUPING
+        BattleUnit.objects.bulk_update(
+            [unit.battle_unit for unit in self.units_out_of_battle],
+            ['in_battle']
+        )
+        WorldUnit.objects.bulk_update(
+            [unit.world_unit for unit in self.units_out_of_battle],
+            ['status']
+        )
+
+        self.save_npc_hits()
+
+        self.battle.save()
+
+        self.records = []
+        self.dirty_orders = {}
+        self.units_out_of_battle = []
+        self.npc_hits = defaultdict(int)
+
+    def save_npc_hits(self):
+        """
+        Applies all the hits the NPCs took in the simulated ticks at once.
+        NPCs that die are removed from their units together, and units left
+        without soldiers are disbanded afterwards.
+        """
+        npcs = NPCColumns(
+            NPC.objects.filter(id__in=self.npc_hits.keys()).order_by('id'),
+            self.rng
+        )
+        hits = np.array(
+            [self.npc_hits[npc_id] for npc_id in npcs.id.tolist()],
+            dtype=np.int64
+        )
+        for i in range(int(hits.max(initial=0))):
+            npcs.take_hits(hits > i)
+        npcs.save()
+
+
+def bulk_create_with_ids(model, instances, queryset, key_fields):
+    """
+    bulk_create() that makes sure the instances get their primary keys,
+    reading them back by a unique key on backends that don't return them.
+    """
+    model.objects.bulk_create(instances, batch_size=BULK_BATCH_SIZE)
+    if not instances or instances[0].pk is not None:
+        return
+
+    def key(values):
+        return tuple(values)
+
+    ids = {
+        key(row[1:]): row[0]
+        for row in queryset.values_list('id', *key_fields)
+    }
+    for instance in instances:
+        instance.pk = ids[key(
+            getattr(instance, field) for field in key_fields)]
+
+
+def battle_turn(battle: Battle):
+    simulation = BattleSimulation(battle)
+    simulation.run(BATTlE_TICKS_PER_TURN)
+    simulation.save()
+    update_battle_replay(battle)
+
+    battle.tile.world.broadcast(
+        'messaging/messages/battle_progress.html',
+        'Battle in {}'.format(battle.tile.name),
+        {'battle': battle},
+        battle.get_absolute_url()
+    )
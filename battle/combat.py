@@ -0,0 +1,32 @@
+import numpy as np
+
+from battle.models import BattleSoldierInTurn
+
+MELEE_HIT_CHANCE = 0.5
+RANGED_HIT_CHANCE = 0.3
+
+ATTACK_CHANCE_MULTIPLIERS = np.array([
+    BattleSoldierInTurn.ATTACK_CHANGE_MULTIPLIERS[wound_status]
+    for wound_status in range(BattleSoldierInTurn.DEAD + 1)
+])
+
+
+def resolve_attack(attacker_wounds, target_wounds, hit_chance, rng):
+    """
+    Resolves the attack of a contubernium on another one at once. Each
+    attacker picks a random target soldier and keeps hitting it while its
+    hit rolls succeed, so the number of hits it deals is geometrically
+    distributed. Hits on soldiers that are already dead are lost.
+
+    Returns the new wound statuses of the targets and the number of hits
+    each of them actually took.
+    """
+    chances = hit_chance * ATTACK_CHANCE_MULTIPLIERS[attacker_wounds]
+    # Number of successful rolls before the first failed one
+    hits = rng.geometric(1 - chances) - 1
+    targets = rng.integers(0, len(target_wounds), len(attacker_wounds))
+    received = np.bincount(targets, weights=hits,
+                           minlength=len(target_wounds)).astype(np.int64)
+    new_wounds = np.minimum(target_wounds + received,
+                            BattleSoldierInTurn.DEAD)
+    return new_wounds, new_wounds - target_wounds
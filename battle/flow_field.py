@@ -0,0 +1,64 @@
+import numpy as np
+
+# Sources handled per NumPy step, to bound the size of the temporary arrays
+SOURCE_CHUNK = 64
+
+
+class DistanceField:
+    """
+    Euclidean distance from every cell of a rectangle of the battlefield to
+    the closest of a set of source positions, computed for the whole
+    rectangle at once. Cells outside of the rectangle are computed on
+    demand.
+    """
+    def __init__(self, sources, min_x, min_z, max_x, max_z):
+        self.sources = np.array(sources, dtype=np.float64).reshape(-1, 2)
+        self.min_x = min_x
+        self.min_z = min_z
+        xs = np.arange(min_x, max_x + 1, dtype=np.float64)[:, None, None]
+        zs = np.arange(min_z, max_z + 1, dtype=np.float64)[None, :, None]
+        self.distances = np.full((xs.shape[0], zs.shape[1]), np.inf)
+        for start in range(0, len(self.sources), SOURCE_CHUNK):
+            chunk = self.sources[start:start + SOURCE_CHUNK]
+            self.distances = np.minimum(
+                self.distances,
+                np.sqrt(
+                    (xs - chunk[:, 0]) ** 2 + (zs - chunk[:, 1]) ** 2
+                ).min(axis=2)
+            )
+
+    def __call__(self, coords):
+        """
+        Distance from coords to the closest source, None if there are no
+        sources.
+        """
+        if not len(self.sources):
+            return None
+        i = coords[0] - self.min_x
+        j = coords[1] - self.min_z
+        if 0 <= i < self.distances.shape[0] and \
+                0 <= j < self.distances.shape[1]:
+            return float(self.distances[i, j])
+        return float(np.sqrt(
+            (self.sources[:, 0] - coords[0]) ** 2 +
+            (self.sources[:, 1] - coords[1]) ** 2
+        ).min())
+
+
+def flow_step(coords, target_distance_function, neighbours,
+              tile_availability_test):
+    """
+    Neighbouring cell that gets closest to the target according to
+    target_distance_function, or None if none of the available ones is
+    closer than coords.
+    """
+    best = None
+    best_distance = target_distance_function(coords)
+    for neighbour in neighbours(coords):
+        if not tile_availability_test(neighbour):
+            continue
+        distance = target_distance_function(neighbour)
+        if distance < best_distance:
+            best = neighbour
+            best_distance = distance
+    return best
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from battle.battle_archive import battles_to_archive, archive_battle
+from world.models.geography import World
+
+
+class Command(BaseCommand):
+    help = 'Archives the finished battles of the specified worlds, or of ' \
+           'every world if none is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('world_id', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        battles = battles_to_archive()
+        if options['world_id']:
+            for world_id in options['world_id']:
+                if not World.objects.filter(pk=world_id).exists():
+                    raise CommandError(
+                        'World with id {} does not exist'.format(world_id)
+                    )
+            battles = battles.filter(tile__world_id__in=options['world_id'])
+
+        battles = list(battles.order_by('id'))
+        for battle in battles:
+            archive_battle(battle)
+            self.stdout.write('Archived {} ({})'.format(battle, battle.id))
+        self.stdout.write(
+            self.style.SUCCESS('{} battles archived'.format(len(battles)))
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0005_auto_20180819_0036'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BattleReplay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('turn_count', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('battle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='battle.battle')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0006_battlereplay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battlereplay',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='BattleSideSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uninjured', models.IntegerField(default=0)),
+                ('light_wounds', models.IntegerField(default=0)),
+                ('medium_wounds', models.IntegerField(default=0)),
+                ('heavy_wounds', models.IntegerField(default=0)),
+                ('dead', models.IntegerField(default=0)),
+                ('battle_side', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='battle.battleside')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0007_battle_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battleturn',
+            name='soldier_snapshot',
+            field=models.BinaryField(blank=True, help_text="States of the soldiers as of this turn, compressed, so that rebuilding a later turn doesn't replay the battle from its start. Written on the last turn of every save of the battle simulation.", null=True),
+        ),
+    ]
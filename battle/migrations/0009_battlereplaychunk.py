@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:39
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_replays(apps, schema_editor):
+    # Stored replays held all their turns; they become their first chunk
+    BattleReplay = apps.get_model('battle', 'BattleReplay')
+    BattleReplayChunk = apps.get_model('battle', 'BattleReplayChunk')
+    for replay in BattleReplay.objects.all():
+        data = json.loads(zlib.decompress(replay.data).decode())
+        chunk = {
+            'first_turn': 0,
+            'last_turn': data['turn_count'] - 1,
+            'replay': data.pop('replay'),
+        }
+        for key in ('characters', 'units'):
+            chunk[key] = {}
+            for element_id, element in data[key].items():
+                chunk[key][element_id] = {'in_turn': element['in_turn']}
+                element['in_turn'] = {}
+        replay.data = zlib.compress(json.dumps(data).encode())
+        replay.save()
+        BattleReplayChunk.objects.create(
+            replay=replay,
+            first_turn=chunk['first_turn'],
+            last_turn=chunk['last_turn'],
+            data=zlib.compress(json.dumps(chunk).encode())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('battle', '0008_battleturn_soldier_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BattleReplayChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_turn', models.IntegerField()),
+                ('last_turn', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('replay', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='battle.battlereplay')),
+            ],
+        ),
+        migrations.RunPython(split_replays, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,20 @@
 from collections import namedtuple, defaultdict
 
+import json
 import math
+import zlib
 
 from django.urls import reverse
 from django.db import models
 from django.db.models.aggregates import Sum, Avg
 
 Coordinates = namedtuple("Coordinates", ['x', 'z'])
+# Contubernia further than this from the center have left the battlefield
+BATTLEFIELD_LIMIT = 50
+SoldierState = namedtuple(
+    "SoldierState",
+    ['wound_status', 'battle_contubernium_id', 'world_npc_id']
+)
 
 
 class BattleFormation(models.Model):
@@ -55,6 +63,86 @@ class Battle(models.Model):
             return None
         return turns[0]
 
+    def get_soldier_states_by_turn(self, last_num=None, first_num=None):
+        """
+        Yields (turn, soldiers) for every turn in order from first_num on,
+        soldiers being a dict from BattleSoldier id to the SoldierState of
+        every soldier present in that turn. States are rebuilt from the rows
+        of the turns where they changed (see BattleSoldierInTurn), starting
+        from the latest snapshot at or before first_num.
+        """
+        turns = self.battleturn_set.order_by('num').defer('soldier_snapshot')
+        if last_num is not None:
+            turns = turns.filter(num__lte=last_num)
+
+        states = {}
+        changed_in = {}
+        if first_num is not None:
+            snapshot_turn = self.battleturn_set.filter(
+                num__lte=first_num,
+                soldier_snapshot__isnull=False
+            ).order_by('-num').first()
+            if snapshot_turn is not None:
+                states = snapshot_turn.get_soldier_snapshot()
+                changed_in = dict.fromkeys(states, snapshot_turn.num)
+                # The rows of the snapshot turn are applied again, as units
+                # that join the battle add theirs to the latest turn
+                turns = turns.filter(num__gte=snapshot_turn.num)
+
+        present_contubernia = defaultdict(set)
+        for turn_id, battle_contubernium_id in \
+                BattleContuberniumInTurn.objects.filter(
+                    battle_turn__in=turns
+                ).values_list('battle_turn_id', 'battle_contubernium_id'):
+            present_contubernia[turn_id].add(battle_contubernium_id)
+
+        changes = defaultdict(list)
+        for turn_id, battle_soldier_id, *state in \
+                BattleSoldierInTurn.objects.filter(
+                    battle_turn__in=turns
+                ).values_list(
+                    'battle_turn_id',
+                    'battle_soldier_id',
+                    'wound_status',
+                    'battle_soldier__battle_contubernium_id',
+                    'battle_soldier__world_npc_id',
+                ):
+            changes[turn_id].append((battle_soldier_id, SoldierState(*state)))
+
+        for turn in turns:
+            for battle_soldier_id, state in changes[turn.id]:
+                states[battle_soldier_id] = state
+                changed_in[battle_soldier_id] = turn.num
+            soldiers = {}
+            for battle_soldier_id, state in list(states.items()):
+                if state.wound_status == BattleSoldierInTurn.DEAD and \
+                        changed_in[battle_soldier_id] < turn.num:
+                    # Dead soldiers are only shown in the turn they die
+                    del states[battle_soldier_id]
+                elif state.battle_contubernium_id in \
+                        present_contubernia[turn.id]:
+                    soldiers[battle_soldier_id] = state
+            if first_num is None or turn.num >= first_num:
+                yield turn, soldiers
+
+    def get_side_manpower(self, turn: 'BattleTurn' = None) -> dict:
+        """
+        Soldiers still able to fight in each side, by BattleSide id, counted
+        in one pass over the soldiers of the turn.
+        """
+        if turn is None:
+            turn = self.get_latest_turn()
+
+        contubernium_sides = dict(BattleContubernium.objects.filter(
+            battle_unit__battle_side__battle=self
+        ).values_list('id', 'battle_unit__battle_side_id'))
+        result = {side.id: 0 for side in self.battleside_set.all()}
+        for soldier in turn.get_soldier_states().values():
+            if soldier.wound_status < BattleSoldierInTurn.HEAVY_WOUND:
+                result[contubernium_sides[soldier.battle_contubernium_id]] \
+                    += 1
+        return result
+
     def get_units_in_battle(self):
         return BattleUnit.objects.filter(battle_side__battle=self)
 
@@ -71,6 +159,66 @@ class Battle(models.Model):
         )
 
 
+class BattleReplay(models.Model):
+    """
+    The battle as the battlefield view renders it, serialized to JSON and
+    compressed. data holds what the view needs besides the turns, and the
+    turns are stored in BattleReplayChunks, one more every time the battle
+    gets new turns, so that viewing a battle doesn't walk all of its turn
+    rows. Once the battle is archived its turn rows are gone and the replay
+    is the only record of the battle's course.
+    """
+    battle = models.OneToOneField(Battle, on_delete=models.CASCADE)
+    turn_count = models.IntegerField()
+    data = models.BinaryField()
+    archived = models.BooleanField(default=False)
+
+    def set_data(self, data: dict):
+        self.turn_count = data['turn_count']
+        self.data = zlib.compress(json.dumps(data).encode())
+
+    def get_json(self) -> str:
+        return zlib.decompress(self.data).decode()
+
+    def get_data(self) -> dict:
+        return json.loads(self.get_json())
+
+    def get_ticks_json(self, after: int = -1) -> str:
+        """
+        JSON of the battle with the chunks that have turns after the given
+        one, put together from the stored JSON without decoding it.
+        """
+        chunks = self.battlereplaychunk_set.filter(
+            last_turn__gt=after
+        ).order_by('first_turn')
+        return '{{"battle": {}, "chunks": [{}]}}'.format(
+            self.get_json(),
+            ', '.join(chunk.get_json() for chunk in chunks)
+        )
+
+
+class BattleReplayChunk(models.Model):
+    """
+    The turns of a BattleReplay from first_turn to last_turn, serialized to
+    JSON and compressed. Chunks are never encoded again once stored.
+    """
+    replay = models.ForeignKey(BattleReplay, on_delete=models.CASCADE)
+    first_turn = models.IntegerField()
+    last_turn = models.IntegerField()
+    data = models.BinaryField()
+
+    def set_data(self, data: dict):
+        self.first_turn = data['first_turn']
+        self.last_turn = data['last_turn']
+        self.data = zlib.compress(json.dumps(data).encode())
+
+    def get_json(self) -> str:
+        return zlib.decompress(self.data).decode()
+
+    def get_data(self) -> dict:
+        return json.loads(self.get_json())
+
+
 class BattleTurn(models.Model):
     class Meta:
         unique_together = (
@@ -79,6 +227,33 @@ class BattleTurn(models.Model):
 
     battle = models.ForeignKey(Battle, on_delete=models.CASCADE)
     num = models.IntegerField()
+    soldier_snapshot = models.BinaryField(
+        null=True, blank=True,
+        help_text="States of the soldiers as of this turn, compressed, so "
+                  "that rebuilding a later turn doesn't replay the battle "
+                  "from its start. Written on the last turn of every save "
+                  "of the battle simulation."
+    )
+
+    def set_soldier_snapshot(self, states: dict):
+        self.soldier_snapshot = zlib.compress(json.dumps([
+            [battle_soldier_id, *state]
+            for battle_soldier_id, state in states.items()
+        ]).encode())
+
+    def get_soldier_snapshot(self) -> dict:
+        return {
+            battle_soldier_id: SoldierState(*state)
+            for battle_soldier_id, *state
+            in json.loads(zlib.decompress(self.soldier_snapshot).decode())
+        }
+
+    def get_soldier_states(self):
+        result = {}
+        for turn, soldiers in self.battle.get_soldier_states_by_turn(
+                self.num, self.num):
+            result = soldiers
+        return result
 
     def test_contubernia_superposition(self):
         occupied = set()
@@ -88,21 +263,6 @@ class BattleTurn(models.Model):
                 return True
             occupied.add(contubernium.coordinates())
 
-    def get_contubernia_by_desired_position(self) -> dict:
-        result = defaultdict(list)
-        for contubernium in BattleContuberniumInTurn.objects.filter(
-                battle_turn=self, desires_pos=True):
-            result[contubernium.desired_coordinates()].append(contubernium)
-        return result
-
-    def get_contubernia_desiring_position(self, coords: Coordinates):
-        return BattleContuberniumInTurn.objects.filter(
-            battle_turn=self,
-            desires_pos=True,
-            desired_x_pos=coords.x,
-            desired_z_pos=coords.z
-        )
-
     def get_contubernium_in_position(self, coords: Coordinates):
         try:
             return BattleContuberniumInTurn.objects.get(
@@ -132,24 +292,37 @@ class BattleSide(models.Model):
         return self.get_largest_organization().organization.get_default_formation_settings()
 
     def get_manpower(self, turn: BattleTurn = None):
-        if turn is None:
-            turn = self.battle.get_latest_turn()
-
-        return BattleSoldierInTurn.objects.filter(
-            battle_turn=turn,
-            wound_status__lt=BattleSoldierInTurn.HEAVY_WOUND,
-            battle_contubernium_in_turn__battle_contubernium__battle_unit__battle_side=self
-        ).count()
-
-    def get_proportional_strength(self, turn: BattleTurn = None):
-        if turn is None:
-            turn = self.battle.get_latest_turn()
-        opponent_side = self.battle.battleside_set.get(z=not self.z)
-        own_manpower = self.get_manpower(turn)
-        opponent_manpower = opponent_side.get_manpower(turn)
+        return self.battle.get_side_manpower(turn)[self.id]
+
+    def get_proportional_strength(self, turn: BattleTurn = None,
+                                  manpower: dict = None):
+        if manpower is None:
+            manpower = self.battle.get_side_manpower(turn)
+        opponent_manpower = sum(
+            side_manpower for side_id, side_manpower in manpower.items()
+            if side_id != self.id
+        )
         if opponent_manpower == 0:
             return None
-        return own_manpower / opponent_manpower
+        return manpower[self.id] / opponent_manpower
+
+
+class BattleSideSummary(models.Model):
+    """
+    Soldiers of a side by the wound status they ended the battle with,
+    computed when the battle is archived.
+    """
+    battle_side = models.OneToOneField(BattleSide, on_delete=models.CASCADE)
+    uninjured = models.IntegerField(default=0)
+    light_wounds = models.IntegerField(default=0)
+    medium_wounds = models.IntegerField(default=0)
+    heavy_wounds = models.IntegerField(default=0)
+    dead = models.IntegerField(default=0)
+
+    @property
+    def soldiers(self):
+        return self.uninjured + self.light_wounds + self.medium_wounds + \
+            self.heavy_wounds + self.dead
 
 
 class BattleOrganization(models.Model):
@@ -198,25 +371,33 @@ class BattleUnit(models.Model):
     type = models.CharField(max_length=30)
     in_battle = models.BooleanField(default=True)
 
-    def get_order(self):
+    def get_order(self, manpower: dict = None):
+        """
+        Order the unit follows. Barbarian units decide it from the state of
+        the battle; manpower, as returned by Battle.get_side_manpower(), can
+        be passed to decide for several units with a single count.
+        """
         if self.world_unit.owner_character:
             return self.world_unit.default_battle_orders
         else:
-            strength_proportion = self.battle_side.get_proportional_strength()
-            if strength_proportion is not None and strength_proportion < 0.6:
-                what = Order.FLEE
-            elif self.battle_side.battle.get_latest_turn().num < 10:
-                what = Order.ADVANCE_IN_FORMATION
-            else:
-                what = Order.CHARGE
-
-            if self.world_unit.default_battle_orders:
-                self.world_unit.default_battle_orders.what = what
-                self.world_unit.default_battle_orders.save()
-            else:
+            battle = self.battle_side.battle
+            turn = battle.get_latest_turn()
+            if manpower is None:
+                manpower = battle.get_side_manpower(turn)
+            what = Order.barbarian_decision(
+                self.battle_side.get_proportional_strength(
+                    manpower=manpower),
+                turn.num
+            )
+
+            order = self.world_unit.default_battle_orders
+            if order is None:
                 self.world_unit.default_battle_orders = Order.objects.create(
                     what=what)
                 self.world_unit.save()
+            elif order.what != what:
+                order.what = what
+                order.save()
             return self.world_unit.default_battle_orders
 
     def __str__(self):
@@ -306,6 +487,13 @@ class BattleSoldier(models.Model):
 
 
 class BattleSoldierInTurn(models.Model):
+    """
+    State of a soldier from a battle turn on. Rows are only written in the
+    turns where the soldier joins the battle or its wound status changes;
+    the soldier keeps that state in later turns while its contubernium is
+    in the battle. Use BattleTurn.get_soldier_states() to get the soldiers
+    of a turn.
+    """
     UNINJURED = 0
     LIGHT_WOUND = 1
     MEDIUM_WOUND = 2
@@ -339,11 +527,6 @@ class BattleSoldierInTurn(models.Model):
     def attack_chance_multiplier(self):
         return self.ATTACK_CHANGE_MULTIPLIERS[self.wound_status]
 
-    def take_hit(self):
-        self.wound_status += 1
-        self.save()
-        self.battle_soldier.world_npc.take_hit()
-
 
 class Order(models.Model):
     STAND = 'stand'
@@ -385,6 +568,15 @@ class Order(models.Model):
     def target_location_coordinates(self):
         return Coordinates(self.target_location_x, self.target_location_z)
 
+    @staticmethod
+    def barbarian_decision(strength_proportion, turn_num):
+        if strength_proportion is not None and strength_proportion < 0.6:
+            return Order.FLEE
+        elif turn_num < 10:
+            return Order.ADVANCE_IN_FORMATION
+        else:
+            return Order.CHARGE
+
 
 class BattleObject(models.Model):
     battle = models.ForeignKey(Battle, on_delete=models.CASCADE)
@@ -0,0 +1,66 @@
+def resolve_move_desires(contubernia, priority):
+    """
+    Decides which of the contubernia that desire a position get to move,
+    in one pass over a map of desired positions. Each desired position goes
+    to its highest priority contender (the first one on ties). A winner can
+    move if its position is free, or if the contubernium occupying it moves
+    too: chains of contubernia following each other move together, and so
+    do swaps and larger rotations.
+
+    contubernia are rows or simulation states with positions and desires;
+    they are not modified. Returns the list of (contubernium, position) of
+    every contubernium that moves.
+    """
+    occupiers = {}
+    contenders = {}
+    for contubernium in contubernia:
+        occupiers[contubernium.coordinates()] = contubernium
+        if contubernium.desires_pos:
+            contenders.setdefault(
+                contubernium.desired_coordinates(), []).append(contubernium)
+
+    winners = {}
+    for position, position_contenders in contenders.items():
+        winner = None
+        highest_priority = None
+        for contender in position_contenders:
+            contender_priority = priority(contender)
+            if highest_priority is None or \
+                    contender_priority > highest_priority:
+                winner = contender
+                highest_priority = contender_priority
+        winners[winner] = position
+
+    # Follow each winner to the occupier of its desired position until
+    # reaching a free position (the whole chain moves), a contubernium that
+    # does not move (the whole chain stays) or a contubernium already in
+    # the chain (a rotation, which moves).
+    can_move = {}
+    for start in winners:
+        chain = []
+        in_chain = set()
+        contubernium = start
+        while True:
+            if contubernium in can_move:
+                result = can_move[contubernium]
+                break
+            if contubernium in in_chain:
+                result = True
+                break
+            if contubernium not in winners:
+                result = False
+                break
+            chain.append(contubernium)
+            in_chain.add(contubernium)
+            contubernium = occupiers.get(winners[contubernium])
+            if contubernium is None:
+                result = True
+                break
+        for contubernium in chain:
+            can_move[contubernium] = result
+
+    return [
+        (contubernium, position)
+        for contubernium, position in winners.items()
+        if can_move[contubernium]
+    ]
@@ -0,0 +1,163 @@
+import heapq
+import math
+import threading
+
+from battle.models import BattleContuberniumInTurn, Coordinates, \
+    BATTLEFIELD_LIMIT
+
+# Path searches cover the battlefield and the cells just outside it, which
+# contubernia step to when they leave the battle
+SEARCH_LIMIT = BATTLEFIELD_LIMIT + 1
+SEARCH_WIDTH = 2 * SEARCH_LIMIT + 1
+MAX_PATH_EXPANSIONS = 2000
+
+
+def euclidean_distance(start: Coordinates, goal: Coordinates):
+    return math.sqrt((start.x - goal.x)**2 + (start.z - goal.z)**2)
+
+
+NEIGHBOUR_STEPS = tuple(
+    (dx, dz, math.sqrt(dx ** 2 + dz ** 2))
+    for dx in (-1, 0, 1)
+    for dz in (-1, 0, 1)
+    if not dx == dz == 0
+)
+
+
+def coordinate_neighbours(coord: Coordinates):
+    result = []
+    for dx in (-1, 0, 1):
+        for dz in (-1, 0, 1):
+            if not dx == dz == 0:
+                result.append(Coordinates(coord.x + dx, coord.z + dz))
+    return result
+
+
+class PathSearchBuffers:
+    """
+    Per cell arrays reused by every path search of a thread, so that
+    searches don't allocate dicts. An entry only belongs to the current
+    search if its stamp is the number of the search.
+    """
+    def __init__(self):
+        size = SEARCH_WIDTH ** 2
+        self.search = 0
+        self.seen = [0] * size
+        self.closed = [0] * size
+        self.g_score = [0.0] * size
+        self.h_score = [0.0] * size
+        self.came_from = [-1] * size
+
+    def new_search(self):
+        self.search += 1
+        return self.search
+
+
+_path_search_buffers = threading.local()
+
+
+def path_search_buffers():
+    if not hasattr(_path_search_buffers, 'buffers'):
+        _path_search_buffers.buffers = PathSearchBuffers()
+    return _path_search_buffers.buffers
+
+
+def cell_index(coords):
+    x = coords[0] + SEARCH_LIMIT
+    z = coords[1] + SEARCH_LIMIT
+    if 0 <= x < SEARCH_WIDTH and 0 <= z < SEARCH_WIDTH:
+        return x * SEARCH_WIDTH + z
+    return None
+
+
+def cell_coordinates(index):
+    x, z = divmod(index, SEARCH_WIDTH)
+    return Coordinates(x - SEARCH_LIMIT, z - SEARCH_LIMIT)
+
+
+def find_path(battle_contubernium_in_turn: BattleContuberniumInTurn, target_distance_function, tile_availability_test) -> list:
+    """
+    A* search from the position of the contubernium to a cell where
+    target_distance_function is 0. Unavailable cells can be crossed at a
+    high cost. The search stays within SEARCH_LIMIT of the center of the
+    battlefield and gives up after MAX_PATH_EXPANSIONS cells; when it
+    gives up, or the target can't be reached, there is no path ([]).
+    """
+    starting_coordinates = battle_contubernium_in_turn.coordinates()
+    starting_distance = target_distance_function(starting_coordinates)
+    if starting_distance <= 0:
+        return [starting_coordinates]
+    start = cell_index(starting_coordinates)
+    if start is None:
+        return []
+
+    buffers = path_search_buffers()
+    search = buffers.new_search()
+    seen = buffers.seen
+    closed = buffers.closed
+    g_score = buffers.g_score
+    h_score = buffers.h_score
+    came_from = buffers.came_from
+
+    seen[start] = search
+    g_score[start] = 0
+    h_score[start] = starting_distance
+    came_from[start] = -1
+    # Ties in f are broken towards the cell closest to the target
+    open_heap = [(starting_distance, starting_distance, 0, start)]
+    pushed = 1
+    expansions = 0
+
+    while open_heap:
+        _, distance, _, current = heapq.heappop(open_heap)
+        if closed[current] == search:
+            continue
+        if distance <= 0:
+            return reconstruct_path(
+                current, start, came_from, tile_availability_test)
+        closed[current] = search
+        expansions += 1
+        if expansions >= MAX_PATH_EXPANSIONS:
+            break
+
+        x, z = cell_coordinates(current)
+        current_g_score = g_score[current]
+        for dx, dz, step_cost in NEIGHBOUR_STEPS:
+            neighbor = Coordinates(x + dx, z + dz)
+            neighbor_index = cell_index(neighbor)
+            if neighbor_index is None or closed[neighbor_index] == search:
+                continue
+            tentative_g_score = current_g_score + step_cost
+            if not tile_availability_test(neighbor):
+                tentative_g_score += 20
+            if seen[neighbor_index] == search:
+                if tentative_g_score >= g_score[neighbor_index]:
+                    continue
+            else:
+                seen[neighbor_index] = search
+                h_score[neighbor_index] = target_distance_function(neighbor)
+
+            came_from[neighbor_index] = current
+            g_score[neighbor_index] = tentative_g_score
+            heapq.heappush(open_heap, (
+                tentative_g_score + h_score[neighbor_index],
+                h_score[neighbor_index],
+                pushed,
+                neighbor_index
+            ))
+            pushed += 1
+
+    return []
+
+
+def reconstruct_path(goal, start, came_from, tile_availability_test):
+    total_path = [cell_coordinates(goal)]
+    current = goal
+    while came_from[current] != -1:
+        current = came_from[current]
+        coords = cell_coordinates(current)
+        if current != start and not tile_availability_test(coords):
+            return []
+        total_path.append(coords)
+    total_path.reverse()
+    return total_path
@@ -0,0 +1,121 @@
+import math
+from collections import defaultdict
+
+CELL_SIZE = 8
+
+
+def _cell(coords):
+    return coords[0] // CELL_SIZE, coords[1] // CELL_SIZE
+
+
+def _ring(center, radius):
+    cx, cz = center
+    if radius == 0:
+        yield center
+        return
+    for dx in range(-radius, radius + 1):
+        yield cx + dx, cz - radius
+        yield cx + dx, cz + radius
+    for dz in range(-radius + 1, radius):
+        yield cx - radius, cz + dz
+        yield cx + radius, cz + dz
+
+
+class SpatialIndex:
+    """
+    Hashed grid of the positions of the contubernia of a battle tick,
+    split in groups (usually battle sides). Answers "who is in this cell"
+    in O(1) and nearest-contubernium queries by only looking at the grid
+    cells around the probed coordinates.
+
+    Among contubernia at the same distance, the one that came first in
+    the list the index was built from wins.
+    """
+    def __init__(self, contubernia, group_function=lambda contubernium: None):
+        self.group_function = group_function
+        self.positions = {}
+        self.located = {}
+        self.rank = {}
+        self.cells = defaultdict(lambda: defaultdict(set))
+        self.extent = {}
+        for rank, contubernium in enumerate(contubernia):
+            self.rank[contubernium] = rank
+            self.add(contubernium, contubernium.coordinates())
+
+    def add(self, contubernium, coords):
+        group = self.group_function(contubernium)
+        cell = _cell(coords)
+        self.positions[coords] = contubernium
+        self.located[contubernium] = coords
+        self.cells[group][cell].add(contubernium)
+        min_x, min_z, max_x, max_z = self.extent.get(group, cell + cell)
+        self.extent[group] = (
+            min(min_x, cell[0]), min(min_z, cell[1]),
+            max(max_x, cell[0]), max(max_z, cell[1])
+        )
+
+    def move(self, contubernium, coords):
+        old_coords = self.located[contubernium]
+        if self.positions.get(old_coords) is contubernium:
+            del self.positions[old_coords]
+        self.cells[self.group_function(contubernium)][
+            _cell(old_coords)].discard(contubernium)
+        self.add(contubernium, coords)
+
+    def at(self, coords):
+        return self.positions.get(coords)
+
+    def __contains__(self, coords):
+        return coords in self.positions
+
+    def closest(self, coords, groups=None):
+        """
+        Closest contubernium to coords among the given groups (all of them
+        by default), and its distance. (None, None) if there is none.
+        """
+        if groups is None:
+            groups = self.cells.keys()
+        best = None
+        for group in groups:
+            candidate = self._closest_in_group(coords, group)
+            if candidate is not None and (
+                    best is None or candidate[:2] < best[:2]):
+                best = candidate
+        if best is None:
+            return None, None
+        distance, rank, contubernium = best
+        return contubernium, distance
+
+    def closest_enemy(self, coords, group):
+        return self.closest(
+            coords, [other for other in self.cells.keys() if other != group])
+
+    def _closest_in_group(self, coords, group):
+        if group not in self.extent:
+            return None
+        cells = self.cells[group]
+        center = _cell(coords)
+        min_x, min_z, max_x, max_z = self.extent[group]
+        max_radius = max(
+            abs(center[0] - min_x), abs(center[0] - max_x),
+            abs(center[1] - min_z), abs(center[1] - max_z)
+        )
+
+        best = None
+        for radius in range(max_radius + 1):
+            # Anything in this ring or further away is at least this far
+            if best is not None and best[0] < (radius - 1) * CELL_SIZE:
+                break
+            for cell in _ring(center, radius):
+                for contubernium in cells.get(cell, ()):
+                    position = self.located[contubernium]
+                    candidate = (
+                        math.sqrt((coords[0] - position[0])**2 +
+                                  (coords[1] - position[1])**2),
+                        self.rank[contubernium],
+                        contubernium
+                    )
+                    if best is None or candidate[:2] < best[:2]:
+                        best = candidate
+        return best
+
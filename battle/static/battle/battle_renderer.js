@@ -33,8 +33,130 @@ function BattleRenderer(battle_data) {
         zis.animated_update();
     };
 
+    zis.add_ticks = function (ticks_data) {
+        var battle = ticks_data.battle;
+        var keys = ['characters', 'units'];
+        for (var key_index in keys) {
+            var elements = zis[keys[key_index]];
+            var new_elements = battle[keys[key_index]];
+            for (var element_id in new_elements) {
+                if (Object.prototype.hasOwnProperty.call(
+                        new_elements, element_id) &&
+                        elements[element_id] === undefined) {
+                    elements[element_id] = new_elements[element_id];
+                }
+            }
+        }
+        for (var contubernium_id in battle.contubernia) {
+            if (zis.contubernia[contubernium_id] === undefined) {
+                zis.contubernia[contubernium_id] =
+                    battle.contubernia[contubernium_id];
+            }
+        }
+        zis.add_chunks(ticks_data.chunks);
+        for (var organization_id in battle.organizations) {
+            if (zis.organizations[organization_id] === undefined) {
+                zis.organizations[organization_id] =
+                    battle.organizations[organization_id];
+                zis.generate_organization_materials();
+            }
+        }
+        var was_showing_last = zis.showing_turn === zis.turn_count - 1;
+        zis.turn_count = battle.turn_count;
+        if (was_showing_last) zis.showing_turn = zis.turn_count - 1;
+        zis.animated_update();
+    };
+
+    zis.contubernium_in_turn = function (contubernium, turn) {
+        var tick = zis.ticks[turn];
+        var i = contubernium.index;
+        if (tick === undefined || i >= tick.x_pos.length ||
+                tick.x_pos[i] === ABSENT) {
+            return undefined;
+        }
+        var soldier_offset = tick.soldier_offsets[i];
+        return {
+            x_pos: tick.x_pos[i],
+            z_pos: tick.z_pos[i],
+            ammo_remaining: tick.ammo_remaining[i],
+            attack_type: zis.attack_types[tick.attack_type[i]],
+            attack_target: tick.attack_target[i] < 0 ?
+                null : zis.contubernium_ids[tick.attack_target[i]],
+            soldiers: tick.wound_status.subarray(
+                soldier_offset, soldier_offset + tick.soldier_counts[i])
+        };
+    };
+
     /* INTERNALS */
 
+    var ABSENT = -32768;
+
+    function decode_buffer(data) {
+        var bytes = atob(data);
+        var result = new Uint8Array(bytes.length);
+        for (var i = 0; i < bytes.length; i++) {
+            result[i] = bytes.charCodeAt(i);
+        }
+        return result.buffer;
+    }
+
+    zis.add_chunks = function (chunks) {
+        var keys = ['characters', 'units'];
+        for (var i = 0; i < chunks.length; i++) {
+            for (var key_index in keys) {
+                var elements = zis[keys[key_index]];
+                var chunk_elements = chunks[i][keys[key_index]];
+                for (var element_id in chunk_elements) {
+                    if (Object.prototype.hasOwnProperty.call(
+                            chunk_elements, element_id)) {
+                        $.extend(elements[element_id].in_turn,
+                            chunk_elements[element_id].in_turn);
+                    }
+                }
+            }
+            zis.add_replay(chunks[i].replay);
+        }
+    };
+
+    zis.add_replay = function (replay) {
+        var contubernia = replay.contubernium_ids.length;
+        for (var i = 0; i < contubernia; i++) {
+            zis.contubernia[replay.contubernium_ids[i]].index = i;
+        }
+        zis.contubernium_ids = replay.contubernium_ids;
+        zis.attack_types = replay.attack_types;
+
+        var x_pos = new Int16Array(decode_buffer(replay.x_pos));
+        var z_pos = new Int16Array(decode_buffer(replay.z_pos));
+        var ammo_remaining = new Int16Array(
+            decode_buffer(replay.ammo_remaining));
+        var attack_type = new Uint8Array(decode_buffer(replay.attack_type));
+        var attack_target = new Int32Array(
+            decode_buffer(replay.attack_target));
+        var soldier_offsets = new Int32Array(
+            decode_buffer(replay.soldier_offsets));
+        var soldier_counts = new Uint8Array(
+            decode_buffer(replay.soldier_counts));
+        var wound_status = new Uint8Array(decode_buffer(replay.wound_status));
+
+        // One set of views per turn over the decoded buffers
+        var turns = contubernia ? x_pos.length / contubernia : 0;
+        for (var row = 0; row < turns; row++) {
+            var start = row * contubernia;
+            var end = start + contubernia;
+            zis.ticks[replay.first_turn + row] = {
+                x_pos: x_pos.subarray(start, end),
+                z_pos: z_pos.subarray(start, end),
+                ammo_remaining: ammo_remaining.subarray(start, end),
+                attack_type: attack_type.subarray(start, end),
+                attack_target: attack_target.subarray(start, end),
+                soldier_offsets: soldier_offsets.subarray(start, end),
+                soldier_counts: soldier_counts.subarray(start, end),
+                wound_status: wound_status
+            };
+        }
+    };
+
     zis.render_ground = function () {
         var ground = new THREE.Mesh(zis.ground_geometry, zis.ground_material);
         ground.position.x = 0;
@@ -93,9 +215,11 @@ function BattleRenderer(battle_data) {
             zis.remove_attack_display(contubernium);
         }
 
-        var contubernium_in_turn = contubernium.in_turn[zis.showing_turn];
+        var contubernium_in_turn = zis.contubernium_in_turn(
+            contubernium, zis.showing_turn);
         var target = zis.contubernia[contubernium_in_turn.attack_target];
-        var target_in_turn = target.in_turn[zis.showing_turn];
+        var target_in_turn = zis.contubernium_in_turn(
+            target, zis.showing_turn);
         var geometry = new THREE.Geometry();
         geometry.vertices.push(new THREE.Vector3(
             contubernium_in_turn.x_pos, 1, contubernium_in_turn.z_pos));
@@ -122,8 +246,8 @@ function BattleRenderer(battle_data) {
             if (Object.prototype.hasOwnProperty.call(
                     zis.contubernia, contubernium_id)) {
                 var contubernium = zis.contubernia[contubernium_id];
-                var contubernium_in_turn = contubernium.in_turn[
-                    zis.showing_turn];
+                var contubernium_in_turn = zis.contubernium_in_turn(
+                    contubernium, zis.showing_turn);
 
                 if (contubernium.mesh === undefined) {
                     zis.add_contubernium(contubernium, contubernium_in_turn);
@@ -247,12 +371,14 @@ function BattleRenderer(battle_data) {
 
     /* DATA */
 
-    zis.organizations = battle_data.organizations;
-    zis.characters = battle_data.characters;
-    zis.units = battle_data.units;
-    zis.contubernia = battle_data.contubernia;
-    zis.battle_ticks_per_turn = battle_data.battle_ticks_per_turn;
-    zis.turn_count = battle_data.turn_count;
+    zis.organizations = battle_data.battle.organizations;
+    zis.characters = battle_data.battle.characters;
+    zis.units = battle_data.battle.units;
+    zis.contubernia = battle_data.battle.contubernia;
+    zis.battle_ticks_per_turn = battle_data.battle.battle_ticks_per_turn;
+    zis.turn_count = battle_data.battle.turn_count;
+    zis.ticks = [];
+    zis.add_chunks(battle_data.chunks);
 
     /* VARS */
     zis.showing_turn =
@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.urls.base import reverse
 
 from battle.battle_init import start_battle
+from battle.battle_simulation import BattleSimulation
 from battle.battle_tick import battle_tick
 from battle.models import Battle, BattleUnit, Order, BattleOrganization, \
     BattleCharacter, BattleSoldier, BattleSoldierInTurn
@@ -189,3 +190,8 @@ class TestBarbarianBattle(TestCase):
         battle_unit = BattleUnit.objects.get(owner=None)
         self.assertEqual(
             battle_unit.get_order().what, Order.ADVANCE_IN_FORMATION)
+
+        # The decision doesn't change, so the order is not written again
+        simulation = BattleSimulation(self.battle)
+        simulation.run(2)
+        self.assertFalse(simulation.dirty_orders)
@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls.base import reverse
+
+from battle.battle_archive import archive_battle, \
+    BattleNotFinishedException
+from battle.battle_init import initialize_from_conflict, start_battle
+from battle.battle_renderer import get_battle_replay
+from battle.battle_tick import battle_tick
+from battle.models import Battle, BattleTurn, BattleUnitInTurn, \
+    BattleContuberniumInTurn, BattleSoldierInTurn, BattleCharacterInTurn, \
+    BattleSideSummary
+from organization.models.organization import Organization
+from turn.battle import worldwide_battle_archival
+from unit.models import WorldUnit
+from world.initialization import initialize_unit
+from world.models.geography import Tile, World
+
+
+class TestBattleArchive(TestCase):
+    fixtures = ['simple_world']
+
+    def setUp(self):
+        self.client.post(
+            reverse('account:login'),
+            {'username': 'alice', 'password': 'test'},
+        )
+        self.client.get(
+            reverse('character:activate', kwargs={'char_id': 5}),
+            follow=True
+        )
+        initialize_unit(WorldUnit.objects.get(id=1))
+        initialize_unit(WorldUnit.objects.get(id=2))
+        initialize_unit(WorldUnit.objects.get(id=3))
+        tile = Tile.objects.get(id=108)
+        self.battle = Battle.objects.create(tile=tile, start_turn=0)
+        initialize_from_conflict(
+            self.battle,
+            [
+                [Organization.objects.get(id=105)],
+                [Organization.objects.get(id=112)]
+            ],
+            tile
+        )
+        start_battle(self.battle)
+        battle_tick(self.battle)
+        battle_tick(self.battle)
+
+    def finish_battle(self):
+        self.battle.current = False
+        self.battle.save()
+
+    def test_archive_battle(self):
+        self.finish_battle()
+        battle_data = get_battle_replay(self.battle).get_ticks_json()
+
+        replay = archive_battle(self.battle)
+
+        self.assertTrue(replay.archived)
+        self.assertEqual(replay.get_ticks_json(), battle_data)
+        for model in (BattleSoldierInTurn, BattleContuberniumInTurn,
+                      BattleUnitInTurn, BattleCharacterInTurn):
+            self.assertFalse(model.objects.filter(
+                battle_turn__battle=self.battle).exists())
+        self.assertFalse(BattleTurn.objects.filter(
+            battle=self.battle).exists())
+        self.assertEqual(get_battle_replay(self.battle).get_ticks_json(),
+                         battle_data)
+
+    def test_side_summaries(self):
+        self.finish_battle()
+        archive_battle(self.battle)
+
+        side0 = BattleSideSummary.objects.get(
+            battle_side__battle=self.battle, battle_side__z=False)
+        self.assertEqual(side0.soldiers, 30)
+        side1 = BattleSideSummary.objects.get(
+            battle_side__battle=self.battle, battle_side__z=True)
+        self.assertEqual(side1.soldiers, 90)
+
+    def test_views_of_archived_battle(self):
+        self.finish_battle()
+        archive_battle(self.battle)
+
+        response = self.client.get(reverse(
+            'battle:battlefield_iframe',
+            kwargs={'battle_id': self.battle.id}
+        ))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse(
+            'battle:battlefield_ticks',
+            kwargs={'battle_id': self.battle.id}
+        ), {'after': 1})
+        self.assertEqual(response.status_code, 200)
+        chunks = response.json()['chunks']
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0]['last_turn'], 2)
+
+    def test_current_battle_is_not_archived(self):
+        with self.assertRaises(BattleNotFinishedException):
+            archive_battle(self.battle)
+
+        worldwide_battle_archival(World.objects.get(id=2))
+        self.assertTrue(BattleTurn.objects.filter(
+            battle=self.battle).exists())
+
+    def test_archival_in_turn(self):
+        self.finish_battle()
+        worldwide_battle_archival(World.objects.get(id=2))
+        self.assertTrue(get_battle_replay(self.battle).archived)
+
+    def test_archive_battles_command(self):
+        self.finish_battle()
+        out = StringIO()
+        call_command('archive_battles', stdout=out)
+        self.assertIn('1 battles archived', out.getvalue())
+        self.assertTrue(get_battle_replay(self.battle).archived)
@@ -1,12 +1,14 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.urls.base import reverse
 
 from battle.battle_init import initialize_from_conflict, start_battle
-from battle.battle_tick import battle_tick, optimistic_move_desire_formulation, \
-    optimistic_move_desire_resolving, \
-    safe_move, euclidean_distance
+from battle.battle_simulation import BattleSimulation
+from battle.battle_tick import battle_tick
 from battle.models import Battle, BattleUnit, \
     BattleContuberniumInTurn, BattleUnitInTurn, Order, Coordinates
+from battle.pathfinding import euclidean_distance
 from organization.models.organization import Organization
 from turn.battle import trigger_battles_in_tile
 from unit.models import WorldUnit
@@ -158,181 +160,102 @@ class TestBattleMovement(TestCase):
         #order3.refresh_from_db()
         #self.assertTrue(order3.done)
 
+    def move_only(self, contubernium_in_turn, target):
+        """
+        Makes the simulation move only the given contubernium, searching a
+        path to target, and every other contubernium stand still. Its unit
+        has to stand, or it would take greedy flow steps instead.
+        """
+        def get_target_distance_function(simulation, contubernium):
+            if contubernium.battle_contubernium.id != \
+                    contubernium_in_turn.battle_contubernium_id:
+                return None
+            return lambda coords: euclidean_distance(coords, target)
+        return mock.patch.object(
+            BattleSimulation, 'get_target_distance_function',
+            autospec=True, side_effect=get_target_distance_function
+        )
+
+    def get_contubernium(self, contubernium):
+        return BattleContuberniumInTurn.objects.get(
+            battle_turn=self.battle.get_latest_turn(),
+            battle_contubernium=contubernium.battle_contubernium
+        )
+
     def test_move_avoiding_single_obstacle(self):
         unit1 = WorldUnit.objects.get(id=1)
         unit3 = WorldUnit.objects.get(id=3)
+        unit3.default_battle_orders = Order.objects.create(what=Order.STAND)
+        unit3.save()
 
         start_battle(self.battle)
         battle_unit1 = BattleUnit.objects.get(world_unit=unit1)
         battle_unit3 = BattleUnit.objects.get(world_unit=unit3)
 
         contub1 = BattleContuberniumInTurn.objects.filter(battle_contubernium__battle_unit=battle_unit1)[0]
-        contub1.x_pos = 100
-        contub1.z_pos = 100
+        contub1.x_pos = 40
+        contub1.z_pos = 40
         contub1.save()
 
         contub3 = BattleContuberniumInTurn.objects.filter(battle_contubernium__battle_unit=battle_unit3)[0]
-        contub3.x_pos = 99
-        contub3.z_pos = 100
+        contub3.x_pos = 39
+        contub3.z_pos = 40
         contub3.save()
 
         self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
 
-        self.assertFalse(contub1.desires_pos)
-        self.assertEqual(contub1.x_pos, 100)
-        self.assertEqual(contub1.z_pos, 100)
-        self.assertFalse(contub1.moved_this_turn)
+        with self.move_only(contub3, Coordinates(x=41, z=40)):
+            battle_tick(self.battle)
 
-        self.assertFalse(contub3.desires_pos)
-        self.assertEqual(contub3.x_pos, 99)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertFalse(contub3.moved_this_turn)
-
-        contub3_movement_target = Coordinates(x=101, z=100)
-
-        def target_distance_function(coords):
-            return euclidean_distance(coords, contub3_movement_target)
-        optimistic_move_desire_formulation(contub3, target_distance_function)
-
-        contub1.refresh_from_db()
-        self.assertFalse(contub1.desires_pos)
-        self.assertEqual(contub1.x_pos, 100)
-        self.assertEqual(contub1.z_pos, 100)
-        self.assertFalse(contub1.moved_this_turn)
-
-        contub3.refresh_from_db()
-        self.assertTrue(contub3.desires_pos)
-        self.assertEqual(contub3.desired_x_pos, 100)
-        self.assertEqual(contub3.desired_z_pos, 100)
-        self.assertEqual(contub3.x_pos, 99)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertFalse(contub3.moved_this_turn)
-
-        optimistic_move_desire_resolving(self.battle)
-
-        contub1.refresh_from_db()
-        self.assertFalse(contub1.desires_pos)
-        self.assertEqual(contub1.x_pos, 100)
-        self.assertEqual(contub1.z_pos, 100)
-        self.assertFalse(contub1.moved_this_turn)
-
-        contub3.refresh_from_db()
-        self.assertFalse(contub3.desires_pos)
-        self.assertEqual(contub3.x_pos, 99)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertFalse(contub3.moved_this_turn)
-        self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
+            # The way is blocked, so it steps around the obstacle
+            self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
+            contub1 = self.get_contubernium(contub1)
+            self.assertEqual(contub1.coordinates(), Coordinates(x=40, z=40))
+            self.assertFalse(contub1.moved_this_turn)
+            contub3 = self.get_contubernium(contub3)
+            self.assertNotEqual(contub3.x_pos, 39)
+            self.assertNotEqual(contub3.z_pos, 40)
+            self.assertTrue(contub3.moved_this_turn)
 
-        safe_move(contub3, target_distance_function)
-        contub3.refresh_from_db()
-        self.assertFalse(contub3.desires_pos)
-        self.assertNotEqual(contub3.x_pos, 99)
-        self.assertNotEqual(contub3.z_pos, 100)
-        self.assertNotEqual(contub3.coordinates(), contub1.coordinates())
-        self.assertTrue(contub3.moved_this_turn)
+            battle_tick(self.battle)
 
         self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
-
-        optimistic_move_desire_formulation(contub3, target_distance_function)
-        optimistic_move_desire_resolving(self.battle)
-        contub3.refresh_from_db()
+        contub3 = self.get_contubernium(contub3)
         self.assertFalse(contub3.desires_pos)
-        self.assertEqual(contub3.x_pos, 101)
-        self.assertEqual(contub3.z_pos, 100)
+        self.assertEqual(contub3.coordinates(), Coordinates(x=41, z=40))
         self.assertTrue(contub3.moved_this_turn)
 
     def test_move_avoiding_wall_obstacle(self):
         unit1 = WorldUnit.objects.get(id=1)
         unit3 = WorldUnit.objects.get(id=3)
+        unit3.default_battle_orders = Order.objects.create(what=Order.STAND)
+        unit3.save()
 
         start_battle(self.battle)
         battle_unit1 = BattleUnit.objects.get(world_unit=unit1)
         battle_unit3 = BattleUnit.objects.get(world_unit=unit3)
 
         obstacles = BattleContuberniumInTurn.objects.filter(battle_contubernium__battle_unit=battle_unit1)
-        contub1 = obstacles[0]
-        contub1.x_pos = 100
-        contub1.z_pos = 99
-        contub1.save()
-        contub1 = obstacles[1]
-        contub1.x_pos = 100
-        contub1.z_pos = 101
-        contub1.save()
-        contub1 = obstacles[2]
-        contub1.x_pos = 100
-        contub1.z_pos = 100
-        contub1.save()
+        for obstacle, z_pos in zip(obstacles[:3], (39, 41, 40)):
+            obstacle.x_pos = 40
+            obstacle.z_pos = z_pos
+            obstacle.save()
 
         contub3 = BattleContuberniumInTurn.objects.filter(battle_contubernium__battle_unit=battle_unit3)[0]
-        contub3.x_pos = 99
-        contub3.z_pos = 100
+        contub3.x_pos = 39
+        contub3.z_pos = 40
         contub3.save()
 
         self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
 
-        self.assertFalse(contub1.desires_pos)
-        self.assertEqual(contub1.x_pos, 100)
-        self.assertEqual(contub1.z_pos, 100)
-        self.assertFalse(contub1.moved_this_turn)
+        with self.move_only(contub3, Coordinates(x=41, z=40)):
+            for i in range(4):
+                battle_tick(self.battle)
+                self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
 
+        contub3 = self.get_contubernium(contub3)
         self.assertFalse(contub3.desires_pos)
-        self.assertEqual(contub3.x_pos, 99)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertFalse(contub3.moved_this_turn)
-
-        contub3_movement_target = Coordinates(x=101, z=100)
-
-        def target_distance_function(coords):
-            return euclidean_distance(coords, contub3_movement_target)
-        optimistic_move_desire_formulation(contub3, target_distance_function)
-
-        contub1.refresh_from_db()
-        self.assertFalse(contub1.desires_pos)
-        self.assertEqual(contub1.x_pos, 100)
-        self.assertEqual(contub1.z_pos, 100)
-        self.assertFalse(contub1.moved_this_turn)
-
-        contub3.refresh_from_db()
-        self.assertTrue(contub3.desires_pos)
-        self.assertEqual(contub3.desired_x_pos, 100)
-        self.assertEqual(contub3.desired_z_pos, 100)
-        self.assertEqual(contub3.x_pos, 99)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertFalse(contub3.moved_this_turn)
-
-        optimistic_move_desire_resolving(self.battle)
-
-        contub1.refresh_from_db()
-        self.assertFalse(contub1.desires_pos)
-        self.assertEqual(contub1.x_pos, 100)
-        self.assertEqual(contub1.z_pos, 100)
-        self.assertFalse(contub1.moved_this_turn)
-
-        contub3.refresh_from_db()
-        self.assertFalse(contub3.desires_pos)
-        self.assertEqual(contub3.x_pos, 99)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertFalse(contub3.moved_this_turn)
-        self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
-
-        safe_move(contub3, target_distance_function)
-        contub3.refresh_from_db()
-        self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
-        safe_move(contub3, target_distance_function)
-        contub3.refresh_from_db()
-        self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
-        safe_move(contub3, target_distance_function)
-        contub3.refresh_from_db()
-        self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
-        safe_move(contub3, target_distance_function)
-        contub3.refresh_from_db()
-        self.assertFalse(self.battle.get_latest_turn().test_contubernia_superposition())
-
-        contub3.refresh_from_db()
-        self.assertFalse(contub3.desires_pos)
-        self.assertEqual(contub3.x_pos, 101)
-        self.assertEqual(contub3.z_pos, 100)
-        self.assertTrue(contub3.moved_this_turn)
+        self.assertEqual(contub3.coordinates(), Coordinates(x=41, z=40))
 
     def test_move_while_unit_blocks(self):
         unit1 = WorldUnit.objects.get(id=1)
@@ -0,0 +1,117 @@
+from django.test import TestCase
+
+from battle.battle_init import initialize_from_conflict, start_battle
+from battle.battle_renderer import render_battle_for_view, \
+    render_battle_turns, decode_array, REPLAY_ARRAYS, ATTACK_TYPES
+from battle.battle_simulation import battle_turn
+from battle.models import Battle, BattleContuberniumInTurn, Order
+from organization.models.organization import Organization
+from unit.models import WorldUnit
+from world.initialization import initialize_unit
+from world.models.geography import Tile
+
+
+class TestBattleRenderer(TestCase):
+    fixtures = ['simple_world']
+
+    def setUp(self):
+        for unit in WorldUnit.objects.filter(id__in=(1, 2, 3)):
+            initialize_unit(unit)
+            unit.default_battle_orders = Order.objects.create(
+                what=Order.CHARGE)
+            unit.save()
+        tile = Tile.objects.get(id=108)
+        self.battle = Battle.objects.create(tile=tile, start_turn=0)
+        initialize_from_conflict(
+            self.battle,
+            [
+                [Organization.objects.get(id=105)],
+                [Organization.objects.get(id=112)]
+            ],
+            tile
+        )
+        start_battle(self.battle)
+        battle_turn(self.battle)
+        battle_turn(self.battle)
+
+    def test_contubernia_replay(self):
+        data = render_battle_for_view(self.battle)
+        replay = render_battle_turns(self.battle, 0)['replay']
+        arrays = {
+            name: decode_array(replay[name], dtype)
+            for name, dtype in REPLAY_ARRAYS.items()
+        }
+        contubernia = len(replay['contubernium_ids'])
+        self.assertEqual(
+            len(arrays['x_pos']), contubernia * data['turn_count'])
+        self.assertEqual(replay['attack_types'], ATTACK_TYPES)
+
+        rows = BattleContuberniumInTurn.objects.filter(
+            battle_turn__battle=self.battle)
+        self.assertTrue(rows.filter(
+            contubernium_attacked_this_turn__isnull=False).exists())
+        for row in rows:
+            i = row.battle_turn.num * contubernia + \
+                replay['contubernium_ids'].index(row.battle_contubernium_id)
+            self.assertEqual(arrays['x_pos'][i], row.x_pos)
+            self.assertEqual(arrays['z_pos'][i], row.z_pos)
+            self.assertEqual(arrays['ammo_remaining'][i], row.ammo_remaining)
+            self.assertEqual(
+                ATTACK_TYPES[arrays['attack_type'][i]],
+                row.attack_type_this_turn
+            )
+            target = row.contubernium_attacked_this_turn
+            self.assertEqual(
+                arrays['attack_target'][i],
+                replay['contubernium_ids'].index(
+                    target.battle_contubernium_id) if target else -1
+            )
+
+        for turn, soldiers in self.battle.get_soldier_states_by_turn():
+            for contubernium_id in replay['contubernium_ids']:
+                i = turn.num * contubernia + \
+                    replay['contubernium_ids'].index(contubernium_id)
+                start = arrays['soldier_offsets'][i]
+                self.assertEqual(
+                    arrays['wound_status'][
+                        start:start + arrays['soldier_counts'][i]].tolist(),
+                    [
+                        soldier.wound_status
+                        for soldier_id, soldier in sorted(soldiers.items())
+                        if soldier.battle_contubernium_id == contubernium_id
+                    ]
+                )
+
+    def test_turns_from_a_turn_on(self):
+        first_turn = self.battle.get_latest_turn().num - 2
+        chunk = render_battle_turns(self.battle, first_turn)
+        self.assertEqual(chunk['first_turn'], first_turn)
+        self.assertEqual(
+            chunk['last_turn'], self.battle.get_latest_turn().num)
+
+        replay = render_battle_turns(self.battle, 0)['replay']
+        contubernia = len(replay['contubernium_ids'])
+        full = {
+            name: decode_array(replay[name], dtype)
+            for name, dtype in REPLAY_ARRAYS.items()
+        }
+        part = {
+            name: decode_array(chunk['replay'][name], dtype)
+            for name, dtype in REPLAY_ARRAYS.items()
+        }
+        self.assertEqual(chunk['replay']['first_turn'], first_turn)
+        for name in ('x_pos', 'z_pos', 'attack_target', 'soldier_counts'):
+            self.assertEqual(
+                part[name].tolist(),
+                full[name][first_turn * contubernia:].tolist()
+            )
+        wound_start = full['soldier_offsets'][first_turn * contubernia]
+        self.assertEqual(
+            part['wound_status'].tolist(),
+            full['wound_status'][wound_start:].tolist()
+        )
+        for unit_id, unit in chunk['units'].items():
+            self.assertEqual(
+                set(unit['in_turn']),
+                set(range(first_turn, chunk['last_turn'] + 1))
+            )
@@ -0,0 +1,236 @@
+from django.test import TestCase
+
+from battle.battle_init import initialize_from_conflict, start_battle
+from battle.battle_simulation import BattleSimulation, battle_turn
+from battle.models import Battle, BattleUnit, BattleTurn, \
+    BattleContuberniumInTurn, BattleSoldierInTurn, BattleUnitInTurn, \
+    BattleCharacterInTurn, Order
+from finem_imperii.app_settings import BATTlE_TICKS_PER_TURN
+from organization.models.organization import Organization
+from unit.models import WorldUnit
+from world.initialization import initialize_unit
+from world.models.geography import Tile
+from world.models.npcs import NPC
+
+
+class TestBattleSimulation(TestCase):
+    fixtures = ['simple_world']
+
+    def setUp(self):
+        initialize_unit(WorldUnit.objects.get(id=1))
+        initialize_unit(WorldUnit.objects.get(id=2))
+        initialize_unit(WorldUnit.objects.get(id=3))
+        tile = Tile.objects.get(id=108)
+        self.battle = Battle.objects.create(tile=tile, start_turn=0)
+        initialize_from_conflict(
+            self.battle,
+            [
+                [Organization.objects.get(id=105)],
+                [Organization.objects.get(id=112)]
+            ],
+            tile
+        )
+
+    def simulate(self, ticks):
+        simulation = BattleSimulation(self.battle)
+        simulation.run(ticks)
+        simulation.save()
+
+    def test_ticks_are_saved(self):
+        start_battle(self.battle)
+
+        self.simulate(2)
+
+        self.assertEqual(self.battle.get_latest_turn().num, 2)
+        self.assertEqual(BattleContuberniumInTurn.objects.count(), 16*3)
+        # Soldiers only get a row when their state changes
+        self.assertEqual(BattleSoldierInTurn.objects.count(), 120)
+        self.assertEqual(BattleUnitInTurn.objects.count(), 3*3)
+        self.assertEqual(BattleCharacterInTurn.objects.count(), 2*3)
+        for turn in BattleTurn.objects.filter(battle=self.battle):
+            self.assertFalse(turn.test_contubernia_superposition())
+            for bcuit in BattleContuberniumInTurn.objects.filter(
+                    battle_turn=turn):
+                self.assertEqual(bcuit.battle_unit_in_turn.battle_turn, turn)
+            for bsit in BattleSoldierInTurn.objects.filter(battle_turn=turn):
+                self.assertEqual(
+                    bsit.battle_contubernium_in_turn.battle_turn, turn)
+            self.assertEqual(len(turn.get_soldier_states()), 120)
+
+        self.assertEqual(
+            BattleUnitInTurn.objects.get(
+                battle_turn=self.battle.get_latest_turn(),
+                battle_unit__world_unit__id=2
+            ).order.what,
+            Order.CHARGE
+        )
+        self.assertEqual(
+            BattleUnitInTurn.objects.get(
+                battle_turn=self.battle.get_latest_turn(),
+                battle_unit__world_unit__id=1
+            ).order.what,
+            Order.ADVANCE_IN_FORMATION
+        )
+
+    def test_running_does_not_query(self):
+        start_battle(self.battle)
+        WorldUnit.objects.filter(id=2).update(owner_character=None)
+
+        simulation = BattleSimulation(self.battle)
+        with self.assertNumQueries(0):
+            simulation.run(2)
+        self.assertTrue(simulation.dirty_orders)
+
+    def test_move_while_unit_blocks(self):
+        unit1 = WorldUnit.objects.get(id=1)
+        unit3 = WorldUnit.objects.get(id=3)
+
+        order3 = Order.objects.create(what=Order.STAND)
+        unit3.battle_line = 2
+        unit3.default_battle_orders = order3
+        unit3.save()
+
+        start_battle(self.battle)
+        battle_unit1 = BattleUnit.objects.get(world_unit=unit1)
+
+        self.simulate(3)
+
+        for num, expected_advance in ((1, 1), (2, 2), (3, 2)):
+            for bcuit in BattleContuberniumInTurn.objects.filter(
+                battle_turn__battle=self.battle,
+                battle_turn__num=num,
+                battle_contubernium__battle_unit=battle_unit1
+            ):
+                self.assertEqual(
+                    bcuit.z_pos,
+                    bcuit.battle_contubernium.starting_z_pos -
+                    expected_advance
+                )
+
+    def test_move_order_done(self):
+        unit = WorldUnit.objects.get(id=1)
+        start_battle(self.battle)
+        battle_unit = BattleUnit.objects.get(world_unit=unit)
+        order = Order.objects.create(
+            what=Order.MOVE,
+            target_location_x=battle_unit.starting_x_pos,
+            target_location_z=battle_unit.starting_z_pos - 1
+        )
+        unit.default_battle_orders = order
+        unit.save()
+
+        self.simulate(2)
+
+        order.refresh_from_db()
+        self.assertTrue(order.done)
+
+    def test_battle_turn_until_end(self):
+        for unit in WorldUnit.objects.filter(id__in=(1, 2, 3)):
+            unit.default_battle_orders = Order.objects.create(
+                what=Order.CHARGE)
+            unit.save()
+        start_battle(self.battle)
+
+        for i in range(4):
+            battle_turn(self.battle)
+
+        self.battle.refresh_from_db()
+        latest_turn = self.battle.get_latest_turn()
+        self.assertLessEqual(latest_turn.num, 4 * BATTlE_TICKS_PER_TURN)
+        if latest_turn.num < 4 * BATTlE_TICKS_PER_TURN:
+            self.assertFalse(self.battle.current)
+        self.assertTrue(BattleContuberniumInTurn.objects.filter(
+            battle_turn__battle=self.battle,
+            attack_type_this_turn=BattleContuberniumInTurn.MELEE_ATTACK,
+            contubernium_attacked_this_turn__isnull=False
+        ).exists())
+
+        dead_soldiers = BattleSoldierInTurn.objects.filter(
+            battle_turn__battle=self.battle,
+            wound_status=BattleSoldierInTurn.DEAD
+        ).values_list('battle_soldier__world_npc_id', flat=True)
+        self.assertTrue(dead_soldiers)
+        for npc in NPC.objects.filter(id__in=dead_soldiers):
+            self.assertEqual(npc.wound_status, BattleSoldierInTurn.DEAD)
+            self.assertIsNone(npc.unit)
+
+    def test_soldier_states_are_rebuilt(self):
+        for unit in WorldUnit.objects.filter(id__in=(1, 2, 3)):
+            unit.default_battle_orders = Order.objects.create(
+                what=Order.CHARGE)
+            unit.save()
+        start_battle(self.battle)
+        battle_turn(self.battle)
+        battle_turn(self.battle)
+
+        previous = {}
+        for turn, soldiers in self.battle.get_soldier_states_by_turn():
+            self.assertEqual(soldiers, turn.get_soldier_states())
+            for battle_soldier_id, soldier in soldiers.items():
+                if battle_soldier_id in previous:
+                    self.assertNotEqual(
+                        previous[battle_soldier_id].wound_status,
+                        BattleSoldierInTurn.DEAD
+                    )
+                    self.assertGreaterEqual(
+                        soldier.wound_status,
+                        previous[battle_soldier_id].wound_status
+                    )
+            for row in BattleSoldierInTurn.objects.filter(battle_turn=turn):
+                self.assertEqual(
+                    soldiers[row.battle_soldier_id].wound_status,
+                    row.wound_status
+                )
+            previous = soldiers
+        self.assertLess(
+            BattleSoldierInTurn.objects.count(),
+            120 * (self.battle.get_latest_turn().num + 1)
+        )
+
+    def test_soldier_snapshots(self):
+        for unit in WorldUnit.objects.filter(id__in=(1, 2, 3)):
+            unit.default_battle_orders = Order.objects.create(
+                what=Order.CHARGE)
+            unit.save()
+        start_battle(self.battle)
+        battle_turn(self.battle)
+        battle_turn(self.battle)
+
+        snapshot_turns = self.battle.battleturn_set.filter(
+            soldier_snapshot__isnull=False).order_by('num')
+        self.assertEqual(
+            [turn.num for turn in snapshot_turns],
+            [BATTlE_TICKS_PER_TURN, self.battle.get_latest_turn().num]
+        )
+        replayed = dict(
+            (turn.num, soldiers) for turn, soldiers
+            in self.battle.get_soldier_states_by_turn()
+        )
+        for turn in snapshot_turns:
+            self.assertEqual(turn.get_soldier_snapshot(), replayed[turn.num])
+
+        # Only the turns from the latest snapshot on are read
+        latest = self.battle.get_latest_turn()
+        BattleSoldierInTurn.objects.filter(
+            battle_turn__num__lt=latest.num).delete()
+        self.assertEqual(latest.get_soldier_states(), replayed[latest.num])
+
+    def test_simulation_is_deterministic(self):
+        for unit in WorldUnit.objects.filter(id__in=(1, 2, 3)):
+            unit.default_battle_orders = Order.objects.create(
+                what=Order.CHARGE)
+            unit.save()
+        start_battle(self.battle)
+
+        results = []
+        for i in range(2):
+            # Nothing is saved, both runs start from the same turn
+            simulation = BattleSimulation(
+                Battle.objects.get(id=self.battle.id))
+            simulation.run(40)
+            results.append([
+                (contubernium.coordinates(), contubernium.wounds.tolist())
+                for contubernium in simulation.contubernia
+            ])
+            self.assertTrue(simulation.npc_hits)
+        self.assertEqual(results[0], results[1])
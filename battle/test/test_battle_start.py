@@ -1,16 +1,21 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.urls.base import reverse
 
 from battle.battle_init import initialize_from_conflict, start_battle
 from battle.battle_tick import battle_tick
-from battle.models import Battle, BattleCharacter, BattleUnit, \
-    BattleContubernium, BattleSoldier, BattleOrganization, \
+from battle.models import Battle, BattleCharacter, BattleFormation, \
+    BattleUnit, BattleContubernium, BattleSoldier, BattleOrganization, \
     BattleContuberniumInTurn, BattleSoldierInTurn, BattleUnitInTurn, Order
 from organization.models.organization import Organization
 from organization.models.relationship import MilitaryStance
 from turn.barbarians import generate_barbarian_unit
 from turn.battle import trigger_battles_in_tile, battle_joins, \
-    worldwide_trigger_battles, worldwide_battle_joins
+    worldwide_trigger_battles, worldwide_battle_joins, \
+    worldwide_battle_turns
+from turn.models import TurnRun
+from turn.phases import phase, run_phase
 from unit.models import WorldUnit
 from world.initialization import initialize_unit, initialize_settlement
 from world.models.geography import Tile, World, Settlement
@@ -148,7 +153,9 @@ class TestBattleStart(TestCase):
         self.assertTrue(BattleContuberniumInTurn.objects.exists())
         self.assertEqual(BattleContuberniumInTurn.objects.count(), 16*2)
         self.assertTrue(BattleSoldierInTurn.objects.exists())
-        self.assertEqual(BattleSoldierInTurn.objects.count(), 120*2)
+        self.assertEqual(BattleSoldierInTurn.objects.count(), 120)
+        self.assertEqual(
+            len(self.battle.get_latest_turn().get_soldier_states()), 120)
 
         response = self.client.get(self.battle.get_absolute_url())
         self.assertEqual(response.status_code, 200)
@@ -173,7 +180,9 @@ class TestBattleStart(TestCase):
         self.assertTrue(BattleContuberniumInTurn.objects.exists())
         self.assertEqual(BattleContuberniumInTurn.objects.count(), 16*3)
         self.assertTrue(BattleSoldierInTurn.objects.exists())
-        self.assertEqual(BattleSoldierInTurn.objects.count(), 120*3)
+        self.assertEqual(BattleSoldierInTurn.objects.count(), 120)
+        self.assertEqual(
+            len(self.battle.get_latest_turn().get_soldier_states()), 120)
 
         response = self.client.get(self.battle.get_absolute_url())
         self.assertEqual(response.status_code, 200)
@@ -209,6 +218,62 @@ class TestBattleStart(TestCase):
 
         start_battle(self.battle)
 
+    def start_in_formation(self, formation, element_size, spacing):
+        for organization_id in (105, 112):
+            settings = Organization.objects.get(
+                id=organization_id).get_default_formation_settings()
+            settings.formation = formation
+            settings.element_size = element_size
+            settings.spacing = spacing
+            settings.save()
+        for unit_id, line, side_pos in ((1, 0, -4), (2, 2, 5), (3, 4, 1)):
+            unit = WorldUnit.objects.get(id=unit_id)
+            unit.battle_line = line
+            unit.battle_side_pos = side_pos
+            unit.save()
+
+        start_battle(self.battle)
+
+        positions = list(BattleContubernium.objects.filter(
+            battle_unit__battle_side__battle=self.battle
+        ).values_list('starting_x_pos', 'starting_z_pos'))
+        self.assertEqual(len(positions), 16)
+        self.assertEqual(len(set(positions)), len(positions))
+        return positions
+
+    def test_start_in_column(self):
+        positions = self.start_in_formation(BattleFormation.COLUMN, 2, 1)
+        self.assertEqual({abs(x) for x, z in positions}, {0, 1})
+
+    def test_start_in_square(self):
+        self.start_in_formation(BattleFormation.SQUARE, None, 3)
+
+    def test_start_in_wedge(self):
+        self.start_in_formation(BattleFormation.WEDGE, None, 2)
+
+    def test_start_in_inverted_wedge(self):
+        self.start_in_formation(BattleFormation.IWEDGE, None, 2)
+
+    def test_resumed_battle_turns_do_not_tick_twice(self):
+        start_battle(self.battle)
+        world = self.battle.tile.world
+        turn_run = TurnRun.objects.create(
+            world=world, turn=world.current_turn)
+        battle_turns = phase('Battle turns', worldwide_battle_turns)
+
+        # The battle was resolved by a worker before the phase failed
+        phase_run = turn_run.start_phase(battle_turns.name)
+        with mock.patch('turn.phases.current_phase_run',
+                        return_value=phase_run):
+            worldwide_battle_turns(world)
+        latest_num = self.battle.get_latest_turn().num
+        self.assertGreater(latest_num, 0)
+
+        run_phase(turn_run, world, battle_turns)
+
+        self.assertTrue(turn_run.phase_completed(battle_turns.name))
+        self.assertEqual(self.battle.get_latest_turn().num, latest_num)
+
     def test_manpower(self):
         start_battle(self.battle)
 
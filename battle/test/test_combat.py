@@ -0,0 +1,55 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from battle.combat import resolve_attack, MELEE_HIT_CHANCE
+from battle.models import BattleSoldierInTurn
+
+
+class TestResolveAttack(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(11)
+
+    def test_dead_attackers_deal_no_hits(self):
+        new_wounds, hits = resolve_attack(
+            np.full(8, BattleSoldierInTurn.DEAD),
+            np.zeros(8, dtype=np.int64),
+            MELEE_HIT_CHANCE,
+            self.rng
+        )
+        self.assertEqual(new_wounds.tolist(), [0] * 8)
+        self.assertEqual(hits.sum(), 0)
+
+    def test_wounds_stop_at_death(self):
+        target_wounds = np.array([BattleSoldierInTurn.HEAVY_WOUND])
+        for i in range(50):
+            new_wounds, hits = resolve_attack(
+                np.zeros(8, dtype=np.int64),
+                target_wounds,
+                MELEE_HIT_CHANCE,
+                self.rng
+            )
+            self.assertLessEqual(new_wounds[0], BattleSoldierInTurn.DEAD)
+            self.assertEqual(new_wounds[0] - target_wounds[0], hits[0])
+            self.assertLessEqual(hits[0], 1)
+
+    def test_hits_per_attacker(self):
+        # With a 0.5 chance per roll an attacker lands one hit on average
+        attacks = 20000
+        new_wounds, hits = resolve_attack(
+            np.zeros(attacks, dtype=np.int64),
+            np.full(attacks * 10, -100),
+            MELEE_HIT_CHANCE,
+            self.rng
+        )
+        self.assertAlmostEqual(hits.sum() / attacks, 1, delta=0.05)
+
+    def test_wounded_attackers_hit_less(self):
+        attacks = 20000
+        _, hits = resolve_attack(
+            np.full(attacks, BattleSoldierInTurn.HEAVY_WOUND),
+            np.full(attacks * 10, -100),
+            MELEE_HIT_CHANCE,
+            self.rng
+        )
+        # 0.05 chance per roll: 0.05 / 0.95 hits on average
+        self.assertAlmostEqual(hits.sum() / attacks, 0.05 / 0.95, delta=0.01)
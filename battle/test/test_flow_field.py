@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase
+
+from battle.flow_field import DistanceField, flow_step
+from battle.models import Coordinates
+from battle.pathfinding import euclidean_distance, coordinate_neighbours
+
+
+class TestDistanceField(SimpleTestCase):
+    def test_distance_to_closest_source(self):
+        sources = [Coordinates(0, 0), Coordinates(10, 4), Coordinates(-7, 9)]
+        field = DistanceField(sources, -12, -12, 12, 12)
+        for x in range(-15, 16):
+            for z in range(-15, 16):
+                coords = Coordinates(x, z)
+                self.assertEqual(
+                    field(coords),
+                    min(euclidean_distance(coords, source)
+                        for source in sources)
+                )
+
+    def test_no_sources(self):
+        field = DistanceField([], -1, -1, 1, 1)
+        self.assertIsNone(field(Coordinates(0, 0)))
+
+
+class TestFlowStep(SimpleTestCase):
+    def setUp(self):
+        self.target = Coordinates(0, 10)
+
+    def distance_to_target(self, coords):
+        return euclidean_distance(coords, self.target)
+
+    def test_steps_towards_target(self):
+        self.assertEqual(
+            flow_step(Coordinates(0, 0), self.distance_to_target,
+                      coordinate_neighbours, lambda coords: True),
+            Coordinates(0, 1)
+        )
+
+    def test_steps_around_unavailable_tile(self):
+        step = flow_step(
+            Coordinates(0, 0), self.distance_to_target,
+            coordinate_neighbours,
+            lambda coords: coords != Coordinates(0, 1)
+        )
+        self.assertIn(step, (Coordinates(-1, 1), Coordinates(1, 1)))
+
+    def test_stays_if_no_step_gets_closer(self):
+        self.assertIsNone(flow_step(
+            Coordinates(0, 0), self.distance_to_target,
+            coordinate_neighbours,
+            lambda coords: coords.z <= 0
+        ))
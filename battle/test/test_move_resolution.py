@@ -0,0 +1,77 @@
+from django.test import SimpleTestCase
+
+from battle.models import Coordinates
+from battle.move_resolution import resolve_move_desires
+
+
+class Contubernium:
+    def __init__(self, position, desired=None, priority=0):
+        self.position = Coordinates(*position)
+        self.desires_pos = desired is not None
+        self.desired = Coordinates(*desired) if desired else None
+        self.priority = priority
+
+    def coordinates(self):
+        return self.position
+
+    def desired_coordinates(self):
+        return self.desired
+
+
+def moves(*contubernia):
+    return resolve_move_desires(
+        contubernia, lambda contubernium: contubernium.priority)
+
+
+class TestResolveMoveDesires(SimpleTestCase):
+    def test_move_to_free_position(self):
+        a = Contubernium((0, 0), (0, 1))
+        self.assertEqual(moves(a), [(a, Coordinates(0, 1))])
+
+    def test_highest_priority_wins(self):
+        a = Contubernium((0, 0), (0, 1), priority=1)
+        b = Contubernium((0, 2), (0, 1), priority=2)
+        c = Contubernium((1, 1), (0, 1), priority=2)
+        self.assertEqual(moves(a, b, c), [(b, Coordinates(0, 1))])
+
+    def test_blocked_by_standing_contubernium(self):
+        a = Contubernium((0, 0), (0, 1))
+        b = Contubernium((0, 1))
+        self.assertEqual(moves(a, b), [])
+
+    def test_chain(self):
+        a = Contubernium((0, 0), (0, 1))
+        b = Contubernium((0, 1), (0, 2))
+        c = Contubernium((0, 2), (0, 3))
+        self.assertEqual(
+            sorted(moves(a, b, c), key=lambda move: move[1]),
+            [
+                (a, Coordinates(0, 1)),
+                (b, Coordinates(0, 2)),
+                (c, Coordinates(0, 3))
+            ]
+        )
+
+    def test_blocked_chain(self):
+        a = Contubernium((0, 0), (0, 1))
+        b = Contubernium((0, 1), (0, 2))
+        c = Contubernium((0, 2))
+        self.assertEqual(moves(a, b, c), [])
+
+    def test_chain_behind_lost_contest(self):
+        a = Contubernium((0, 0), (0, 1))
+        b = Contubernium((0, 1), (0, 2), priority=0)
+        c = Contubernium((1, 2), (0, 2), priority=1)
+        self.assertEqual(moves(a, b, c), [(c, Coordinates(0, 2))])
+
+    def test_swap(self):
+        a = Contubernium((0, 0), (0, 1))
+        b = Contubernium((0, 1), (0, 0))
+        self.assertEqual(
+            moves(a, b), [(a, Coordinates(0, 1)), (b, Coordinates(0, 0))])
+
+    def test_rotation(self):
+        a = Contubernium((0, 0), (0, 1))
+        b = Contubernium((0, 1), (1, 1))
+        c = Contubernium((1, 1), (0, 0))
+        self.assertEqual(len(moves(a, b, c)), 3)
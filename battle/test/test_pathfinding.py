@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from battle import pathfinding
+from battle.pathfinding import find_path, euclidean_distance
+from battle.models import Coordinates
+
+
+class Contubernium:
+    def __init__(self, x, z):
+        self.x_pos = x
+        self.z_pos = z
+
+    def coordinates(self):
+        return Coordinates(self.x_pos, self.z_pos)
+
+
+def distance_to(target):
+    def result(coords):
+        return euclidean_distance(coords, target)
+    return result
+
+
+class TestFindPath(SimpleTestCase):
+    def test_already_at_target(self):
+        self.assertEqual(
+            find_path(Contubernium(3, 3), distance_to(Coordinates(3, 3)),
+                      lambda coords: True),
+            [Coordinates(3, 3)]
+        )
+
+    def test_straight_path(self):
+        path = find_path(
+            Contubernium(0, 0), distance_to(Coordinates(0, 5)),
+            lambda coords: True
+        )
+        self.assertEqual(path, [Coordinates(0, z) for z in range(6)])
+
+    def test_path_around_wall(self):
+        wall = {Coordinates(x, 3) for x in range(-5, 6)}
+        path = find_path(
+            Contubernium(0, 0), distance_to(Coordinates(0, 6)),
+            lambda coords: coords not in wall
+        )
+        self.assertEqual(path[0], Coordinates(0, 0))
+        self.assertEqual(path[-1], Coordinates(0, 6))
+        self.assertFalse(wall.intersection(path))
+        for previous, following in zip(path, path[1:]):
+            self.assertLessEqual(
+                euclidean_distance(previous, following), 2 ** 0.5)
+
+    def test_search_stays_in_bounds(self):
+        considered = []
+
+        def available(coords):
+            considered.append(coords)
+            return True
+        path = find_path(
+            Contubernium(40, 0), distance_to(Coordinates(1000, 0)),
+            available
+        )
+        self.assertEqual(path, [])
+        self.assertTrue(considered)
+        for coords in considered:
+            self.assertLessEqual(abs(coords.x), pathfinding.SEARCH_LIMIT)
+            self.assertLessEqual(abs(coords.z), pathfinding.SEARCH_LIMIT)
+
+    def test_leaving_the_battlefield(self):
+        path = find_path(
+            Contubernium(48, 0),
+            lambda coords: max(0, pathfinding.SEARCH_LIMIT - coords.x),
+            lambda coords: True
+        )
+        self.assertEqual(path[-1].x, pathfinding.SEARCH_LIMIT)
+
+    def test_no_path_when_the_budget_runs_out(self):
+        unreachable = Coordinates(0, 30)
+        with mock.patch('battle.pathfinding.MAX_PATH_EXPANSIONS', 50):
+            path = find_path(
+                Contubernium(0, 0),
+                lambda coords: euclidean_distance(coords, unreachable) + 1,
+                lambda coords: True
+            )
+        self.assertEqual(path, [])
@@ -0,0 +1,90 @@
+import math
+import random
+
+from django.test import SimpleTestCase
+
+from battle.models import Coordinates
+from battle.spatial_index import SpatialIndex
+
+
+class Contubernium:
+    def __init__(self, x, z, side):
+        self.x_pos = x
+        self.z_pos = z
+        self.side = side
+
+    def coordinates(self):
+        return Coordinates(self.x_pos, self.z_pos)
+
+
+def brute_force_closest(coords, contubernia):
+    closest = None
+    distance = None
+    for contubernium in contubernia:
+        tentative_distance = math.sqrt(
+            (coords.x - contubernium.x_pos)**2 +
+            (coords.z - contubernium.z_pos)**2
+        )
+        if closest is None or tentative_distance < distance:
+            closest = contubernium
+            distance = tentative_distance
+    return closest, distance
+
+
+class TestSpatialIndex(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        positions = rng.sample(
+            [(x, z) for x in range(-60, 61) for z in range(-60, 61)], 300)
+        self.contubernia = [
+            Contubernium(x, z, i % 2) for i, (x, z) in enumerate(positions)
+        ]
+        self.index = SpatialIndex(
+            self.contubernia, lambda contubernium: contubernium.side)
+
+    def test_positions(self):
+        contubernium = self.contubernia[0]
+        self.assertIs(self.index.at(contubernium.coordinates()), contubernium)
+        self.assertIn(contubernium.coordinates(), self.index)
+
+        self.index.move(contubernium, Coordinates(200, 200))
+        self.assertIsNone(self.index.at(Coordinates(
+            contubernium.x_pos, contubernium.z_pos)))
+        self.assertIs(self.index.at(Coordinates(200, 200)), contubernium)
+
+    def test_swap_positions(self):
+        first, second = self.contubernia[:2]
+        first_position = first.coordinates()
+        second_position = second.coordinates()
+        self.index.move(first, second_position)
+        self.index.move(second, first_position)
+        self.assertIs(self.index.at(second_position), first)
+        self.assertIs(self.index.at(first_position), second)
+
+    def test_closest_enemy_matches_linear_scan(self):
+        for x in range(-70, 71, 7):
+            for z in range(-70, 71, 5):
+                coords = Coordinates(x, z)
+                for side in (0, 1):
+                    self.assertEqual(
+                        self.index.closest_enemy(coords, side),
+                        brute_force_closest(coords, [
+                            contubernium
+                            for contubernium in self.contubernia
+                            if contubernium.side != side
+                        ])
+                    )
+
+    def test_ties_go_to_first_contubernium(self):
+        contubernia = [
+            Contubernium(3, 0, 0),
+            Contubernium(-3, 0, 0),
+            Contubernium(0, 3, 0),
+        ]
+        index = SpatialIndex(contubernia)
+        self.assertIs(index.closest(Coordinates(0, 0))[0], contubernia[0])
+
+    def test_empty(self):
+        index = SpatialIndex([], lambda contubernium: contubernium.side)
+        self.assertEqual(index.closest_enemy(Coordinates(0, 0), 0),
+                         (None, None))
@@ -2,10 +2,14 @@ from django.test import TestCase
 from django.urls.base import reverse
 
 from battle.battle_init import initialize_from_conflict, start_battle
-from battle.models import Battle
+from battle.battle_renderer import decode_array, get_battle_replay, \
+    update_battle_replay
+from battle.battle_simulation import BattleSimulation
+from battle.battle_tick import battle_tick
+from battle.models import Battle, BattleReplay
 from organization.models.organization import Organization
 from world.initialization import initialize_unit
-from world.models.geography import Tile
+from world.models.geography import Tile, World, Region
 from unit.models import WorldUnit
 
 
@@ -61,3 +65,108 @@ class TestBattleViews(TestCase):
         start_battle(self.battle)
         response = self.client.get(reverse('battle:battlefield_iframe', kwargs={'battle_id': self.battle.id}), follow=True)
         self.assertEqual(response.status_code, 200)
+
+    def test_battle_turns_store_replay(self):
+        start_battle(self.battle)
+        self.assertEqual(BattleReplay.objects.get(battle=self.battle).turn_count, 1)
+
+        battle_tick(self.battle)
+        self.assertEqual(BattleReplay.objects.get(battle=self.battle).turn_count, 2)
+
+    def test_views_only_read_replay(self):
+        start_battle(self.battle)
+        simulation = BattleSimulation(self.battle)
+        simulation.run(1)
+        simulation.save()
+
+        for name in ('battle:battlefield_iframe', 'battle:battlefield_ticks'):
+            response = self.client.get(reverse(name, kwargs={'battle_id': self.battle.id}))
+            self.assertEqual(response.status_code, 200)
+        replay = BattleReplay.objects.get(battle=self.battle)
+        self.assertEqual(replay.turn_count, 1)
+        self.assertEqual(replay.battlereplaychunk_set.count(), 1)
+
+        replay.delete()
+        for name in ('battle:battlefield_iframe', 'battle:battlefield_ticks'):
+            response = self.client.get(reverse(name, kwargs={'battle_id': self.battle.id}))
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(BattleReplay.objects.filter(battle=self.battle).exists())
+
+    def test_ticks_view_when_not_started(self):
+        response = self.client.get(reverse('battle:battlefield_ticks', kwargs={'battle_id': self.battle.id}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_ticks_view(self):
+        start_battle(self.battle)
+        battle_tick(self.battle)
+        battle_tick(self.battle)
+
+        response = self.client.get(reverse('battle:battlefield_ticks', kwargs={'battle_id': self.battle.id}))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['battle']['turn_count'], 3)
+        self.assertEqual(
+            [(chunk['first_turn'], chunk['last_turn']) for chunk in data['chunks']],
+            [(0, 0), (0, 1), (1, 2)]
+        )
+        replay = data['chunks'][1]['replay']
+        self.assertEqual(replay['first_turn'], 0)
+        self.assertEqual(len(decode_array(replay['x_pos'], '<i2')), 16 * 2)
+        self.assertEqual(len(decode_array(replay['wound_status'], 'u1')), 120 * 2)
+
+        response = self.client.get(reverse('battle:battlefield_ticks', kwargs={'battle_id': self.battle.id}), {'after': 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['chunks']), 1)
+        chunk = data['chunks'][0]
+        replay = chunk['replay']
+        self.assertEqual(replay['first_turn'], 1)
+        self.assertEqual(len(decode_array(replay['x_pos'], '<i2')), 16 * 2)
+        self.assertEqual(decode_array(replay['soldier_offsets'], '<i4')[0], 0)
+        self.assertEqual(decode_array(replay['soldier_counts'], 'u1').sum(), 120 * 2)
+        self.assertEqual(len(decode_array(replay['wound_status'], 'u1')), 120 * 2)
+        for unit in chunk['units'].values():
+            self.assertEqual(set(unit['in_turn'].keys()), {'1', '2'})
+        for unit in data['battle']['units'].values():
+            self.assertEqual(unit['in_turn'], {})
+
+        response = self.client.get(reverse('battle:battlefield_ticks', kwargs={'battle_id': self.battle.id}), {'after': 2})
+        self.assertEqual(response.json()['chunks'], [])
+
+    def test_replay_is_appended(self):
+        start_battle(self.battle)
+        replay = get_battle_replay(self.battle)
+        chunk = replay.battlereplaychunk_set.get()
+
+        battle_tick(self.battle)
+        replay = get_battle_replay(self.battle)
+        self.assertEqual(replay.turn_count, 2)
+        self.assertEqual(replay.battlereplaychunk_set.count(), 2)
+        self.assertEqual(replay.battlereplaychunk_set.get(id=chunk.id).data, chunk.data)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_battle_replay(self.battle).pk, replay.pk)
+
+        update_battle_replay(self.battle)
+        self.assertEqual(get_battle_replay(self.battle).battlereplaychunk_set.count(), 2)
+
+    def test_views_of_other_worlds(self):
+        world = World.objects.create(name="Other world", description="")
+        region = Region.objects.create(world=world, name="Other region")
+        tile = Tile.objects.get(id=108)
+        tile.pk = None
+        tile.world = world
+        tile.region = region
+        tile.save()
+        self.battle.tile = tile
+        self.battle.save()
+        start_battle(self.battle)
+
+        for view in ('battle:info', 'battle:battlefield', 'battle:battlefield_iframe', 'battle:battlefield_ticks'):
+            response = self.client.get(reverse(view, kwargs={'battle_id': self.battle.id}))
+            self.assertEqual(response.status_code, 404)
+
+    def test_ticks_view_bad_request(self):
+        start_battle(self.battle)
+        response = self.client.get(reverse('battle:battlefield_ticks', kwargs={'battle_id': self.battle.id}), {'after': 'x'})
+        self.assertEqual(response.status_code, 400)
@@ -1,9 +1,8 @@
-import json
-
-from django.http.response import Http404
+from django.http.response import Http404, HttpResponse, \
+    HttpResponseBadRequest
 from django.shortcuts import render, get_object_or_404, redirect
 
-from battle.battle_renderer import render_battle_for_view
+from battle.battle_renderer import get_battle_replay
 from battle.models import Battle
 from decorators import inchar_required
 from unit.models import WorldUnit
@@ -26,7 +25,7 @@ def info_view(request, battle_id):
 
 @inchar_required
 def battlefield_view(request, battle_id):
-    battle = get_object_or_404(Battle, pk=battle_id)
+    battle = get_object_or_404(Battle, pk=battle_id, tile__world=request.hero.world)
     heros_units = WorldUnit.objects.filter(
         battleunit__in=battle.get_units_in_battle().filter(world_unit__owner_character=request.hero)
     )
@@ -45,12 +44,33 @@ def battlefield_view(request, battle_id):
 
 @inchar_required
 def battlefield_view_iframe(request, battle_id):
-    battle = get_object_or_404(Battle, pk=battle_id)
+    battle = get_object_or_404(Battle, pk=battle_id, tile__world=request.hero.world)
 
-    if not battle.started:
+    replay = get_battle_replay(battle)
+    if not battle.started or replay is None:
         raise Http404()
 
     context = {
-        'battle_data': json.dumps(render_battle_for_view(battle))
+        'battle': battle,
+        'battle_data': replay.get_ticks_json()
     }
     return render(request, 'battle/battlefield_view_iframe.html', context=context)
+
+
+@inchar_required
+def battlefield_ticks_view(request, battle_id):
+    battle = get_object_or_404(Battle, pk=battle_id, tile__world=request.hero.world)
+
+    replay = get_battle_replay(battle)
+    if not battle.started or replay is None:
+        raise Http404()
+
+    try:
+        after = int(request.GET.get('after', -1))
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    return HttpResponse(
+        replay.get_ticks_json(after),
+        content_type='application/json'
+    )
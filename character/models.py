@@ -16,6 +16,7 @@ import unit.models
 from battle.models import BattleCharacter
 from messaging import shortcuts
 from messaging.models import CharacterMessage
+from turn.unit_of_work import create_later
 
 
 class CharacterEvent(models.Model):
@@ -322,7 +323,7 @@ class Character(models.Model, AdminURLMixin):
         self.hours_in_turn_left -= travel_time
         self.save()
 
-        CharacterEvent.objects.create(
+        create_later(CharacterEvent(
             character=self,
             active=False,
             type=CharacterEvent.TRAVEL,
@@ -331,7 +332,7 @@ class Character(models.Model, AdminURLMixin):
             start_turn=self.world.current_turn,
             end_turn=self.world.current_turn,
             settlement=destination
-        )
+        ))
 
         return travel_time, destination
 
@@ -345,7 +346,7 @@ class Character(models.Model, AdminURLMixin):
             title=title,
             template_context=template_context
         )
-        shortcuts.add_character_recipient(message, self)
+        shortcuts.add_new_message_recipients(message, [self])
 
     def get_violence_monopoly(self):
         try:
@@ -1,9 +1,14 @@
+import threading
 from contextlib import contextmanager
 
 import time
 
 import logging
 
+from django.db import connection
+
+_local = threading.local()
+
 
 @contextmanager
 def perf_timer(name):
@@ -12,3 +17,55 @@ def perf_timer(name):
     yield
     elapsed = time.time() - start_time
     logging.info('[{}] in {} ms'.format(name, int(elapsed * 1000)))
+
+
+class QueryStats:
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0
+        self.rows_written = 0
+
+    def totals(self):
+        return self.query_count, self.query_time, self.rows_written
+
+    def add(self, totals):
+        """
+        Adds the totals() of queries measured elsewhere, like in a pool
+        worker.
+        """
+        query_count, query_time, rows_written = totals
+        self.query_count += query_count
+        self.query_time += query_time
+        self.rows_written += rows_written
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.time() - start_time
+            self.query_count += 1
+            if sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+                self.rows_written += max(context['cursor'].rowcount, 0)
+
+
+@contextmanager
+def query_stats():
+    """
+    Counts queries, time spent in them and rows written through the
+    current thread's database connection. Work that parallel() hands to
+    pool workers is measured there and added to the innermost block of the
+    calling thread.
+    """
+    stats = QueryStats()
+    outer_stats = current_query_stats()
+    _local.stats = stats
+    try:
+        with connection.execute_wrapper(stats):
+            yield stats
+    finally:
+        _local.stats = outer_stats
+
+
+def current_query_stats():
+    return getattr(_local, 'stats', None)
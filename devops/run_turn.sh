@@ -1,4 +1,6 @@
 #!/bin/bash
+# Usage: run_turn.sh WORLD_ID [WORLD_ID ...]
+# TURN_CONCURRENCY sets how many worlds are processed at the same time.
 
 pushd "$(dirname $0)"
 ./run_backup_job.sh
@@ -8,5 +10,5 @@ docker run \
   -v fi_logs:/var/logs -d jardiacaj/finem_imperii \
   -e DJANGO_SETTINGS_MODULE=prod.settings \
   bin/bash \
-  "./manage.py pass_turn $1"
+  "./manage.py pass_turn --concurrency ${TURN_CONCURRENCY:-4} $*"
 popd
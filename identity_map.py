@@ -0,0 +1,203 @@
+import copy
+import functools
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+_lock = threading.RLock()
+_map = None
+
+# Pieces of game state (as declared by turn phases) each memoized lookup
+# depends on.
+_dependencies = {}
+
+
+class IdentityMap:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.memos = {}
+        self.bypassed = Counter()
+        # Instances are handed out per thread, so that phases running
+        # concurrently never share an object. A thread-local rather than
+        # thread idents as keys: the threads of a later stage may get the
+        # idents of finished ones, and must not inherit their instances.
+        self.threads = threading.local()
+        self.generations = Counter()
+
+    def clear(self, namespaces):
+        for namespace in namespaces:
+            self.memos.pop(namespace, None)
+            self.generations[namespace] += 1
+
+    def thread_instances(self, namespace):
+        """
+        Instances of namespace handed out to the calling thread since the
+        namespace was last cleared.
+        """
+        if not hasattr(self.threads, 'instances'):
+            self.threads.instances = {}
+        generation = self.generations[namespace]
+        instances = self.threads.instances.get(namespace)
+        if instances is None or instances[0] != generation:
+            instances = self.threads.instances[namespace] = (generation, {})
+        return instances[1]
+
+
+def _active_map():
+    # Forked pool workers inherit a copy of the map that would not see
+    # invalidations made by the turn process, so they don't use it; see
+    # task_identity_map().
+    if _map is None or _map.pid != os.getpid():
+        return None
+    return _map
+
+
+@contextmanager
+def identity_map():
+    """
+    While the block runs, get_instance() returns a single in-memory
+    instance per row and @memoized lookups are computed once. Nested
+    blocks share the outermost map.
+    """
+    global _map
+    if _active_map() is not None:
+        yield _map
+        return
+
+    _map = IdentityMap()
+    try:
+        yield _map
+    finally:
+        _map = None
+
+
+def bypassed_namespaces():
+    """
+    Returns the namespaces the active map bypasses in the calling thread's
+    phase, or None when no map is active.
+    """
+    current_map = _active_map()
+    if current_map is None:
+        return None
+    with _lock:
+        return frozenset(+current_map.bypassed)
+
+
+@contextmanager
+def task_identity_map(bypassed):
+    """
+    Gives a pool worker a map of its own for one task of a parallel() call
+    made with a map active, bypassing the same lookups as the caller. The
+    map ends with the task, so it can't miss invalidations made by the
+    turn process.
+    """
+    global _map
+    if bypassed is None:
+        yield None
+        return
+
+    outer_map = _map
+    _map = IdentityMap()
+    _map.bypassed.update(bypassed)
+    try:
+        yield _map
+    finally:
+        _map = outer_map
+
+
+def _namespaces_depending_on(writes):
+    return [
+        namespace for namespace, depends_on in _dependencies.items()
+        if depends_on & writes
+    ]
+
+
+@contextmanager
+def writing(writes):
+    """
+    Declares that the block writes the given pieces of state. Lookups
+    depending on them are dropped and bypass the map until the block ends.
+    """
+    current_map = _active_map()
+    if current_map is None:
+        yield
+        return
+
+    namespaces = _namespaces_depending_on(frozenset(writes))
+    with _lock:
+        current_map.clear(namespaces)
+        current_map.bypassed.update(namespaces)
+    try:
+        yield
+    finally:
+        with _lock:
+            current_map.clear(namespaces)
+            current_map.bypassed.subtract(namespaces)
+
+
+def _lookup(namespace, key, compute):
+    current_map = _active_map()
+    if current_map is None or current_map.bypassed[namespace] > 0:
+        return compute()
+
+    with _lock:
+        memos = current_map.memos.setdefault(namespace, {})
+        if key in memos:
+            return memos[key]
+    value = compute()
+    with _lock:
+        return memos.setdefault(key, value)
+
+
+def register(namespace, depends_on):
+    _dependencies[namespace] = frozenset(depends_on)
+
+
+def memoized(namespace, depends_on=()):
+    """
+    Memoizes a model method without arguments by the primary key of the
+    instance while an identity map is active. depends_on names the pieces
+    of state the result is derived from. Every call returns a shallow copy
+    of the memoized result, so callers can't change what other callers get.
+    """
+    register(namespace, depends_on)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            return copy.copy(
+                _lookup(namespace, self.pk, lambda: method(self)))
+        return wrapper
+    return decorator
+
+
+def get_instance(model, pk):
+    """
+    Returns the instance of model with the given primary key, always the
+    same one in the calling thread while an identity map is active. The
+    instances are dropped when a phase writes any of the pieces of state
+    listed in the model's identity_map_depends_on.
+    """
+    return get_instances(model, [pk])[0]
+
+
+def get_instances(model, pks):
+    """
+    Same as get_instance() for a list of primary keys, fetching the ones
+    that are not in the map with a single query.
+    """
+    namespace = model._meta.label
+    register(namespace, getattr(model, 'identity_map_depends_on', ()))
+
+    current_map = _active_map()
+    if current_map is None or current_map.bypassed[namespace] > 0:
+        instances = model.objects.in_bulk(pks)
+        return [instances[pk] for pk in pks]
+
+    with _lock:
+        instances = current_map.thread_instances(namespace)
+    missing = [pk for pk in pks if pk not in instances]
+    if missing:
+        instances.update(model.objects.in_bulk(missing))
+    return [instances[pk] for pk in pks]
@@ -2,6 +2,7 @@ from django.template.loader import render_to_string
 
 from messaging.models import CharacterMessage, MessageRecipient, \
     MessageRecipientGroup
+from turn.unit_of_work import create_later
 
 
 def create_message(
@@ -36,6 +37,16 @@ def add_character_recipient(message: CharacterMessage, character, group=None):
             message=message, character=character, group=group)
 
 
+def add_new_message_recipients(message: CharacterMessage, characters):
+    """
+    Adds recipients to a message that has none yet, so there are no
+    existing ones to look up. Inside a turn phase they are inserted
+    together when the phase ends.
+    """
+    for character in characters:
+        create_later(MessageRecipient(message=message, character=character))
+
+
 def add_organization_recipient(
         message: CharacterMessage,
         organization,
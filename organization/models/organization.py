@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.utils.html import escape, format_html
 from django.utils.safestring import mark_safe
 
+from identity_map import memoized
 from mixins import AdminURLMixin
 from organization.models import capability, election, relationship
 import unit.models
@@ -163,6 +164,7 @@ class Organization(models.Model, AdminURLMixin):
     def character_is_member(self, character):
         return character in self.character_members.all()
 
+    @memoized('organization_violence_monopoly', depends_on=('organization', ))
     def get_violence_monopoly(self):
         if self.violence_monopoly:
             return self
@@ -1,20 +1,94 @@
-import os
-
+import sys
+from contextlib import contextmanager
 from multiprocessing.pool import Pool
 
-import sys
 from django import db
 from django.db import connection
+from tblib import pickling_support
+
+from context_managers import query_stats, current_query_stats
+from identity_map import bypassed_namespaces, task_identity_map
+
+pickling_support.install()
+
+_pool = None
+
+
+def parallelism_enabled():
+    return not (
+        connection.vendor == 'sqlite' or
+        'test' in sys.argv
+    )
+
+
+@contextmanager
+def worker_pool(processes=None):
+    """
+    Keeps a pool of worker processes alive for the duration of the block,
+    so that every call to parallel() inside it reuses the same workers and
+    their database connections. Nested blocks reuse the outer pool. By
+    default there is one worker per CPU.
+    """
+    global _pool
+    if _pool is not None or not parallelism_enabled():
+        yield _pool
+        return
+
+    # Forked workers must not share the parent's connections; each one
+    # opens its own on first use and keeps it until the pool is closed.
+    db.connections.close_all()
+    _pool = Pool(processes)
+    try:
+        yield _pool
+    finally:
+        pool = _pool
+        _pool = None
+        pool.close()
+        pool.join()
+
+
+def _run_task(task):
+    operator, index, element, bypassed = task
+    with query_stats() as stats, task_identity_map(bypassed):
+        try:
+            result, exception = operator(element), None
+        except Exception as e:
+            result, exception = None, e
+    return index, result, exception, stats.totals()
+
+
+def parallel(operator, elements, weight=None):
+    """
+    Applies operator to every element and returns the results in the same
+    order as elements. When weight is given, the heaviest elements are
+    dispatched first; idle workers pick the next pending element as soon as
+    they finish one. The first exception raised by a worker is re-raised
+    once all elements have been processed. The queries of the workers are
+    added to the query_stats() of the calling thread.
+    """
+    elements = list(elements)
+
+    if not parallelism_enabled():
+        return [operator(element) for element in elements]
+
+    indexes = list(range(len(elements)))
+    if weight is not None:
+        indexes.sort(key=lambda i: weight(elements[i]), reverse=True)
+    bypassed = bypassed_namespaces()
+    tasks = [(operator, i, elements[i], bypassed) for i in indexes]
 
+    stats = current_query_stats()
+    with worker_pool() as pool:
+        results = [None] * len(elements)
+        exception = None
+        for index, result, task_exception, totals in pool.imap_unordered(
+                _run_task, tasks, chunksize=1):
+            results[index] = result
+            if task_exception is not None and exception is None:
+                exception = task_exception
+            if stats is not None:
+                stats.add(totals)
 
-def parallel(operator, elements):
-    if connection.vendor == 'sqlite' or 'test' in sys.argv:
-        for element in elements:
-            operator(element)
-    else:
-        db.connections.close_all()
-        p = Pool()
-        p.map(
-            operator,
-            elements
-        )
+    if exception is not None:
+        raise exception
+    return results
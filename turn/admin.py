@@ -0,0 +1,24 @@
+from django.contrib import admin
+
+from turn.models import TurnRun, TurnPhaseRun
+
+
+class TurnPhaseRunInline(admin.TabularInline):
+    model = TurnPhaseRun
+    fields = ('name', 'completed', 'start_time') + TurnPhaseRun.METRICS
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(TurnRun)
+class TurnRunAdmin(admin.ModelAdmin):
+    list_display = ('world', 'turn', 'start_time', 'end_time', 'finished')
+    list_filter = ('world', 'finished')
+    inlines = [TurnPhaseRunInline]
+
+
+@admin.register(TurnPhaseRun)
+class TurnPhaseRunAdmin(admin.ModelAdmin):
+    list_display = ('name', 'turn_run', 'completed') + TurnPhaseRun.METRICS
+    list_filter = ('turn_run__world', 'name')
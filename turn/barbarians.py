@@ -5,14 +5,16 @@ from django.db import transaction
 import unit.models
 import unit.creation
 from context_managers import perf_timer
-from parallelism import parallel
+from turn.phases import parallel_items
 from world.models.geography import World, Settlement
 
 
 def worldwide_barbarian_generation(world: World):
-    parallel(
+    parallel_items(
         do_settlement_barbarian_generation,
-        Settlement.objects.filter(tile__world=world)[:]
+        Settlement.objects.filter(tile__world=world)[:],
+        key=lambda settlement: settlement.id,
+        weight=lambda settlement: settlement.population
     )
 
 
@@ -1,9 +1,14 @@
+from django.db.models import Count
+
 import organization.models
 import unit.models
+from battle.battle_archive import battles_to_archive, archive_battle
 from battle.battle_init import start_battle, initialize_from_conflict, \
     add_unit_to_battle_in_progress
-from battle.battle_tick import battle_turn
-from battle.models import Battle, BattleOrganization
+from battle.battle_simulation import battle_turn
+from battle.models import Battle, BattleOrganization, BattleContubernium
+from identity_map import get_instance
+from turn.phases import parallel_items
 from world.models.geography import World
 
 
@@ -28,24 +33,58 @@ def trigger_battles_in_tile(tile):
 
 
 def worldwide_battle_joins(world: World):
+    # Battles in the same tile compete for the same candidate units, so
+    # they are handled by the same worker.
+    battles_by_tile = {}
     for battle in Battle.objects.filter(
             tile__world=world, current=True
-    ):
+    ).order_by('id'):
+        battles_by_tile.setdefault(battle.tile_id, []).append(battle)
+    parallel_items(
+        tile_battle_joins,
+        battles_by_tile.values(),
+        key=lambda battles: battles[0].tile_id
+    )
+
+
+def tile_battle_joins(battles):
+    for battle in battles:
         battle_joins(battle)
 
 
 def worldwide_battle_starts(world: World):
-    for battle in Battle.objects.filter(
+    parallel_items(
+        start_battle,
+        Battle.objects.filter(
             tile__world=world, current=True, started=False
-    ):
-        start_battle(battle)
+        ).order_by('id')[:],
+        key=lambda battle: battle.id
+    )
 
 
 def worldwide_battle_turns(world: World):
-    for battle in Battle.objects.filter(
-            tile__world=world, current=True
-    ):
-        battle_turn(battle)
+    battles = Battle.objects.filter(
+        tile__world=world, current=True
+    ).order_by('id')[:]
+    contubernia = dict(BattleContubernium.objects.filter(
+        battle_unit__battle_side__battle__in=battles
+    ).order_by().values_list(
+        'battle_unit__battle_side__battle_id'
+    ).annotate(count=Count('id')))
+    parallel_items(
+        battle_turn,
+        battles,
+        key=lambda battle: battle.id,
+        weight=lambda battle: contubernia.get(battle.id, 0)
+    )
+
+
+def worldwide_battle_archival(world: World):
+    parallel_items(
+        archive_battle,
+        battles_to_archive().filter(tile__world=world).order_by('id')[:],
+        key=lambda battle: battle.id
+    )
 
 
 def organizations_with_battle_ready_units(tile):
@@ -113,14 +152,15 @@ def get_largest_conflict_in_list(conflicts, tile):
 
 
 def create_battle_from_conflict(conflict, tile):
+    world = get_instance(World, tile.world_id)
     battle = Battle.objects.create(
         tile=tile,
         current=True,
-        start_turn=tile.world.current_turn
+        start_turn=world.current_turn
     )
     initialize_from_conflict(battle, conflict, tile)
 
-    battle.tile.world.broadcast(
+    world.broadcast(
         'messaging/messages/battle_start.html',
         'Battle starts!',
         {'battle': battle},
@@ -0,0 +1,129 @@
+import time
+
+from django.utils import timezone
+
+from context_managers import perf_timer
+from turn.models import TurnPhaseRun
+from turn.turn import pass_turn, TURN_PHASES
+from world.generation import generate_world, scaled_world_size
+from world.initialization import initialize_world
+
+INITIALIZE_WORLD = 'initialize_world'
+TOTAL = 'Total turn'
+
+
+def elapsed_ms(start_time):
+    return int((time.time() - start_time) * 1000)
+
+
+def benchmark_world(size, turns, unit_size=60):
+    """
+    Generates an uninitialized world of the given size, initializes it and
+    passes turns in it. Returns the size of the world, the time taken by
+    initialize_world and the telemetry of every phase in every turn.
+    """
+    name = 'Benchmark {} NPCs {}'.format(
+        size['npcs'], timezone.now().strftime('%Y%m%d%H%M%S%f'))
+    world = generate_world(name, unit_size=unit_size, populate=False, **size)
+
+    with perf_timer('Benchmark {}'.format(name)):
+        start_time = time.time()
+        initialize_world(world)
+        initialize_world_ms = elapsed_ms(start_time)
+
+        results = []
+        for i in range(turns):
+            turn = world.current_turn
+            start_time = time.time()
+            pass_turn(world)
+            total_ms = elapsed_ms(start_time)
+            world.refresh_from_db()
+            results.append({
+                'turn': turn,
+                'wall_time_ms': total_ms,
+                'phases': {
+                    phase_run.name: {
+                        metric: getattr(phase_run, metric)
+                        for metric in TurnPhaseRun.METRICS
+                    }
+                    for phase_run in TurnPhaseRun.objects.filter(
+                        turn_run__world=world,
+                        turn_run__turn=turn
+                    )
+                }
+            })
+
+    return {
+        'world_id': world.id,
+        'size': size,
+        INITIALIZE_WORLD: {'wall_time_ms': initialize_world_ms},
+        'turns': results,
+    }
+
+
+def run_benchmark(npc_counts, turns=1, unit_size=60, **overrides):
+    """
+    Runs benchmark_world for each population in npc_counts. The other
+    sizes of each world are scaled with the population unless given in
+    overrides.
+    """
+    worlds = []
+    for npcs in npc_counts:
+        size = scaled_world_size(npcs)
+        size.update(
+            (key, value) for key, value in overrides.items()
+            if value is not None
+        )
+        worlds.append(benchmark_world(size, turns, unit_size))
+    return {
+        'date': timezone.now().isoformat(),
+        'turns': turns,
+        'worlds': worlds,
+    }
+
+
+def average_metric(world_report, phase_name, metric):
+    values = [
+        turn['phases'][phase_name][metric]
+        for turn in world_report['turns']
+        if turn['phases'].get(phase_name, {}).get(metric) is not None
+    ]
+    if not values:
+        return None
+    return sum(values) // len(values)
+
+
+def report_table(report, metric='wall_time_ms'):
+    """
+    Formats a benchmark report as a text table with one row per phase and
+    one column per world, showing the metric averaged over the turns.
+    """
+    rows = [(turn_phase.name, [
+        average_metric(world_report, turn_phase.name, metric)
+        for world_report in report['worlds']
+    ]) for turn_phase in TURN_PHASES]
+    if metric == 'wall_time_ms':
+        rows.append((TOTAL, [
+            sum(turn['wall_time_ms'] for turn in world_report['turns']) //
+            max(len(world_report['turns']), 1)
+            for world_report in report['worlds']
+        ]))
+        rows.insert(0, (INITIALIZE_WORLD, [
+            world_report[INITIALIZE_WORLD]['wall_time_ms']
+            for world_report in report['worlds']
+        ]))
+
+    name_width = max(len(name) for name, values in rows)
+    lines = [
+        '{} (average of {} turns)'.format(metric, report['turns']),
+        ' ' * name_width + ''.join(
+            '{:>12}'.format(world_report['size']['npcs'])
+            for world_report in report['worlds']
+        )
+    ]
+    for name, values in rows:
+        lines.append(name.ljust(name_width) + ''.join(
+            '{:>12}'.format('-' if value is None else value)
+            for value in values
+        ))
+    return lines
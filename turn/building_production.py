@@ -1,3 +1,4 @@
+from turn.unit_of_work import save_later
 from world.models.buildings import Building
 from world.models.geography import World
 
@@ -43,7 +44,7 @@ def do_building_production(building: Building):
                 building.field_production_counter
             )
             building.field_production_counter -= production_counter_remove
-            building.save()
+            save_later(building, 'field_production_counter')
             bushel_output = (
                 building.quantity
                 * production_counter_remove / 1000
@@ -55,15 +56,15 @@ def do_building_production(building: Building):
 
         if current_month == field_production_reset_month:
             building.field_production_counter = 0
-            building.save()
+            save_later(building, 'field_production_counter')
 
         if current_month in field_input_months and work_input > 0:
             time_portion = 1 / len(field_input_months)
             production_counter_add = work_input * time_portion * 1000
             building.field_production_counter += production_counter_add
-            building.save()
+            save_later(building, 'field_production_counter')
 
     if building.type == Building.GUILD:
         building.field_production_counter *= 0.9
         building.field_production_counter += workers.count()
-        building.save()
+        save_later(building, 'field_production_counter')
@@ -1,5 +1,6 @@
 from character.models import Character
 from messaging.models import CharacterMessage
+from turn.unit_of_work import save_later
 from world.models.geography import World
 
 
@@ -31,7 +32,7 @@ def do_character_travel(character: Character):
                 }
             )
         character.travel_destination = None
-        character.save()
+        save_later(character, 'travel_destination')
 
 
 def worldwide_restore_character_hours(world: World):
@@ -43,4 +44,4 @@ def restore_character_hours(character: Character):
     character.hours_in_turn_left = 15*24
     if character.get_battle_participating_in() is not None:
         character.hours_in_turn_left /= 2
-    character.save()
+    save_later(character, 'hours_in_turn_left')
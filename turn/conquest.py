@@ -1,8 +1,10 @@
+from identity_map import get_instance
 from messaging.helpers import send_notification_to_characters
 from messaging.models import CharacterMessage
+from turn.unit_of_work import save_later
 from unit.models import WorldUnit
 from world.models.events import TileEvent
-from world.models.geography import World
+from world.models.geography import World, Tile
 
 
 def worldwide_conquests(world: World):
@@ -12,22 +14,24 @@ def worldwide_conquests(world: World):
         tile__world=world
     )
     for conquest in conquests_in_this_world:
+        tile = get_instance(Tile, conquest.tile_id)
+        conquest.tile = tile
         present_mobilized_units = WorldUnit.objects\
-            .filter(location__tile=conquest.tile)\
+            .filter(location__tile=tile)\
             .exclude(status=WorldUnit.NOT_MOBILIZED)
         conquering_units = []
         defending_units = []
         for present_mobilized_unit in present_mobilized_units:
             if present_mobilized_unit.get_violence_monopoly() == conquest.organization:
                 conquering_units.append(present_mobilized_unit)
-            if present_mobilized_unit.get_violence_monopoly() == conquest.tile.controlled_by.get_violence_monopoly():
+            if present_mobilized_unit.get_violence_monopoly() == tile.controlled_by.get_violence_monopoly():
                 defending_units.append(present_mobilized_unit)
 
         # stop conquest if no more units present
         if len(conquering_units) == 0:
             conquest.end_turn = world.current_turn
             conquest.active = False
-            conquest.save()
+            save_later(conquest, 'end_turn', 'active')
             continue
 
         # decrease counter
@@ -37,19 +41,19 @@ def worldwide_conquests(world: World):
             conquest.counter = 0
 
         # if counter is larger than population, conquer
-        if conquest.counter > conquest.tile.get_total_population():
-            previous_owner = conquest.tile.controlled_by.get_violence_monopoly()
-            conquest.tile.controlled_by = conquest.organization
+        if conquest.counter > tile.get_total_population():
+            previous_owner = tile.controlled_by.get_violence_monopoly()
+            tile.controlled_by = conquest.organization
             conquest.end_turn = world.current_turn
             conquest.active = False
-            conquest.tile.save()
-            conquest.save()
+            save_later(tile, 'controlled_by')
+            save_later(conquest, 'counter', 'end_turn', 'active')
             send_notification_to_characters(
                 world.character_set,
                 'messaging/messages/conquest_success.html',
                 '{} conquers {}!'.format(
                     conquest.organization,
-                    conquest.tile
+                    tile
                 ),
                 {
                     'tile_event': conquest,
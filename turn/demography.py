@@ -1,76 +1,160 @@
-import random
-
+import numpy as np
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Q
 
 import world.initialization
-from parallelism import parallel
 from world.models.buildings import Building
 from world.models.geography import World, Settlement
+from world.models.items import InventoryItem
+from world.models.npcs import NPC
+from turn.unit_of_work import save_later, create_later
+from world.npc_columns import NPCColumns, count_per, index_of, \
+    random_per_group, settlements_by_tile
 
 
 def worldwide_population_changes(world: World):
-    for tile in world.tile_set.all():
-        for settlement in tile.settlement_set.all():
-            do_settlement_population_changes(settlement)
+    for settlements in settlements_by_tile(world):
+        settlements_population_changes(settlements)
 
 
 def do_settlement_population_changes(settlement: Settlement):
-    settlement.update_population()
-    amount_to_generate = 0
+    settlements_population_changes(
+        Settlement.objects.filter(id=settlement.id)
+    )
+    settlement.refresh_from_db()
 
-    if settlement.population < 50:
-        amount_to_generate += 5
 
-    if (
-            settlement.population < settlement.population_default and
-            settlement.get_hunger_percentage() < 3
-    ):
-        amount_to_generate += int(settlement.population * 0.05)
+def hunger_percentages(settlement_ids, residents: NPCColumns):
+    population = count_per(settlement_ids, residents.residence_settlement)
+    hungry = count_per(
+        settlement_ids, residents.residence_settlement, residents.hunger > 1
+    )
+    return np.round(
+        hungry / np.maximum(population, 1) * 100
+    ).astype(np.int64), population
+
 
-    residences = settlement.building_set.filter(
-        type=Building.RESIDENCE).all()
-    for i in range(amount_to_generate):
-        world.initialization.generate_npc(i, residences, settlement)
-    if amount_to_generate > 0:
-        settlement.update_population()
+@transaction.atomic
+def settlements_population_changes(settlements_queryset):
+    settlements = list(settlements_queryset.order_by('id'))
+    settlement_ids = np.array([s.id for s in settlements], dtype=np.int64)
+    residents = NPCColumns(
+        NPC.objects.filter(residence__settlement__in=settlements_queryset)
+    )
 
+    hunger, population = hunger_percentages(settlement_ids, residents)
+    population_default = np.array(
+        [s.population_default for s in settlements], dtype=np.int64)
 
-def worldwide_food_consumption(world: World):
-    parallel(
-        do_settlement_food_consumption,
-        Settlement.objects.filter(tile__world=world)[:]
+    amount_to_generate = np.where(population < 50, 5, 0)
+    amount_to_generate += np.where(
+        (population < population_default) & (hunger < 3),
+        (population * 0.05).astype(np.int64),
+        0
     )
 
+    residences = {}
+    for residence in Building.objects.filter(
+            settlement__in=settlements_queryset, type=Building.RESIDENCE):
+        residences.setdefault(residence.settlement_id, []).append(residence)
+
+    for settlement, amount, settlement_population in zip(
+            settlements, amount_to_generate, population):
+        settlement_residences = residences.get(settlement.id, [])
+        if settlement_residences:
+            for i in range(amount):
+                create_later(world.initialization.build_npc(
+                    settlement_residences, settlement
+                ))
+        else:
+            amount = 0
+        settlement.population = int(settlement_population + amount)
+        save_later(settlement, 'population')
+
+
+def worldwide_food_consumption(world: World):
+    for settlements in settlements_by_tile(world):
+        settlements_food_consumption(settlements)
+
 
-@transaction.atomic
 def do_settlement_food_consumption(settlement: Settlement):
-    mouths = settlement.population
-    granary = settlement.get_default_granary()
-    bushels_to_consume = min(
-        mouths,
-        granary.population_consumable_bushels()
+    settlements_food_consumption(
+        Settlement.objects.filter(id=settlement.id)
     )
-    granary.consume_bushels(bushels_to_consume)
-
-    hunger = mouths - bushels_to_consume
-    if hunger > 0 and settlement.npc_set.exists():
-        for npc in random.sample(
-                list(settlement.npc_set.all()),
-                min(hunger, settlement.npc_set.count())
-        ):
-            npc.hunger += 1
-            npc.save()
-
-    if hunger == 0 and settlement.npc_set.filter(hunger__gt=0).exists():
-        settlement.npc_set.filter(hunger__gt=0).update(
-            hunger=F('hunger')-1
+    settlement.refresh_from_db()
+
+
+def get_public_bushels_objects(settlements):
+    granaries = list(Building.objects.filter(
+        settlement__in=settlements,
+        type=Building.GRANARY,
+        owner=None
+    ))
+    missing = {settlement.id for settlement in settlements} - {
+        granary.settlement_id for granary in granaries
+    }
+    if missing:
+        raise Building.DoesNotExist(
+            "No public granary in settlements {}".format(sorted(missing))
         )
+    bushels = {
+        bushel_object.location.settlement_id: bushel_object
+        for bushel_object in InventoryItem.objects.filter(
+            type=InventoryItem.GRAIN,
+            owner_character=None,
+            location__in=granaries
+        ).select_related('location')
+    }
+    for granary in granaries:
+        if granary.settlement_id not in bushels:
+            bushels[granary.settlement_id] = InventoryItem.objects.create(
+                type=InventoryItem.GRAIN,
+                owner_character=None,
+                location=granary,
+                quantity=0
+            )
+    return bushels
+
+
+@transaction.atomic
+def settlements_food_consumption(settlements_queryset):
+    settlements = list(settlements_queryset.order_by('id'))
+    settlement_ids = np.array([s.id for s in settlements], dtype=np.int64)
+
+    bushels = get_public_bushels_objects(settlements)
+    mouths = np.array([s.population for s in settlements], dtype=np.int64)
+    available = np.array(
+        [bushels[s.id].quantity for s in settlements], dtype=np.int64)
+    consumed = np.minimum(mouths, available)
+    for settlement, bushels_to_consume in zip(settlements, consumed):
+        if bushels_to_consume > 0:
+            bushel_object = bushels[settlement.id]
+            bushel_object.quantity -= int(bushels_to_consume)
+            save_later(bushel_object, 'quantity')
+    hunger = mouths - consumed
+
+    npcs = NPCColumns(NPC.objects.filter(
+        Q(location__in=settlements_queryset) |
+        Q(residence__settlement__in=settlements_queryset)
+    ))
+    location_index, located = index_of(settlement_ids, npcs.location)
+    npc_settlement_hunger = np.where(located, hunger[location_index], 0)
+
+    # Hunger spreads among the NPCs present in the settlement, and only
+    # fades away when everybody could eat.
+    npcs.hunger += located & random_per_group(
+        np.where(located, npcs.location, 0),
+        npc_settlement_hunger,
+        npcs.rng
+    )
+    npcs.hunger -= located & (npc_settlement_hunger == 0) & (npcs.hunger > 0)
 
-    for npc in settlement.npc_set.filter(hunger__gt=3):
-        if random.getrandbits(3) == 0:
-            npc.take_hit()
-        if npc.hunger > 5:
-            npc.take_hit()
+    starving = located & (npcs.hunger > 3)
+    npcs.take_hits(starving & (npcs.rng.integers(0, 8, len(npcs)) == 0))
+    npcs.take_hits(starving & (npcs.hunger > 5))
+    npcs.save()
 
-    settlement.update_population()
+    population = count_per(settlement_ids, npcs.residence_settlement)
+    for settlement, settlement_population in zip(settlements, population):
+        settlement.population = int(settlement_population)
+        save_later(settlement, 'population')
@@ -0,0 +1,55 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from turn.benchmark import run_benchmark, report_table
+from turn.models import TurnPhaseRun
+
+
+class Command(BaseCommand):
+    help = 'Times initialize_world and every turn phase in generated ' \
+           'worlds of increasing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--npcs', type=int, nargs='+',
+            default=[10000, 100000, 1000000]
+        )
+        parser.add_argument('--turns', type=int, default=1)
+        parser.add_argument('--tiles', type=int)
+        parser.add_argument('--settlements', type=int)
+        parser.add_argument('--units', type=int)
+        parser.add_argument('--organizations', type=int)
+        parser.add_argument('--unit-size', type=int, default=60)
+        parser.add_argument(
+            '--metric',
+            choices=TurnPhaseRun.METRICS,
+            default='wall_time_ms'
+        )
+        parser.add_argument(
+            '--output', help='Path where the JSON report is written'
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger().setLevel(logging.INFO)
+
+        if options['turns'] < 1:
+            raise CommandError('At least one turn has to be passed')
+
+        report = run_benchmark(
+            options['npcs'],
+            turns=options['turns'],
+            unit_size=options['unit_size'],
+            tiles=options['tiles'],
+            settlements=options['settlements'],
+            units=options['units'],
+            organizations=options['organizations'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        for line in report_table(report, options['metric']):
+            self.stdout.write(line)
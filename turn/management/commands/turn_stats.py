@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from turn.models import TurnRun, TurnPhaseRun
+from turn.turn import TURN_PHASES
+from world.models.geography import World
+
+
+class Command(BaseCommand):
+    help = 'Shows how each turn phase of a world performed in recent turns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('world_id', type=int)
+        parser.add_argument('--turns', type=int, default=12)
+        parser.add_argument(
+            '--metric',
+            choices=TurnPhaseRun.METRICS,
+            default='wall_time_ms'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            world = World.objects.get(pk=options['world_id'])
+        except World.DoesNotExist:
+            raise CommandError('World with id {} does not exist'.format(
+                options['world_id']
+            ))
+
+        turn_runs = list(reversed(
+            TurnRun.objects.filter(world=world).order_by('-turn')[
+                :options['turns']]
+        ))
+        if not turn_runs:
+            raise CommandError('No turns recorded in {}'.format(world))
+
+        values = {
+            (phase_run.turn_run_id, phase_run.name):
+                getattr(phase_run, options['metric'])
+            for phase_run in TurnPhaseRun.objects.filter(
+                turn_run__in=turn_runs)
+        }
+
+        name_width = max(len(turn_phase.name) for turn_phase in TURN_PHASES)
+        self.stdout.write('{} in {}'.format(options['metric'], world))
+        self.stdout.write(
+            ' ' * name_width +
+            ''.join('{:>10}'.format(turn_run.turn) for turn_run in turn_runs)
+        )
+        for turn_phase in TURN_PHASES:
+            self.stdout.write(
+                turn_phase.name.ljust(name_width) +
+                ''.join(
+                    '{:>10}'.format(
+                        self.format_value(
+                            values.get((turn_run.id, turn_phase.name))
+                        )
+                    )
+                    for turn_run in turn_runs
+                )
+            )
+
+    @staticmethod
+    def format_value(value):
+        return '-' if value is None else value
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('world', '0006_auto_20180819_2122'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('turn', models.IntegerField()),
+                ('start_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.BooleanField(default=False)),
+                ('world', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='world.world')),
+            ],
+            options={
+                'unique_together': {('world', 'turn')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TurnPhaseRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('start_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('completed', models.BooleanField(default=False)),
+                ('turn_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='turn.turnrun')),
+            ],
+            options={
+                'unique_together': {('turn_run', 'name')},
+            },
+        ),
+    ]
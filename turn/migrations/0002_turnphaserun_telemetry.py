@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turn', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='turnphaserun',
+            name='query_count',
+            field=models.IntegerField(blank=True, help_text='Including the queries of pool workers', null=True),
+        ),
+        migrations.AddField(
+            model_name='turnphaserun',
+            name='query_time_ms',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='turnphaserun',
+            name='rows_written',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='turnphaserun',
+            name='wall_time_ms',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TurnPhaseItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('turn_phase_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='turn.turnphaserun')),
+            ],
+            options={
+                'unique_together': {('turn_phase_run', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+from django.db import models
+from django.utils import timezone
+
+
+class TurnRun(models.Model):
+    class Meta:
+        unique_together = (
+            ("world", "turn"),
+        )
+
+    world = models.ForeignKey('world.World', models.CASCADE)
+    turn = models.IntegerField()
+    start_time = models.DateTimeField(default=timezone.now)
+    end_time = models.DateTimeField(blank=True, null=True)
+    finished = models.BooleanField(default=False)
+
+    def phase_completed(self, name):
+        return self.turnphaserun_set.filter(
+            name=name, completed=True).exists()
+
+    def start_phase(self, name):
+        phase_run, created = TurnPhaseRun.objects.get_or_create(
+            turn_run=self,
+            name=name
+        )
+        phase_run.start_time = timezone.now()
+        phase_run.save()
+        return phase_run
+
+    def __str__(self):
+        return "Turn {} in {}".format(self.turn, self.world)
+
+
+class TurnPhaseRun(models.Model):
+    class Meta:
+        unique_together = (
+            ("turn_run", "name"),
+        )
+
+    turn_run = models.ForeignKey(TurnRun, models.CASCADE)
+    name = models.CharField(max_length=100)
+    start_time = models.DateTimeField(default=timezone.now)
+    end_time = models.DateTimeField(blank=True, null=True)
+    completed = models.BooleanField(default=False)
+    wall_time_ms = models.IntegerField(blank=True, null=True)
+    query_count = models.IntegerField(
+        blank=True, null=True,
+        help_text="Including the queries of pool workers"
+    )
+    query_time_ms = models.IntegerField(blank=True, null=True)
+    rows_written = models.IntegerField(blank=True, null=True)
+
+    METRICS = ('wall_time_ms', 'query_count', 'query_time_ms', 'rows_written')
+
+    def complete(self, stats=None):
+        self.end_time = timezone.now()
+        self.completed = True
+        self.wall_time_ms = int(
+            (self.end_time - self.start_time).total_seconds() * 1000)
+        if stats is not None:
+            self.query_count = stats.query_count
+            self.query_time_ms = int(stats.query_time * 1000)
+            self.rows_written = stats.rows_written
+        self.save()
+
+    def __str__(self):
+        return "{} of {}".format(self.name, self.turn_run)
+
+
+class TurnPhaseItem(models.Model):
+    """
+    An element of a phase (a battle, a settlement...) whose changes were
+    committed on their own, see turn.phases.parallel_items().
+    """
+    class Meta:
+        unique_together = (
+            ("turn_phase_run", "key"),
+        )
+
+    turn_phase_run = models.ForeignKey(TurnPhaseRun, models.CASCADE)
+    key = models.CharField(max_length=100)
+
+    def __str__(self):
+        return "{} in {}".format(self.key, self.turn_phase_run)
@@ -4,16 +4,19 @@ from django.db import transaction
 
 from context_managers import perf_timer
 from finem_imperii.random import WeightedChoice, weighted_choice
-from parallelism import parallel
+from turn.phases import parallel_items
+from turn.unit_of_work import save_later
 from world.models.buildings import Building
 from world.models.geography import World, Settlement
 from world.models.npcs import NPC
 
 
 def worldwide_npc_job_updates(world: World):
-    parallel(
+    parallel_items(
         settlement_job_updates,
-        Settlement.objects.filter(tile__world=world)[:]
+        Settlement.objects.filter(tile__world=world)[:],
+        key=lambda settlement: settlement.id,
+        weight=lambda settlement: settlement.population
     )
 
 
@@ -36,7 +39,7 @@ def settlement_job_updates(settlement: Settlement):
 
         for jobseeker in npcs_looking_for_a_job:
             jobseeker.workplace = weighted_choice(field_choices)
-            jobseeker.save()
+            save_later(jobseeker, 'workplace')
 
         guild_workers = settlement.get_residents().filter(
             workplace__type=Building.GUILD
@@ -49,7 +52,7 @@ def settlement_job_updates(settlement: Settlement):
             if settlement.guilds_setting == Settlement.GUILDS_PROHIBIT:
                 for guild_worker in guild_workers:
                     guild_worker.workplace = weighted_choice(field_choices)
-                    guild_worker.save()
+                    save_later(guild_worker, 'workplace')
             elif settlement.guilds_setting == Settlement.GUILDS_RESTRICT:
                 num_guild_workers_to_remove = max(
                     10,
@@ -63,7 +66,7 @@ def settlement_job_updates(settlement: Settlement):
                         num_guild_workers_to_remove
                 ):
                     guild_worker.workplace = weighted_choice(field_choices)
-                    guild_worker.save()
+                    save_later(guild_worker, 'workplace')
             elif settlement.guilds_setting == Settlement.GUILDS_KEEP:
                 pass
             elif settlement.guilds_setting == Settlement.GUILDS_PROMOTE:
@@ -81,4 +84,4 @@ def settlement_job_updates(settlement: Settlement):
                     field_worker.workplace = settlement.building_set.get(
                         type=Building.GUILD
                     )
-                    field_worker.save()
+                    save_later(field_worker, 'workplace')
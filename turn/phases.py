@@ -0,0 +1,189 @@
+import functools
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django import db
+from django.db import transaction
+
+from context_managers import perf_timer, query_stats
+from identity_map import writing
+from parallelism import parallelism_enabled, parallel
+from turn.models import TurnRun, TurnPhaseItem
+from turn.unit_of_work import unit_of_work
+from world.models.geography import World
+
+TurnPhase = namedtuple(
+    'TurnPhase', ['name', 'function', 'reads', 'writes']
+)
+
+_local = threading.local()
+
+
+def phase(name, function, reads=(), writes=()):
+    """
+    Declares a turn phase together with the game state it touches. reads
+    and writes name the models whose rows the phase reads or writes (e.g.
+    'npc', 'settlement'). Turn code saves whole rows, so two phases that
+    write different columns of the same rows still conflict. Messages are
+    append-only, so they are not declared.
+    """
+    return TurnPhase(name, function, frozenset(reads), frozenset(writes))
+
+
+def phases_conflict(earlier: TurnPhase, later: TurnPhase):
+    return bool(
+        earlier.writes & (later.reads | later.writes) or
+        earlier.reads & later.writes
+    )
+
+
+def schedule_phases(phases):
+    """
+    Groups phases in stages. A phase is placed in the stage after the
+    last earlier phase it conflicts with, so conflicting phases keep
+    their declaration order and phases within a stage are independent.
+    """
+    stages = []
+    stage_of_phase = []
+    for i, current_phase in enumerate(phases):
+        stage = 0
+        for j in range(i):
+            if phases_conflict(phases[j], current_phase):
+                stage = max(stage, stage_of_phase[j] + 1)
+        stage_of_phase.append(stage)
+        if stage == len(stages):
+            stages.append([])
+        stages[stage].append(current_phase)
+    return stages
+
+
+class WriteDetector:
+    """
+    Notes whether the current thread's connection wrote anything, so that
+    parallel_items() can check it before handing elements to pool workers.
+    """
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+def run_phase(turn_run: TurnRun, world: World, turn_phase: TurnPhase):
+    if turn_run.phase_completed(turn_phase.name):
+        logging.info('[{}] already completed, skipping'.format(
+            turn_phase.name))
+        return
+
+    phase_run = turn_run.start_phase(turn_phase.name)
+    _local.phase_run = phase_run
+    _local.writes = WriteDetector()
+    try:
+        with perf_timer(turn_phase.name):
+            # Elements run by parallel_items() commit on their own when
+            # they run in pool workers, everything else is only kept if the
+            # phase gets to mark itself as completed.
+            with transaction.atomic():
+                with query_stats() as stats, \
+                        db.connection.execute_wrapper(_local.writes):
+                    with writing(turn_phase.writes), unit_of_work():
+                        turn_phase.function(world)
+                phase_run.complete(stats)
+    finally:
+        _local.phase_run = None
+        _local.writes = None
+
+
+def current_phase_run():
+    return getattr(_local, 'phase_run', None)
+
+
+def _run_item(turn_phase_run_id, operator, item):
+    key, element = item
+    with transaction.atomic():
+        with unit_of_work():
+            result = operator(element)
+        TurnPhaseItem.objects.create(
+            turn_phase_run_id=turn_phase_run_id, key=key)
+    return result
+
+
+def parallel_items(operator, elements, key, weight=None):
+    """
+    parallel() for the elements of a phase that apply their changes
+    independently, like pool workers do. Each element runs in a
+    transaction together with a record of its completion (key(element))
+    in the current phase run, so a phase resumed after a failure skips the
+    elements that were already applied instead of applying them twice.
+    Returns the results of the elements that were run. Outside a turn phase
+    it's the same as parallel().
+
+    The transaction of the phase stays open while pool workers commit the
+    elements on their own connections, so a row the phase wrote before
+    dispatching would keep the workers waiting on its lock while the phase
+    waits on them. The phase must not write anything before calling this
+    with parallelism enabled; a RuntimeError is raised if it did.
+    """
+    phase_run = current_phase_run()
+    if phase_run is None:
+        return parallel(operator, elements, weight)
+
+    writes = getattr(_local, 'writes', None)
+    if parallelism_enabled() and writes is not None and writes.wrote:
+        raise RuntimeError(
+            "{} wrote before handing its elements to pool workers".format(
+                phase_run.name)
+        )
+
+    done = set(phase_run.turnphaseitem_set.values_list('key', flat=True))
+    pending = [
+        (item_key, element)
+        for item_key, element in (
+            (str(key(element)), element) for element in elements
+        )
+        if item_key not in done
+    ]
+    return parallel(
+        functools.partial(_run_item, phase_run.id, operator),
+        pending,
+        weight=None if weight is None else lambda item: weight(item[1])
+    )
+
+
+def run_phase_in_thread(turn_run_id, turn_phase: TurnPhase):
+    try:
+        turn_run = TurnRun.objects.get(pk=turn_run_id)
+        run_phase(turn_run, turn_run.world, turn_phase)
+    finally:
+        db.connection.close()
+
+
+def run_stage(turn_run: TurnRun, world: World, stage):
+    if not parallelism_enabled() or len(stage) == 1:
+        for turn_phase in stage:
+            run_phase(turn_run, world, turn_phase)
+        return
+
+    with ThreadPoolExecutor(max_workers=len(stage)) as executor:
+        futures = [
+            executor.submit(run_phase_in_thread, turn_run.id, turn_phase)
+            for turn_phase in stage
+        ]
+    for future in futures:
+        future.result()
+
+
+def run_phases(turn_run: TurnRun, world: World, phases):
+    if not parallelism_enabled():
+        for turn_phase in phases:
+            run_phase(turn_run, world, turn_phase)
+        return
+
+    for stage in schedule_phases(phases):
+        with perf_timer('Stage: {}'.format(
+                ', '.join(turn_phase.name for turn_phase in stage))):
+            run_stage(turn_run, world, stage)
@@ -1,46 +1,101 @@
-import random
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
 
+from turn.demography import hunger_percentages
 from unit.models import WorldUnit
 from world.models.geography import World, Settlement
+from world.models.npcs import NPC
+from world.npc_columns import NPCColumns, settlements_by_tile
 
 
 def worldwide_public_order(world: World):
-    for tile in world.tile_set.all():
-        for settlement in tile.settlement_set.all():
-            do_settlement_public_order_update(settlement)
+    for settlements in settlements_by_tile(world):
+        settlements_public_order_update(settlements)
 
 
 def do_settlement_public_order_update(settlement: Settlement):
-    hunger_percent = settlement.get_hunger_percentage()
-    if hunger_percent > 20:
-        settlement.public_order -= (hunger_percent - 20) * 5
-    elif hunger_percent < 10:
-        settlement.public_order += (10 - hunger_percent) * 10
-    settlement.make_public_order_in_range()
-
-    non_barbarian_units = WorldUnit.objects.filter(
-        location=settlement,
-        owner_character__isnull=False
+    settlements_public_order_update(
+        Settlement.objects.filter(id=settlement.id)
     )
+    settlement.refresh_from_db()
 
-    public_order_contributing_units = []
-    settlement_vm = settlement.tile.controlled_by.get_violence_monopoly()
-    for non_barbarian_unit in non_barbarian_units:
-        char_vm = non_barbarian_unit.owner_character.get_violence_monopoly()
-        if char_vm == settlement_vm:
-            public_order_contributing_units.append(
-                non_barbarian_unit
-            )
-    contributing_soldiers = sum(
-        [unit.soldier.count() for unit in public_order_contributing_units]
+
+def contributing_soldiers(settlements_queryset, settlements):
+    """
+    Soldiers in each settlement that belong to units whose owner is in the
+    violence monopoly controlling the settlement.
+    """
+    settlement_violence_monopolies = {}
+    for settlement in settlements:
+        controller = settlement.tile.controlled_by
+        if controller.id not in settlement_violence_monopolies:
+            settlement_violence_monopolies[controller.id] = \
+                controller.get_violence_monopoly()
+
+    character_violence_monopolies = {}
+    soldiers = {}
+    for non_barbarian_unit in WorldUnit.objects.filter(
+            location__in=settlements_queryset,
+            owner_character__isnull=False
+    ).select_related('owner_character', 'location__tile').annotate(
+        soldier_count=Count('soldier')
+    ):
+        owner = non_barbarian_unit.owner_character
+        if owner.id not in character_violence_monopolies:
+            character_violence_monopolies[owner.id] = \
+                owner.get_violence_monopoly()
+        settlement_vm = settlement_violence_monopolies.get(
+            non_barbarian_unit.location.tile.controlled_by_id)
+        if character_violence_monopolies[owner.id] == settlement_vm:
+            soldiers[non_barbarian_unit.location_id] = \
+                soldiers.get(non_barbarian_unit.location_id, 0) + \
+                non_barbarian_unit.soldier_count
+
+    return np.array(
+        [soldiers.get(settlement.id, 0) for settlement in settlements],
+        dtype=np.int64
+    )
+
+
+@transaction.atomic
+def settlements_public_order_update(settlements_queryset):
+    settlements = list(
+        settlements_queryset.order_by('id').select_related(
+            'tile__controlled_by')
+    )
+    settlement_ids = np.array([s.id for s in settlements], dtype=np.int64)
+    residents = NPCColumns(
+        NPC.objects.filter(residence__settlement__in=settlements_queryset)
     )
-    soldier_to_pop_ratio = contributing_soldiers / settlement.population
+    hunger_percent, _ = hunger_percentages(
+        settlement_ids, residents)
 
-    settlement.public_order += soldier_to_pop_ratio * 500
-    settlement.make_public_order_in_range()
+    public_order = np.array(
+        [s.public_order for s in settlements], dtype=np.float64)
+    public_order -= np.where(
+        hunger_percent > 20, (hunger_percent - 20) * 5, 0)
+    public_order += np.where(
+        hunger_percent < 10, (10 - hunger_percent) * 10, 0)
+    public_order = np.clip(public_order, 0, 1000)
 
-    if soldier_to_pop_ratio < 0.05:
-        settlement.public_order -= random.randint(0, 70)
+    population = np.array(
+        [s.population for s in settlements], dtype=np.float64)
+    soldier_to_pop_ratio = np.divide(
+        contributing_soldiers(settlements_queryset, settlements),
+        population,
+        out=np.zeros(len(settlements)),
+        where=population > 0
+    )
+    public_order = np.clip(public_order + soldier_to_pop_ratio * 500, 0, 1000)
+
+    public_order -= np.where(
+        soldier_to_pop_ratio < 0.05,
+        residents.rng.integers(0, 71, len(settlements)),
+        0
+    )
+    public_order = np.clip(public_order, 0, 1000)
 
-    settlement.make_public_order_in_range()
-    settlement.save()
+    for settlement, settlement_public_order in zip(settlements, public_order):
+        settlement.public_order = int(settlement_public_order)
+    Settlement.objects.bulk_update(settlements, ['public_order'])
@@ -2,6 +2,7 @@ import math
 
 from messaging import shortcuts
 from organization.models.organization import Organization
+from turn.unit_of_work import save_later
 from world.models.buildings import Building
 from world.models.geography import World
 
@@ -12,11 +13,10 @@ def worldwide_taxes(world: World):
             continue
 
         state.tax_countdown -= 1
-        state.save()
         if state.tax_countdown <= 0:
             do_state_taxes(state)
             state.tax_countdown = 6
-            state.save()
+        save_later(state, 'tax_countdown')
 
 
 def do_state_taxes(state: Organization):
@@ -26,7 +26,7 @@ def do_state_taxes(state: Organization):
     settlement_input = []
     total_input = 0
     for tile in state.get_all_controlled_tiles():
-        for settlement in tile.settlement_set.all():
+        for settlement in tile.get_settlements():
             t = 0
             for guild in settlement.building_set.filter(
                     type=Building.GUILD):
@@ -34,7 +34,7 @@ def do_state_taxes(state: Organization):
                 t += cash_produced
                 total_input += cash_produced
                 guild.field_production_counter = 0
-                guild.save()
+                save_later(guild, 'field_production_counter')
 
             settlement_input.append(
                 (settlement, t)
@@ -45,7 +45,7 @@ def do_state_taxes(state: Organization):
     )
     for member in state.character_members.all():
         member.cash += member_share
-        member.save()
+        save_later(member, 'cash')
 
     message = shortcuts.create_message(
         'messaging/messages/tax_collection.html',
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from turn.benchmark import run_benchmark, report_table, INITIALIZE_WORLD
+from turn.turn import TURN_PHASES
+from world.models.geography import World
+
+
+class TestBenchmark(TestCase):
+    def test_run_benchmark(self):
+        report = run_benchmark([200, 400], turns=2, unit_size=5)
+        self.assertEqual(len(report['worlds']), 2)
+        self.assertEqual(World.objects.count(), 2)
+        for world_report, npcs in zip(report['worlds'], [200, 400]):
+            self.assertEqual(world_report['size']['npcs'], npcs)
+            self.assertIsNotNone(
+                world_report[INITIALIZE_WORLD]['wall_time_ms'])
+            self.assertEqual(
+                [turn['turn'] for turn in world_report['turns']], [0, 1])
+            for turn in world_report['turns']:
+                self.assertEqual(
+                    set(turn['phases'].keys()),
+                    {turn_phase.name for turn_phase in TURN_PHASES}
+                )
+
+        lines = report_table(report)
+        self.assertTrue(lines[2].startswith(INITIALIZE_WORLD))
+        self.assertEqual(len(lines), len(TURN_PHASES) + 4)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_turn', npcs=[100], units=1, unit_size=5,
+                metric='query_count', output=path, stdout=out
+            )
+            with open(path) as report_file:
+                report = json.load(report_file)
+        self.assertEqual(report['worlds'][0]['size']['npcs'], 100)
+        output = out.getvalue()
+        self.assertIn('query_count', output)
+        for turn_phase in TURN_PHASES:
+            self.assertIn(turn_phase.name, output)
@@ -2,6 +2,7 @@ from django.test import TestCase
 
 from turn.demography import do_settlement_food_consumption
 from world.initialization import initialize_settlement
+from world.models.buildings import Building
 from world.models.geography import Settlement
 
 
@@ -83,3 +84,10 @@ class TestFoodConsumption(TestCase):
         self.assertEqual(bushels.quantity, 0)
 
         self.assertEqual(settlement.npc_set.filter(hunger=0).count(), 10)
+
+    def test_settlement_without_public_granary(self):
+        settlement = Settlement.objects.get(name="Small Valley")
+        settlement.get_default_granary().delete()
+
+        with self.assertRaises(Building.DoesNotExist):
+            do_settlement_food_consumption(settlement)
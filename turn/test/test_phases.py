@@ -0,0 +1,191 @@
+from unittest import mock
+
+from django.db.models import F
+from django.test import TestCase
+
+from turn.models import TurnRun
+from turn.phases import phase, schedule_phases, phases_conflict, \
+    parallel_items, run_phase, run_phases
+from turn.turn import TURN_PHASES
+from unit.models import WorldUnit
+from world.initialization import initialize_unit
+from world.models.geography import World, Settlement
+
+
+def noop(world):
+    pass
+
+
+crashing_settlements = set()
+
+
+def grow(settlement):
+    if settlement.id in crashing_settlements:
+        raise ValueError("Worker died")
+    Settlement.objects.filter(id=settlement.id).update(
+        population=F('population') + 1)
+
+
+def worldwide_growth(world):
+    parallel_items(
+        grow,
+        Settlement.objects.filter(tile__world=world).order_by('id'),
+        key=lambda settlement: settlement.id
+    )
+
+
+def worldwide_write_then_growth(world):
+    Settlement.objects.filter(tile__world=world).update(public_order=500)
+    worldwide_growth(world)
+
+
+class TestPhaseScheduling(TestCase):
+    def test_independent_phases_share_stage(self):
+        phases = [
+            phase('a', noop, reads=('x', ), writes=('y', )),
+            phase('b', noop, reads=('x', ), writes=('z', )),
+        ]
+        self.assertEqual(schedule_phases(phases), [phases])
+
+    def test_read_after_write(self):
+        phases = [
+            phase('a', noop, writes=('x', )),
+            phase('b', noop, reads=('x', )),
+        ]
+        self.assertEqual(schedule_phases(phases), [[phases[0]], [phases[1]]])
+
+    def test_write_after_read(self):
+        phases = [
+            phase('a', noop, reads=('x', )),
+            phase('b', noop, writes=('x', )),
+        ]
+        self.assertTrue(phases_conflict(phases[0], phases[1]))
+        self.assertEqual(len(schedule_phases(phases)), 2)
+
+    def test_late_independent_phase_goes_to_first_stage(self):
+        phases = [
+            phase('a', noop, writes=('x', )),
+            phase('b', noop, reads=('x', ), writes=('y', )),
+            phase('c', noop, reads=('z', )),
+        ]
+        stages = schedule_phases(phases)
+        self.assertEqual(stages, [[phases[0], phases[2]], [phases[1]]])
+
+    def test_turn_phases_keep_order_of_conflicting_phases(self):
+        stages = schedule_phases(TURN_PHASES)
+        stage_of_phase = {
+            turn_phase.name: i
+            for i, stage in enumerate(stages)
+            for turn_phase in stage
+        }
+        self.assertEqual(len(stage_of_phase), len(TURN_PHASES))
+        for i, later in enumerate(TURN_PHASES):
+            for earlier in TURN_PHASES[:i]:
+                if phases_conflict(earlier, later):
+                    self.assertLess(
+                        stage_of_phase[earlier.name],
+                        stage_of_phase[later.name]
+                    )
+
+    def test_phases_saving_the_same_rows_are_in_different_stages(self):
+        stages = schedule_phases(TURN_PHASES)
+        stage_of_phase = {
+            turn_phase.name: i
+            for i, stage in enumerate(stages)
+            for turn_phase in stage
+        }
+        for first, second in (
+                ('Restore character hours', 'Unit maintenance'),
+                ('Barbarian generation', 'NPC job updates'),
+                ('Building production', 'Taxes')):
+            self.assertNotEqual(
+                stage_of_phase[first], stage_of_phase[second])
+
+
+class TestPhaseStages(TestCase):
+    fixtures = ['simple_world']
+
+    @mock.patch('turn.phases.parallelism_enabled', return_value=True)
+    def test_phases_saving_the_same_rows_keep_both_writes(self, _):
+        world = World.objects.get(id=2)
+        unit = WorldUnit.objects.get(id=1)
+        initialize_unit(unit)
+        unit.auto_pay = True
+        unit.save()
+        character = unit.owner_character
+        character.hours_in_turn_left = 0
+        character.cash = 1000
+        character.save()
+
+        turn_run = TurnRun.objects.create(world=world, turn=0)
+        run_phases(turn_run, world, [
+            turn_phase for turn_phase in TURN_PHASES
+            if turn_phase.name in (
+                'Restore character hours', 'Unit maintenance')
+        ])
+
+        character.refresh_from_db()
+        self.assertEqual(character.hours_in_turn_left, 15 * 24)
+        self.assertEqual(character.cash, 1000 - unit.soldier.count())
+
+
+class TestPhaseItems(TestCase):
+    fixtures = ['simple_world']
+
+    def test_resumed_phase_applies_every_element_once(self):
+        world = World.objects.get(id=2)
+        settlements = list(
+            Settlement.objects.filter(tile__world=world).order_by('id'))
+        self.assertGreater(len(settlements), 2)
+        populations = {
+            settlement.id: settlement.population
+            for settlement in settlements
+        }
+        turn_run = TurnRun.objects.create(world=world, turn=0)
+        growth = phase('Growth', worldwide_growth)
+
+        # A worker dies halfway through the phase. Like every element run by
+        # a pool worker, the ones before it committed on their own.
+        phase_run = turn_run.start_phase(growth.name)
+        crashing_settlements.add(settlements[1].id)
+        try:
+            with mock.patch('turn.phases.current_phase_run',
+                            return_value=phase_run):
+                with self.assertRaises(ValueError):
+                    worldwide_growth(world)
+        finally:
+            crashing_settlements.clear()
+        self.assertEqual(
+            Settlement.objects.get(id=settlements[0].id).population,
+            populations[settlements[0].id] + 1
+        )
+
+        run_phase(turn_run, world, growth)
+
+        self.assertTrue(turn_run.phase_completed(growth.name))
+        for settlement in settlements:
+            self.assertEqual(
+                Settlement.objects.get(id=settlement.id).population,
+                populations[settlement.id] + 1
+            )
+        self.assertEqual(
+            phase_run.turnphaseitem_set.count(), len(settlements))
+
+    def test_elements_outside_phases_are_not_recorded(self):
+        world = World.objects.get(id=2)
+        worldwide_growth(world)
+        worldwide_growth(world)
+        self.assertFalse(TurnRun.objects.exists())
+
+    @mock.patch('turn.phases.parallelism_enabled', return_value=True)
+    def test_phase_must_not_write_before_dispatching(self, _):
+        world = World.objects.get(id=2)
+        turn_run = TurnRun.objects.create(world=world, turn=0)
+
+        with self.assertRaises(RuntimeError):
+            run_phase(turn_run, world, phase(
+                'Write then grow', worldwide_write_then_growth))
+        self.assertFalse(turn_run.phase_completed('Write then grow'))
+
+        run_phase(turn_run, world, phase('Growth', worldwide_growth))
+        self.assertTrue(turn_run.phase_completed('Growth'))
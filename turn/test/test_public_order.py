@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from turn.public_order import do_settlement_public_order_update
+from world.initialization import initialize_settlement
+from world.models.geography import Settlement
+
+
+class TestPublicOrder(TestCase):
+    fixtures = ['simple_world']
+
+    def setUp(self):
+        self.settlement = Settlement.objects.get(name="Small Valley")
+        self.settlement.population_default = 100
+        initialize_settlement(self.settlement)
+
+    def test_hunger_lowers_public_order(self):
+        self.settlement.npc_set.update(hunger=2)
+        self.settlement.public_order = 1000
+        self.settlement.save()
+
+        do_settlement_public_order_update(self.settlement)
+
+        self.assertLessEqual(self.settlement.public_order, 600)
+        self.assertGreaterEqual(self.settlement.public_order, 530)
+
+    def test_satiated_population_raises_public_order(self):
+        self.settlement.public_order = 200
+        self.settlement.save()
+
+        do_settlement_public_order_update(self.settlement)
+
+        self.assertLessEqual(self.settlement.public_order, 300)
+        self.assertGreaterEqual(self.settlement.public_order, 230)
+
+    def test_empty_settlement(self):
+        self.settlement.npc_set.all().delete()
+        self.settlement.population = 0
+        self.settlement.public_order = 500
+        self.settlement.save()
+
+        do_settlement_public_order_update(self.settlement)
+
+        self.assertLessEqual(self.settlement.public_order, 600)
@@ -1,3 +1,7 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command, CommandError
 from django.test import TestCase
 from django.urls.base import reverse
 
@@ -9,9 +13,13 @@ from turn.battle import organizations_with_battle_ready_units, \
     get_largest_conflict_in_list, create_battle_from_conflict
 from turn.conquest import worldwide_conquests
 from turn.demography import do_settlement_population_changes
+from turn.models import TurnRun, TurnPhaseRun
+from turn.phases import phase
+from turn.turn import pass_turn as pass_turn_func, TURN_PHASES
 from turn.unit import do_unit_debt_increase
 from unit.models import WorldUnit
 from world.admin import pass_turn
+from world.generation import generate_world
 from world.initialization import initialize_unit, initialize_settlement
 from world.models.events import TileEvent
 from world.models.geography import Tile, World, Settlement
@@ -208,3 +216,169 @@ class TestTurn(TestCase):
         initialize_unit(unit)
         do_unit_debt_increase(unit)
         self.assertEqual(unit.get_owners_debt(), 0)
+
+
+def failing_phase(world):
+    raise Exception("Phase failure")
+
+
+class TestTurnResume(TestCase):
+    fixtures = ['simple_world']
+
+    def test_turn_run_is_recorded(self):
+        world = World.objects.get(id=2)
+        pass_turn_func(world)
+        turn_run = TurnRun.objects.get(world=world, turn=0)
+        self.assertTrue(turn_run.finished)
+        self.assertEqual(
+            turn_run.turnphaserun_set.filter(completed=True).count(),
+            len(TURN_PHASES)
+        )
+
+    def test_failed_turn_resumes_from_failed_phase(self):
+        world = World.objects.get(id=2)
+        phases = TURN_PHASES[:2] + (phase('Failure', failing_phase), )
+
+        with mock.patch('turn.turn.TURN_PHASES', new=phases):
+            with self.assertRaises(Exception):
+                pass_turn_func(world)
+
+        world.refresh_from_db()
+        self.assertTrue(world.blocked_for_turn)
+        self.assertEqual(world.current_turn, 0)
+        turn_run = TurnRun.objects.get(world=world, turn=0)
+        self.assertFalse(turn_run.finished)
+        self.assertTrue(turn_run.phase_completed(TURN_PHASES[0].name))
+        self.assertTrue(turn_run.phase_completed(TURN_PHASES[1].name))
+        self.assertFalse(turn_run.phase_completed('Failure'))
+
+        first_phase_end_time = TurnPhaseRun.objects.get(
+            turn_run=turn_run, name=TURN_PHASES[0].name).end_time
+
+        pass_turn_func(world)
+
+        self.assertEqual(
+            TurnPhaseRun.objects.get(
+                turn_run=turn_run, name=TURN_PHASES[0].name).end_time,
+            first_phase_end_time
+        )
+        world.refresh_from_db()
+        self.assertFalse(world.blocked_for_turn)
+        self.assertEqual(world.current_turn, 1)
+        turn_run.refresh_from_db()
+        self.assertTrue(turn_run.finished)
+
+    def test_completed_phase_is_not_run_again(self):
+        world = World.objects.get(id=2)
+        turn_run = TurnRun.objects.create(world=world, turn=0)
+        turn_run.start_phase('Taxes').complete()
+        tax_countdowns = {
+            state.id: state.tax_countdown
+            for state in world.get_violence_monopolies()
+        }
+
+        pass_turn_func(world)
+
+        for state in world.get_violence_monopolies():
+            self.assertEqual(state.tax_countdown, tax_countdowns[state.id])
+
+
+class TestTurnTelemetry(TestCase):
+    fixtures = ['simple_world']
+
+    def test_phase_telemetry_is_recorded(self):
+        world = World.objects.get(id=2)
+        pass_turn_func(world)
+        phase_run = TurnPhaseRun.objects.get(
+            turn_run__world=world,
+            turn_run__turn=0,
+            name='Restore character hours'
+        )
+        self.assertIsNotNone(phase_run.wall_time_ms)
+        self.assertGreater(phase_run.query_count, 0)
+        self.assertGreater(phase_run.rows_written, 0)
+        self.assertIsNotNone(phase_run.query_time_ms)
+
+    def test_turn_stats_command(self):
+        world = World.objects.get(id=2)
+        pass_turn_func(world)
+        pass_turn_func(world)
+        out = StringIO()
+        call_command('turn_stats', world.id, metric='query_count', stdout=out)
+        output = out.getvalue()
+        self.assertIn('query_count', output)
+        for turn_phase in TURN_PHASES:
+            self.assertIn(turn_phase.name, output)
+
+
+class TestPassTurnCommand(TestCase):
+    fixtures = ['simple_world']
+
+    def test_pass_turn_command(self):
+        out = StringIO()
+        call_command('pass_turn', 2, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Passed turn in Parvus (2)', output)
+        self.assertIn('Turn summary', output)
+        self.assertIn('1/1', output)
+        self.assertEqual(World.objects.get(id=2).current_turn, 1)
+
+    def test_failures_are_isolated(self):
+        other_world = generate_world(
+            "Other", tiles=4, settlements=2, npcs=100, units=1,
+            organizations=2
+        )
+
+        def fail_in_parvus(world, workers=None):
+            if world.id == 2:
+                raise ValueError("Turn failure")
+            pass_turn_func(world)
+
+        out = StringIO()
+        with mock.patch(
+                'world.management.commands.pass_turn.pass_turn',
+                side_effect=fail_in_parvus
+        ):
+            with self.assertRaisesMessage(CommandError, 'Parvus (2)'):
+                call_command(
+                    'pass_turn', 2, other_world.id, concurrency=2,
+                    stdout=out
+                )
+        output = out.getvalue()
+        self.assertIn('FAILED', output)
+        self.assertIn('1/2', output)
+        self.assertEqual(World.objects.get(id=2).current_turn, 0)
+        self.assertEqual(
+            World.objects.get(id=other_world.id).current_turn, 1)
+
+    @mock.patch('world.management.commands.pass_turn.cpu_count',
+                return_value=8)
+    @mock.patch('world.management.commands.pass_turn.parallelism_enabled',
+                return_value=True)
+    @mock.patch('world.management.commands.pass_turn.subprocess.Popen')
+    def test_subprocess_output_is_forwarded(self, popen, *_):
+        popen.side_effect = lambda *args, **kwargs: mock.Mock(
+            stdout=StringIO("Passed turn\n"),
+            stderr=StringIO("Phase timing\n"),
+            **{'wait.return_value': 0}
+        )
+        other_world = generate_world(
+            "Other", tiles=4, settlements=2, npcs=100, units=1,
+            organizations=2
+        )
+
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            'pass_turn', 2, other_world.id, concurrency=2, stdout=out,
+            stderr=err
+        )
+        self.assertIn('[2] Passed turn', out.getvalue())
+        self.assertIn(
+            '[{}] Passed turn'.format(other_world.id), out.getvalue())
+        self.assertIn('[2] Phase timing', err.getvalue())
+        self.assertIn('2/2', out.getvalue())
+        for call in popen.call_args_list:
+            command = call[0][0]
+            self.assertEqual(
+                command[command.index('--workers') + 1], '4')
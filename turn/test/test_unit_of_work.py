@@ -0,0 +1,123 @@
+from django.test import TestCase
+
+from context_managers import query_stats
+from turn.building_production import worldwide_building_production
+from turn.unit_of_work import unit_of_work, save_later, create_later
+from world.models.buildings import Building
+from world.models.events import TileEvent
+from world.models.geography import Settlement, World, Tile, Region
+
+
+class TestUnitOfWork(TestCase):
+    fixtures = ['simple_world']
+
+    def test_save_without_unit_of_work_is_immediate(self):
+        building = Building.objects.filter(type=Building.GUILD).first()
+        building.field_production_counter = 77
+        save_later(building, 'field_production_counter')
+        building.refresh_from_db()
+        self.assertEqual(building.field_production_counter, 77)
+
+    def test_saves_are_buffered_and_merged(self):
+        buildings = list(Building.objects.all())
+        with query_stats() as stats, unit_of_work():
+            for building in buildings:
+                building.field_production_counter = 5
+                save_later(building, 'field_production_counter')
+                building.level = 3
+                save_later(building, 'level')
+                building.field_production_counter = 10
+                save_later(building, 'field_production_counter')
+            self.assertEqual(stats.query_count, 0)
+        self.assertEqual(
+            Building.objects.filter(
+                field_production_counter=10, level=3).count(),
+            len(buildings)
+        )
+
+    def test_different_instances_of_the_same_row(self):
+        building_id = Building.objects.first().id
+        with unit_of_work():
+            building = Building.objects.get(id=building_id)
+            building.level = 4
+            save_later(building, 'level')
+            building = Building.objects.get(id=building_id)
+            building.quantity = 9
+            save_later(building, 'quantity')
+        building.refresh_from_db()
+        self.assertEqual(building.level, 4)
+        self.assertEqual(building.quantity, 9)
+
+    def test_nested_blocks_flush_once(self):
+        settlement = Settlement.objects.get(name="Small Valley")
+        with query_stats() as stats, unit_of_work():
+            with unit_of_work():
+                settlement.name = "Buffered"
+                save_later(settlement, 'name')
+            self.assertEqual(stats.query_count, 0)
+        self.assertTrue(Settlement.objects.filter(name="Buffered").exists())
+
+    def test_reads_flush_pending_saves(self):
+        building = Building.objects.first()
+        settlement = Settlement.objects.get(name="Small Valley")
+        with unit_of_work():
+            building.level = 7
+            save_later(building, 'level')
+            settlement.population = 1234
+            save_later(settlement, 'population')
+            self.assertEqual(
+                Building.objects.get(id=building.id).level, 7)
+            self.assertEqual(
+                Settlement.objects.get(id=settlement.id).population, 1234)
+
+    def test_reads_through_joins_and_subqueries_flush(self):
+        tile = Tile.objects.get(id=105)
+        with unit_of_work():
+            tile.name = "Renamed"
+            save_later(tile, 'name')
+            self.assertTrue(
+                Settlement.objects.filter(tile__name="Renamed").exists())
+
+            tile.name = "Renamed again"
+            save_later(tile, 'name')
+            self.assertTrue(Settlement.objects.filter(
+                tile__in=Tile.objects.filter(name="Renamed again")
+            ).exists())
+
+    def test_reads_of_other_tables_do_not_flush(self):
+        # world_tileevent starts with the name of world_tile
+        tile = Tile.objects.get(id=105)
+        with unit_of_work():
+            tile.name = "Renamed"
+            save_later(tile, 'name')
+            with self.assertNumQueries(1):
+                TileEvent.objects.count()
+        self.assertEqual(Tile.objects.get(id=105).name, "Renamed")
+
+    def test_creations_are_batched(self):
+        world = World.objects.get(id=2)
+        regions = Region.objects.count()
+        with query_stats() as stats, unit_of_work():
+            for i in range(3):
+                create_later(Region(world=world, name="New {}".format(i)))
+            self.assertEqual(stats.query_count, 0)
+        self.assertEqual(stats.query_count, 1)
+        self.assertEqual(Region.objects.count(), regions + 3)
+
+    def test_reads_see_pending_creations(self):
+        world = World.objects.get(id=2)
+        with unit_of_work():
+            create_later(Region(world=world, name="New"))
+            self.assertTrue(Region.objects.filter(name="New").exists())
+
+    def test_building_production_query_count(self):
+        world = World.objects.get(id=2)
+        world.current_turn = 4
+        world.save()
+        with query_stats() as buffered:
+            with unit_of_work():
+                worldwide_building_production(world)
+        self.assertLess(
+            buffered.query_count,
+            Building.objects.filter(settlement__tile__world=world).count() * 4
+        )
@@ -1,7 +1,15 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
 from context_managers import perf_timer
+from identity_map import identity_map
+from parallelism import worker_pool
 from turn.barbarians import worldwide_barbarian_generation
 from turn.battle import worldwide_trigger_battles, worldwide_battle_joins, \
-    worldwide_battle_starts, worldwide_battle_turns
+    worldwide_battle_starts, worldwide_battle_turns, \
+    worldwide_battle_archival
 from turn.building_production import worldwide_building_production
 from turn.character import worldwide_pause_characters, \
     worldwide_character_travels, \
@@ -10,13 +18,133 @@ from turn.conquest import worldwide_conquests
 from turn.demography import worldwide_food_consumption, \
     worldwide_population_changes
 from turn.elections import worldwide_elections
+from turn.models import TurnRun
 from turn.npc_jobs import worldwide_npc_job_updates
+from turn.phases import phase, run_phases
 from turn.public_order import worldwide_public_order
 from turn.taxes import worldwide_taxes
 from turn.unit import worldwide_unit_maintenance
 
 
-def pass_turn(world):
+TURN_PHASES = (
+    # phase('Delete dead realms', worldwide_delete_dead_realms),
+    phase(
+        'Pause characters', worldwide_pause_characters,
+        reads=('character', 'organization'),
+        writes=('character', 'organization', 'unit', 'npc')
+    ),
+    phase(
+        'Travels', worldwide_character_travels,
+        reads=('character', 'battle'),
+        writes=('character', 'unit')
+    ),
+    phase(
+        'Restore character hours', worldwide_restore_character_hours,
+        reads=('character', 'battle'),
+        writes=('character', )
+    ),
+    phase(
+        'Unit maintenance', worldwide_unit_maintenance,
+        reads=('unit', 'character', 'npc'),
+        writes=('unit', 'character', 'npc')
+    ),
+    phase(
+        'Battle starts', worldwide_battle_starts,
+        reads=('battle', 'unit', 'npc', 'organization', 'character'),
+        writes=('battle', )
+    ),
+    phase(
+        'Battle joins', worldwide_battle_joins,
+        reads=('battle', 'unit', 'npc', 'organization',
+               'organization_relationship', 'character'),
+        writes=('battle', )
+    ),
+    phase(
+        'Battle turns', worldwide_battle_turns,
+        reads=('battle', 'unit', 'order', 'organization'),
+        writes=('battle', 'unit', 'order', 'npc')
+    ),
+    phase(
+        'Battle archival', worldwide_battle_archival,
+        reads=('battle', ),
+        writes=('battle', )
+    ),
+    phase(
+        'Battle triggers', worldwide_trigger_battles,
+        reads=('battle', 'unit', 'npc', 'organization',
+               'organization_relationship'),
+        writes=('battle', )
+    ),
+    phase(
+        'Elections', worldwide_elections,
+        reads=('organization', 'election'),
+        writes=('organization', 'election')
+    ),
+    phase(
+        'Conquests', worldwide_conquests,
+        reads=('tile_event', 'tile', 'unit', 'npc', 'organization',
+               'settlement'),
+        writes=('tile_event', 'tile')
+    ),
+    phase(
+        'Barbarian generation', worldwide_barbarian_generation,
+        reads=('settlement', 'tile', 'unit', 'npc', 'organization'),
+        writes=('unit', 'npc')
+    ),
+    # phase('NPC resicence assignment',
+    #       worldwide_npc_residence_assignment),
+    phase(
+        'NPC job updates', worldwide_npc_job_updates,
+        reads=('npc', 'settlement', 'building', 'tile', 'organization'),
+        writes=('npc', )
+    ),
+    phase(
+        'Building production', worldwide_building_production,
+        reads=('npc', 'building', 'inventory'),
+        writes=('building', 'inventory')
+    ),
+    # phase('Trade', worldiwde_trade),
+    phase(
+        'Food consumption', worldwide_food_consumption,
+        reads=('settlement', 'inventory', 'npc'),
+        writes=('settlement', 'inventory', 'npc', 'unit')
+    ),
+    phase(
+        'Population changes', worldwide_population_changes,
+        reads=('settlement', 'npc'),
+        writes=('settlement', 'npc')
+    ),
+    # phase('Food spoilage', worldwide_food_spoilage),
+    phase(
+        'Public order', worldwide_public_order,
+        reads=('settlement', 'npc', 'unit', 'tile', 'organization'),
+        writes=('settlement', )
+    ),
+    phase(
+        'Taxes', worldwide_taxes,
+        reads=('organization', 'tile', 'building', 'character'),
+        writes=('organization', 'building', 'character')
+    ),
+)
+
+
+def get_turn_run(world):
+    """
+    Returns the run of the world's current turn. If a previous attempt
+    to pass this turn failed, its run is returned so that it can be
+    resumed from the first phase that did not complete.
+    """
+    turn_run, created = TurnRun.objects.get_or_create(
+        world=world,
+        turn=world.current_turn
+    )
+    if not created:
+        logging.info('Resuming turn {} in {} ({})'.format(
+            world.current_turn, world, world.id))
+    return turn_run
+
+
+def pass_turn(world, workers=None):
     with perf_timer('Turn in {} ({})'.format(
             world, world.id)):
 
@@ -24,50 +152,12 @@ def pass_turn(world):
             world.blocked_for_turn = True
             world.save()
 
-        # with perf_timer('Delete dead realms'):
-        #    worldwide_delete_dead_realms(world)
-        with perf_timer('Pause characters'):
-            worldwide_pause_characters(world)
-        with perf_timer('Travels'):
-            worldwide_character_travels(world)
-        with perf_timer('Restore character hours'):
-            worldwide_restore_character_hours(world)
-        with perf_timer('Unit maintenance'):
-            worldwide_unit_maintenance(world)
-        with perf_timer('Battle starts'):
-            worldwide_battle_starts(world)
-        with perf_timer('Battle joins'):
-            worldwide_battle_joins(world)
-        with perf_timer('Battle turns'):
-            worldwide_battle_turns(world)
-        with perf_timer('Battle triggers'):
-            worldwide_trigger_battles(world)
-        with perf_timer('Elections'):
-            worldwide_elections(world)
-        with perf_timer('Conquests'):
-            worldwide_conquests(world)
-        with perf_timer('Barbarian generation'):
-            worldwide_barbarian_generation(world)
-        # with perf_timer('NPC resicence assignment'):
-        #     worldwide_npc_residence_assignment()
-        with perf_timer('NPC job updates'):
-            worldwide_npc_job_updates(world)
-        with perf_timer('Building production'):
-            worldwide_building_production(world)
-        # with perf_timer('Trade'):
-        #     worldiwde_trade()
-        with perf_timer('Food consumption'):
-            worldwide_food_consumption(world)
-        with perf_timer('Population changes'):
-            worldwide_population_changes(world)
-        # with perf_timer('Food spoilage'):
-        #     worldwide_food_spoilage()
-        with perf_timer('Public order'):
-            worldwide_public_order(world)
-        with perf_timer('Taxes'):
-            worldwide_taxes(world)
+        turn_run = get_turn_run(world)
 
-        with perf_timer('Finalize turn'):
+        with worker_pool(workers), identity_map():
+            run_phases(turn_run, world, TURN_PHASES)
+
+        with perf_timer('Finalize turn'), transaction.atomic():
             world.current_turn += 1
             world.save()
 
@@ -77,5 +167,9 @@ def pass_turn(world):
                 {'world': world}
             )
 
+            turn_run.end_time = timezone.now()
+            turn_run.finished = True
+            turn_run.save()
+
             world.blocked_for_turn = False
             world.save()
@@ -1,11 +1,15 @@
+from turn.unit_of_work import save_later
 from unit.models import WorldUnit
 from world.models.geography import World
 
 
 def worldwide_unit_maintenance(world: World):
-    for unit in world.worldunit_set.all():
+    units = list(world.worldunit_set.all())
+    for unit in units:
         do_unit_status_update(unit)
         do_unit_debt_increase(unit)
+
+    for unit in units:
         if unit.auto_pay and unit.owner_character:
             if unit.get_owners_debt() <= unit.owner_character.cash:
                 unit.pay_debt(unit.owner_character)
@@ -20,11 +24,11 @@ def do_unit_status_update(unit: WorldUnit):
             unit.status = WorldUnit.FOLLOWING
         else:
             unit.status = WorldUnit.STANDING
-        unit.save()
+        save_later(unit, 'status')
 
 
 def do_unit_debt_increase(unit: WorldUnit):
     if unit.owner_character and unit.status != WorldUnit.NOT_MOBILIZED:
         for soldier in unit.soldier.all():
             soldier.unit_debt += 1
-            soldier.save()
+            save_later(soldier, 'unit_debt')
@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.db.models.expressions import BaseExpression
+from django.db.models.lookups import Lookup
+from django.db.models.sql.compiler import SQLCompiler
+from django.db.models.sql.query import Query
+from django.db.models.sql.where import WhereNode
+
+BULK_BATCH_SIZE = 1000
+
+_local = threading.local()
+
+
+class UnitOfWork:
+    """
+    Records the instances modified or created during a turn phase, so that
+    they can be written with a few bulk queries when the phase ends. Saving
+    the same row several times only writes it once, with the union of the
+    changed fields. An ORM query involving a model with pending rows, in
+    its FROM clause, a join or a subquery, writes everything first, so
+    pending rows are never read back stale. Raw SQL doesn't go through the
+    ORM and must call flush() first.
+    """
+    def __init__(self):
+        self.created = OrderedDict()
+        self.updated = OrderedDict()
+        self.flushing = False
+
+    def create(self, instance):
+        self.created.setdefault(type(instance), []).append(instance)
+
+    def update(self, instance, fields):
+        if instance.pk is None:
+            if not any(instance is created for created
+                       in self.created.get(type(instance), ())):
+                raise ValueError("{!r} is not saved".format(instance))
+            # Its creation writes all of its current values
+            return
+        rows = self.updated.setdefault(type(instance), OrderedDict())
+        _, values = rows.get(instance.pk, (instance, {}))
+        for field in fields:
+            values[field] = getattr(instance, field)
+        rows[instance.pk] = (instance, values)
+
+    def pending_tables(self):
+        return {
+            model._meta.db_table
+            for model in list(self.created) + list(self.updated)
+        }
+
+    def before_query(self, query):
+        if self.flushing or not (self.created or self.updated):
+            return
+        if self.pending_tables() & query_tables(query):
+            self.flush()
+
+    def flush(self):
+        created, self.created = self.created, OrderedDict()
+        updated, self.updated = self.updated, OrderedDict()
+        self.flushing = True
+        try:
+            for model, instances in created.items():
+                model.objects.bulk_create(
+                    instances, batch_size=BULK_BATCH_SIZE)
+            self.write(updated)
+        finally:
+            self.flushing = False
+
+    @staticmethod
+    def write(updated):
+        for model, rows in updated.items():
+            by_field_set = OrderedDict()
+            for instance, values in rows.values():
+                for field, value in values.items():
+                    setattr(instance, field, value)
+                by_field_set.setdefault(
+                    tuple(sorted(values.keys())), []
+                ).append(instance)
+            for fields, instances in by_field_set.items():
+                model.objects.bulk_update(
+                    instances, fields, batch_size=BULK_BATCH_SIZE)
+
+
+def query_tables(query: Query):
+    """
+    Tables of the models a query involves: its own, the joined ones and
+    those of its subqueries.
+    """
+    tables = {query.model._meta.db_table} if query.model else set()
+    tables.update(join.table_name for join in query.alias_map.values())
+    pending = [query.where, *query.annotations.values()]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, Query):
+            tables |= query_tables(node)
+        elif isinstance(node, WhereNode):
+            pending.extend(node.children)
+        elif isinstance(node, Lookup):
+            pending.extend((node.lhs, node.rhs))
+        elif isinstance(getattr(node, 'query', None), Query):
+            pending.append(node.query)
+        elif isinstance(node, BaseExpression):
+            pending.extend(node.get_source_expressions())
+    return tables
+
+
+_execute_sql = SQLCompiler.execute_sql
+
+
+def _execute_sql_after_flush(compiler, *args, **kwargs):
+    work = current_unit_of_work()
+    if work is not None:
+        work.before_query(compiler.query)
+    return _execute_sql(compiler, *args, **kwargs)
+
+
+# Every ORM read, update and delete goes through here; inserts don't read
+# anything and can't be affected by pending rows.
+SQLCompiler.execute_sql = _execute_sql_after_flush
+
+
+def current_unit_of_work():
+    return getattr(_local, 'unit_of_work', None)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Makes save_later() and create_later() buffer writes until the block
+    ends. Nested blocks share the outermost unit of work. Each thread has
+    its own, so phases running concurrently don't mix their writes.
+    """
+    if current_unit_of_work() is not None:
+        yield current_unit_of_work()
+        return
+
+    work = UnitOfWork()
+    _local.unit_of_work = work
+    try:
+        yield work
+        work.flush()
+    finally:
+        _local.unit_of_work = None
+
+
+def save_later(instance, *fields):
+    """
+    Saves the given fields of instance when the current unit of work is
+    flushed, or right away if there is none.
+    """
+    work = current_unit_of_work()
+    if work is None:
+        instance.save(update_fields=fields)
+    else:
+        work.update(instance, fields)
+
+
+def create_later(instance):
+    """
+    Inserts instance when the current unit of work is flushed, together
+    with the other pending instances of its model, or right away if there
+    is none. Not every database returns the primary keys of bulk inserts,
+    so it's only meant for rows that no other row will point to.
+    """
+    work = current_unit_of_work()
+    if work is None:
+        instance.save()
+    else:
+        work.create(instance)
@@ -5,6 +5,7 @@ from django.db.models.query_utils import Q
 
 import world.models.npcs
 from battle.models import Order
+from turn.unit_of_work import save_later
 from unit.models import WorldUnit
 
 
@@ -137,6 +138,6 @@ def create_unit(name, owner, location, soldiers, recruitment_type, unit_type):
             30 + 60 * random.random() if recruitment_type == WorldUnit.RAISED else
             None
         )
-        soldier.save()
+        save_later(soldier, 'unit', 'unit_morale')
 
     return unit
@@ -6,7 +6,9 @@ from django.urls import reverse
 from django.utils.html import format_html
 
 import character.models
+import world.models.geography
 from battle.models import BattleUnit
+from identity_map import memoized, get_instance
 from mixins import AdminURLMixin
 
 
@@ -253,11 +255,14 @@ class WorldUnit(models.Model, AdminURLMixin):
         except BattleUnit.DoesNotExist:
             pass
 
+    @memoized('unit_violence_monopoly', depends_on=('unit', 'organization'))
     def get_violence_monopoly(self):
         if self.owner_character:
             return self.owner_character.get_violence_monopoly()
         else:
-            return self.world.get_barbaric_state()
+            return get_instance(
+                world.models.geography.World, self.world_id
+            ).get_barbaric_state()
 
     def disband(self):
         self.demobilize()
@@ -0,0 +1,212 @@
+import math
+import random
+
+from django.db import transaction
+from django.db.models import F
+
+from battle.models import Order
+from context_managers import perf_timer
+from organization.models.organization import Organization
+from unit.models import WorldUnit
+from world.initialization import build_npc, build_soldier
+from world.models.buildings import Building
+from world.models.geography import World, Region, Tile, Settlement
+from world.models.items import InventoryItem
+from world.models.npcs import NPC
+
+BULK_BATCH_SIZE = 5000
+
+TILE_TYPES = (Tile.PLAINS, Tile.PLAINS, Tile.FOREST, Tile.MOUNTAIN)
+
+
+def scaled_world_size(npcs):
+    """
+    Sizes of a generated world with the given population, keeping the
+    proportions of a regular game world.
+    """
+    return {
+        'tiles': max(9, npcs // 2000),
+        'settlements': max(1, npcs // 500),
+        'npcs': npcs,
+        'units': max(1, npcs // 5000),
+        'organizations': max(2, npcs // 50000 + 1),
+    }
+
+
+@transaction.atomic
+def generate_world(name, tiles, settlements, npcs, units, organizations,
+                   unit_size=60, populate=True):
+    """
+    Generates a synthetic world with the given number of tiles,
+    settlements, NPCs living in them, units and states (one of them being
+    the barbaric state). When populate is False NPCs and soldiers are not
+    created and the world is left to be set up by initialize_world.
+    """
+    with perf_timer('Generating world {}'.format(name)):
+        world = World.objects.create(
+            name=name,
+            description="Generated world with {} NPCs".format(npcs)
+        )
+        states = generate_states(world, organizations)
+        generate_tiles(world, tiles, states)
+        generate_settlements(world, settlements, npcs)
+        generate_units(world, units, unit_size)
+
+        if populate:
+            populate_settlements(world)
+            populate_units(world)
+            world.initialized = True
+            world.save()
+
+        return world
+
+
+def generate_states(world, count):
+    states = [Organization.objects.create(
+        world=world,
+        name="Barbarians",
+        color="888888",
+        barbaric=True,
+        description="Barbarians",
+        is_position=False,
+        owner_and_leader_locked=False,
+        violence_monopoly=True,
+        decision_taking=Organization.DISTRIBUTED,
+        membership_type=Organization.CHARACTER
+    )]
+    for i in range(1, count):
+        states.append(Organization.objects.create(
+            world=world,
+            name="State {}".format(i),
+            color="{:06X}".format(random.getrandbits(24)),
+            description="Generated state",
+            is_position=False,
+            owner_and_leader_locked=False,
+            violence_monopoly=True,
+            decision_taking=Organization.DISTRIBUTED,
+            membership_type=Organization.CHARACTER
+        ))
+    return states
+
+
+def generate_tiles(world, count, states):
+    side = math.ceil(math.sqrt(count))
+    regions = [
+        Region.objects.create(world=world, name="Region {}".format(i))
+        for i in range(math.ceil(count / 100))
+    ]
+    Tile.objects.bulk_create(
+        [
+            Tile(
+                name="Tile {}".format(i),
+                world=world,
+                region=regions[i // 100],
+                controlled_by=states[i % len(states)],
+                x_pos=i % side,
+                z_pos=i // side,
+                y_pos=0.1,
+                type=TILE_TYPES[i % len(TILE_TYPES)]
+            )
+            for i in range(count)
+        ],
+        batch_size=BULK_BATCH_SIZE
+    )
+
+
+def generate_settlements(world, count, npcs):
+    tiles = list(world.tile_set.order_by('id'))
+    Settlement.objects.bulk_create(
+        [
+            Settlement(
+                name="Settlement {}".format(i),
+                tile=tiles[i % len(tiles)],
+                population_default=(
+                    npcs // count + (1 if i < npcs % count else 0)
+                ),
+                x_pos=random.randint(0, 31),
+                z_pos=random.randint(0, 31)
+            )
+            for i in range(count)
+        ],
+        batch_size=BULK_BATCH_SIZE
+    )
+
+    settlements = Settlement.objects.filter(tile__world=world)
+    buildings = []
+    for settlement in settlements:
+        population = settlement.population_default
+        buildings += [
+            Building(type=Building.RESIDENCE, level=2,
+                     quantity=max(1, population // 5),
+                     settlement=settlement),
+            Building(type=Building.GRAIN_FIELD, level=2,
+                     quantity=population * 6,
+                     field_production_counter=1500,
+                     settlement=settlement),
+            Building(type=Building.GRANARY, level=2, quantity=1,
+                     settlement=settlement),
+            Building(type=Building.GUILD, level=1, quantity=1,
+                     settlement=settlement),
+        ]
+    Building.objects.bulk_create(buildings, batch_size=BULK_BATCH_SIZE)
+
+    InventoryItem.objects.bulk_create(
+        [
+            InventoryItem(
+                type=InventoryItem.GRAIN,
+                quantity=granary.settlement.population_default * 12,
+                location=granary
+            )
+            for granary in Building.objects.filter(
+                settlement__tile__world=world,
+                type=Building.GRANARY
+            ).select_related('settlement')
+        ],
+        batch_size=BULK_BATCH_SIZE
+    )
+
+
+def generate_units(world, count, unit_size):
+    settlements = list(
+        Settlement.objects.filter(tile__world=world).order_by('id')
+    )
+    for i in range(count):
+        WorldUnit.objects.create(
+            owner_character=None,
+            world=world,
+            location=settlements[i % len(settlements)],
+            name="Unit {}".format(i),
+            recruitment_type=WorldUnit.CONSCRIPTED,
+            type=WorldUnit.TYPE_CHOICES[i % 3][0],
+            status=WorldUnit.STANDING,
+            mobilization_status_since=world.current_turn,
+            current_status_since=world.current_turn,
+            generation_size=unit_size,
+            default_battle_orders=Order.objects.create(what=Order.STAND)
+        )
+
+
+def populate_settlements(world):
+    npcs = []
+    for settlement in Settlement.objects.filter(tile__world=world):
+        residences = list(settlement.building_set.filter(
+            type=Building.RESIDENCE))
+        for i in range(settlement.population_default):
+            npcs.append(build_npc(residences, settlement))
+        if len(npcs) >= BULK_BATCH_SIZE:
+            NPC.objects.bulk_create(npcs)
+            npcs = []
+    NPC.objects.bulk_create(npcs)
+
+    Settlement.objects.filter(tile__world=world).update(
+        population=F('population_default')
+    )
+
+
+def populate_units(world):
+    for unit in world.worldunit_set.select_related('location'):
+        NPC.objects.bulk_create(
+            [build_soldier(i, unit) for i in range(unit.generation_size)],
+            batch_size=BULK_BATCH_SIZE
+        )
+    world.worldunit_set.update(generation_size=0)
@@ -7,7 +7,7 @@ import world.models.buildings
 from context_managers import perf_timer
 from finem_imperii.random import WeightedChoice, weighted_choice
 from name_generator.name_generator import generate_name
-from parallelism import parallel
+from parallelism import parallel, worker_pool
 from world.models.npcs import NPC
 
 
@@ -22,9 +22,14 @@ def initialize_world(world):
             raise AlreadyInitializedException(
                 "World {} already initialized!".format(world))
 
-        parallel(initialize_organization, world.organization_set.all()[:])
-        parallel(initialize_unit, world.worldunit_set.all()[:])
-        parallel(initialize_tile, world.tile_set.all()[:])
+        with worker_pool():
+            parallel(initialize_organization, world.organization_set.all()[:])
+            parallel(
+                initialize_unit,
+                world.worldunit_set.all()[:],
+                weight=lambda unit: unit.generation_size
+            )
+            parallel(initialize_tile, world.tile_set.all()[:])
 
         world.initialized = True
         world.save()
@@ -74,6 +79,12 @@ def initialize_settlement(settlement):
 
 
 def generate_npc(i, residences, settlement):
+    npc = build_npc(residences, settlement)
+    npc.save()
+    return npc
+
+
+def build_npc(residences, settlement):
     male = random.getrandbits(1)
     name = generate_name(male)
     over_sixty = (random.getrandbits(4) == 0)
@@ -87,7 +98,7 @@ def generate_npc(i, residences, settlement):
         WeightedChoice(value=residence, weight=residence.quantity)
         for residence in residences
     ]
-    npc = NPC.objects.create(
+    return NPC(
         name=name,
         male=male,
         able=able,
@@ -101,7 +112,6 @@ def generate_npc(i, residences, settlement):
             4) == 0) if age_months >= world.models.npcs.NPC.VERY_YOUNG_AGE_LIMIT else False,
         skill_fighting=random.randint(0, 80)
     )
-    return npc
 
 
 @transaction.atomic
@@ -109,19 +119,23 @@ def initialize_unit(unit):
     with perf_timer('Initializing unit {} ({})'.format(
             unit, unit.id)):
         for i in range(unit.generation_size):
-            world.models.npcs.NPC.objects.create(
-                name="Soldier {} of {}".format(i, unit),
-                male=random.getrandbits(1),
-                able=True,
-                age_months=20*12,
-                origin=unit.location,
-                residence=None,
-                location=unit.location,
-                workplace=None,
-                unit=unit,
-                trained_soldier=random.getrandbits(4) == 0,
-                skill_fighting=random.randint(0, 80)
-            )
+            build_soldier(i, unit).save()
 
         unit.generation_size = 0
         unit.save()
+
+
+def build_soldier(i, unit):
+    return world.models.npcs.NPC(
+        name="Soldier {} of {}".format(i, unit),
+        male=random.getrandbits(1),
+        able=True,
+        age_months=20*12,
+        origin=unit.location,
+        residence=None,
+        location=unit.location,
+        workplace=None,
+        unit=unit,
+        trained_soldier=random.getrandbits(4) == 0,
+        skill_fighting=random.randint(0, 80)
+    )
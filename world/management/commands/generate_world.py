@@ -0,0 +1,61 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from world.generation import generate_world, scaled_world_size
+from world.models.geography import World
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic world of the given size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name')
+        parser.add_argument('--npcs', type=int, default=10000)
+        parser.add_argument('--tiles', type=int)
+        parser.add_argument('--settlements', type=int)
+        parser.add_argument('--units', type=int)
+        parser.add_argument('--organizations', type=int)
+        parser.add_argument('--unit-size', type=int, default=60)
+        parser.add_argument(
+            '--uninitialized', action='store_true',
+            help="Don't create NPCs and soldiers, leave it to "
+                 "initialize_world"
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger().setLevel(logging.INFO)
+
+        if World.objects.filter(name=options['name']).exists():
+            raise CommandError(
+                'World {} already exists'.format(options['name']))
+
+        size = scaled_world_size(options['npcs'])
+        for key in size.keys():
+            if options.get(key) is not None:
+                size[key] = options[key]
+        if size['tiles'] < 1 or size['settlements'] < 1 or \
+                size['organizations'] < 1:
+            raise CommandError(
+                'A world needs at least one tile, settlement and '
+                'organization')
+
+        world = generate_world(
+            options['name'],
+            unit_size=options['unit_size'],
+            populate=not options['uninitialized'],
+            **size
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Successfully generated {} ({}): {}'.format(
+                    world,
+                    world.id,
+                    ', '.join(
+                        '{} {}'.format(value, key)
+                        for key, value in size.items()
+                    )
+                )
+            )
+        )
@@ -1,35 +1,162 @@
 import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
 
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
+from parallelism import parallelism_enabled
+from turn.models import TurnRun
 from turn.turn import pass_turn
 from world.models.geography import World
 
 
 class Command(BaseCommand):
-    help = 'Passes a turn in the specified world'
+    help = 'Passes a turn in the specified worlds'
 
     def add_arguments(self, parser):
         parser.add_argument('world_id', nargs='+', type=int)
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Number of worlds whose turn is passed at the same time, '
+                 'each one in its own process'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help='Number of worker processes of each world. By default the '
+                 'CPUs are split between the worlds passed at the same time'
+        )
+        parser.add_argument(
+            '--no-summary', action='store_true',
+            help="Don't print the timing summary"
+        )
 
     def handle(self, *args, **options):
         logging.getLogger().setLevel(logging.INFO)
 
+        if options['concurrency'] < 1:
+            raise CommandError('Concurrency has to be at least 1')
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('Workers have to be at least 1')
+
+        worlds = []
         for world_id in options['world_id']:
             try:
-                world = World.objects.get(pk=world_id)
+                worlds.append(World.objects.get(pk=world_id))
             except World.DoesNotExist:
                 raise CommandError('World with id {} does not exist'.format(
                     world_id
                 ))
 
-            pass_turn(world)
+        start_time = time.time()
+        if options['concurrency'] > 1 and len(worlds) > 1 and \
+                parallelism_enabled():
+            workers = options['workers'] or max(
+                1, cpu_count() // options['concurrency'])
+            with ThreadPoolExecutor(
+                    max_workers=options['concurrency']) as executor:
+                results = list(executor.map(
+                    lambda world: self.pass_turn_in_subprocess(
+                        world, workers),
+                    worlds
+                ))
+        else:
+            results = [
+                self.pass_turn_in_process(world, options['workers'])
+                for world in worlds
+            ]
+
+        if not options['no_summary']:
+            self.write_summary(results, time.time() - start_time)
+
+        failed = [world for world, succeeded, _ in results if not succeeded]
+        if failed:
+            raise CommandError('Turn failed in {}'.format(
+                ', '.join('{} ({})'.format(world, world.id)
+                          for world in failed)
+            ))
 
-            self.stdout.write(
-                self.style.SUCCESS(
-                    'Passed turn in {} ({})'.format(
-                        world,
-                        world_id
-                    )
+    def pass_turn_in_process(self, world, workers):
+        start_time = time.time()
+        resuming = TurnRun.objects.filter(
+            world=world,
+            turn=world.current_turn,
+            finished=False
+        ).exists()
+        try:
+            pass_turn(world, workers=workers)
+        except Exception:
+            logging.exception('Turn failed in {} ({})'.format(
+                world, world.id))
+            return world, False, time.time() - start_time
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                '{} turn in {} ({})'.format(
+                    'Resumed and passed' if resuming else 'Passed',
+                    world,
+                    world.id
                 )
             )
+        )
+        return world, True, time.time() - start_time
+
+    def pass_turn_in_subprocess(self, world, workers):
+        start_time = time.time()
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(settings.BASE_DIR, 'manage.py'),
+                'pass_turn',
+                '--no-summary',
+                '--workers', str(workers),
+                str(world.id)
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        # Both pipes are forwarded as the child writes them, so that a
+        # full pipe never stalls the child
+        prefix = '[{}] '.format(world.id)
+        stderr_forwarder = threading.Thread(
+            target=self.forward, args=(process.stderr, self.stderr, prefix))
+        stderr_forwarder.start()
+        self.forward(process.stdout, self.stdout, prefix)
+        stderr_forwarder.join()
+        succeeded = process.wait() == 0
+        if not succeeded:
+            self.stderr.write('Turn failed in {} ({})'.format(
+                world, world.id))
+        return world, succeeded, time.time() - start_time
+
+    @staticmethod
+    def forward(stream, output, prefix):
+        for line in stream:
+            output.write(prefix + line.rstrip('\n'))
+
+    def write_summary(self, results, total_elapsed):
+        name_width = max(
+            len('{} ({})'.format(world, world.id))
+            for world, _, _ in results
+        )
+        self.stdout.write('Turn summary')
+        for world, succeeded, elapsed in results:
+            self.stdout.write('{} {:>8} {:>10.1f} s'.format(
+                '{} ({})'.format(world, world.id).ljust(name_width),
+                'ok' if succeeded else 'FAILED',
+                elapsed
+            ))
+        self.stdout.write('{} {:>8} {:>10.1f} s'.format(
+            'Total'.ljust(name_width),
+            '{}/{}'.format(
+                sum(1 for _, succeeded, _ in results if succeeded),
+                len(results)
+            ),
+            total_elapsed
+        ))
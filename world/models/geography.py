@@ -10,6 +10,7 @@ import organization.models.organization
 import unit.models
 import world.models.buildings
 import world.models.npcs
+from identity_map import memoized, get_instances
 from messaging import shortcuts
 from mixins import AdminURLMixin
 from world.templatetags.extra_filters import turn_to_date
@@ -52,12 +53,13 @@ class World(models.Model, AdminURLMixin):
             template_context=context,
             link=link,
         )
-        for character in self.character_set.all():
-            shortcuts.add_character_recipient(message, character)
+        shortcuts.add_new_message_recipients(
+            message, self.character_set.all())
 
     def get_violence_monopolies(self):
         return self.organization_set.filter(violence_monopoly=True)
 
+    @memoized('barbaric_state')
     def get_barbaric_state(self):
         return organization.models.organization.Organization.objects.get(
             world=self,
@@ -122,6 +124,8 @@ class Tile(models.Model, AdminURLMixin):
     z_pos = models.IntegerField()
     type = models.CharField(max_length=15, choices=TYPE_CHOICES)
 
+    identity_map_depends_on = ('tile', )
+
     def __str__(self):
         return self.name
 
@@ -153,11 +157,20 @@ class Tile(models.Model, AdminURLMixin):
     def get_current_battles(self):
         return self.battle_set.filter(current=True)
 
+    @memoized('tile_population', depends_on=('settlement', ))
     def get_total_population(self):
         return sum(
             settlement.population for settlement in self.settlement_set.all()
         )
 
+    @memoized('tile_settlement_ids')
+    def get_settlement_ids(self):
+        return tuple(
+            self.settlement_set.order_by('id').values_list('id', flat=True))
+
+    def get_settlements(self):
+        return get_instances(Settlement, list(self.get_settlement_ids()))
+
 
 class Settlement(models.Model):
     GUILDS_PROHIBIT = 'prohibit guilds'
@@ -182,6 +195,8 @@ class Settlement(models.Model):
     guilds_setting = models.CharField(
         max_length=20, default=GUILDS_KEEP, choices=GUILDS_CHOICES)
 
+    identity_map_depends_on = ('settlement', )
+
     def make_public_order_in_range(self):
         self.public_order = min(1000, max(self.public_order, 0))
 
@@ -0,0 +1,169 @@
+import numpy as np
+from django.db import connection
+from django.db.models import Count
+
+import unit.models
+from battle.models import BattleSoldierInTurn
+from world.models.geography import Settlement
+from world.models.npcs import NPC
+
+
+def update_in_chunks(model, ids, **values):
+    """
+    Runs model.objects.filter(id__in=ids).update(**values) in chunks small
+    enough for the database's query parameter limit.
+    """
+    chunk_size = (connection.features.max_query_params or 10000) - \
+        len(values) - 1
+    ids = [int(i) for i in ids]
+    for start in range(0, len(ids), chunk_size):
+        model.objects.filter(
+            id__in=ids[start:start + chunk_size]
+        ).update(**values)
+
+
+def settlements_by_tile(world):
+    """
+    Yields the settlements of a world as one queryset per tile, so that
+    worldwide rules only hold the NPCs of one tile in memory at a time.
+    """
+    for tile_id in Settlement.objects.filter(
+            tile__world=world
+    ).order_by('tile_id').values_list('tile_id', flat=True).distinct():
+        yield Settlement.objects.filter(tile_id=tile_id)
+
+
+def index_of(ids, values):
+    """
+    Returns the position of every value in the sorted array ids, and a mask
+    telling which values are actually present in it.
+    """
+    if len(ids) == 0:
+        return np.zeros(len(values), dtype=np.int64), \
+               np.zeros(len(values), dtype=bool)
+    index = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+    return index, ids[index] == values
+
+
+def count_per(ids, values, mask=None):
+    """
+    Counts how many times each of the sorted ids appears in values,
+    optionally only where mask is set.
+    """
+    index, found = index_of(ids, values)
+    if mask is not None:
+        found &= mask
+    return np.bincount(index[found], minlength=len(ids))
+
+
+def random_per_group(groups, quotas, rng):
+    """
+    Picks, for every row, whether it is one of the quota randomly chosen
+    rows of its group. quotas holds the quota of the group of each row.
+    """
+    size = len(groups)
+    order = np.lexsort((rng.random(size), groups))
+    sorted_groups = groups[order]
+    rank = np.arange(size) - np.searchsorted(sorted_groups, sorted_groups)
+    selected = np.zeros(size, dtype=bool)
+    selected[order] = rank < quotas[order]
+    return selected
+
+
+class NPCColumns:
+    """
+    The state of a set of NPCs loaded as NumPy arrays, one element per NPC,
+    so that rules can be applied to all of them at once and the changes
+    written back with a handful of queries. Foreign keys that are NULL are
+    stored as 0.
+    """
+    MUTABLE_FIELDS = ('hunger', 'able', 'wound_status')
+
+    def __init__(self, queryset, rng=None):
+        rows = list(queryset.values_list(
+            'id', 'location_id', 'residence__settlement_id', 'unit_id',
+            'hunger', 'able', 'wound_status'
+        ))
+        columns = list(zip(*rows)) if rows else [()] * 7
+
+        def id_column(values):
+            return np.array(
+                [value or 0 for value in values], dtype=np.int64)
+
+        self.id = id_column(columns[0])
+        self.location = id_column(columns[1])
+        self.residence_settlement = id_column(columns[2])
+        self.unit = id_column(columns[3])
+        self.hunger = np.array(columns[4], dtype=np.int64)
+        self.able = np.array(columns[5], dtype=bool)
+        self.wound_status = np.array(columns[6], dtype=np.int64)
+        self.dead = self.wound_status == BattleSoldierInTurn.DEAD
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        self._loaded = {
+            field: getattr(self, field).copy()
+            for field in self.MUTABLE_FIELDS
+        }
+        self._saved_dead = self.dead.copy()
+        self._died_units = set()
+
+    def __len__(self):
+        return len(self.id)
+
+    def take_hits(self, mask):
+        """
+        Same as calling NPC.take_hit() on every NPC in mask.
+        """
+        hit = mask & (self.wound_status != BattleSoldierInTurn.DEAD)
+        self.wound_status[hit] += 1
+
+        died = hit & (self.wound_status == BattleSoldierInTurn.DEAD)
+        self.dead |= died
+        self._died_units.update(int(i) for i in self.unit[died] if i)
+        self.location[died] = 0
+        self.residence_settlement[died] = 0
+        self.unit[died] = 0
+        self.able[died] = False
+
+        size = len(self)
+        medium = hit & \
+            (self.wound_status == BattleSoldierInTurn.MEDIUM_WOUND) & \
+            (self.rng.integers(0, 8, size) == 0)
+        heavy = hit & \
+            (self.wound_status == BattleSoldierInTurn.HEAVY_WOUND) & \
+            (self.rng.integers(0, 2, size) == 0)
+        self.able[medium | heavy] = False
+
+    def save(self):
+        """
+        Writes back every change, grouping NPCs that end up with the same
+        value in the same UPDATE, and disbands units whose last soldier died.
+        """
+        alive = ~self.dead
+        for field in self.MUTABLE_FIELDS:
+            values = getattr(self, field)
+            changed = alive & (values != self._loaded[field])
+            for value in np.unique(values[changed]):
+                update_in_chunks(
+                    NPC, self.id[changed & (values == value)],
+                    **{field: value.item()}
+                )
+
+        update_in_chunks(
+            NPC, self.id[self.dead & ~self._saved_dead],
+            wound_status=BattleSoldierInTurn.DEAD,
+            location=None,
+            residence=None,
+            unit=None,
+            able=False
+        )
+
+        for empty_unit in unit.models.WorldUnit.objects.filter(
+                id__in=self._died_units
+        ).annotate(soldier_count=Count('soldier')).filter(soldier_count=0):
+            empty_unit.disband()
+
+        for field in self.MUTABLE_FIELDS:
+            self._loaded[field] = getattr(self, field).copy()
+        self._saved_dead = self.dead.copy()
+        self._died_units = set()
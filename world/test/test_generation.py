@@ -0,0 +1,68 @@
+from django.test import TestCase
+
+from turn.turn import pass_turn
+from unit.models import WorldUnit
+from world.generation import generate_world, scaled_world_size
+from world.initialization import initialize_world
+from world.models.buildings import Building
+from world.models.npcs import NPC
+from world.models.geography import Settlement, Tile
+
+
+class TestGeneration(TestCase):
+    def test_generate_world(self):
+        world = generate_world(
+            "Generated", tiles=10, settlements=3, npcs=100, units=2,
+            organizations=3, unit_size=10
+        )
+        self.assertTrue(world.initialized)
+        self.assertEqual(Tile.objects.filter(world=world).count(), 10)
+        self.assertEqual(world.organization_set.count(), 3)
+        self.assertTrue(world.get_barbaric_state().violence_monopoly)
+        settlements = Settlement.objects.filter(tile__world=world)
+        self.assertEqual(settlements.count(), 3)
+        self.assertEqual(
+            sorted(settlement.population for settlement in settlements),
+            [33, 33, 34]
+        )
+        self.assertEqual(
+            NPC.objects.filter(origin__tile__world=world, unit=None).count(),
+            100
+        )
+        self.assertEqual(
+            NPC.objects.filter(unit__world=world).count(), 20
+        )
+        for settlement in settlements:
+            self.assertEqual(
+                settlement.get_default_granary().get_public_bushels_object()
+                .quantity,
+                settlement.population_default * 12
+            )
+
+    def test_generate_uninitialized_world(self):
+        world = generate_world(
+            "Generated", tiles=4, settlements=2, npcs=50, units=1,
+            organizations=2, unit_size=10, populate=False
+        )
+        self.assertFalse(world.initialized)
+        self.assertFalse(NPC.objects.filter(origin__tile__world=world).exists())
+        initialize_world(world)
+        self.assertEqual(
+            NPC.objects.filter(origin__tile__world=world).count(), 60
+        )
+        self.assertEqual(
+            WorldUnit.objects.get(world=world).soldier.count(), 10
+        )
+
+    def test_pass_turn_in_generated_world(self):
+        world = generate_world(
+            "Generated", **scaled_world_size(1000)
+        )
+        pass_turn(world)
+        world.refresh_from_db()
+        self.assertEqual(world.current_turn, 1)
+        self.assertTrue(
+            Building.objects.filter(
+                settlement__tile__world=world, worker__isnull=False
+            ).exists()
+        )
@@ -0,0 +1,73 @@
+import numpy as np
+from django.test import TestCase
+
+from battle.models import BattleSoldierInTurn
+from unit.models import WorldUnit
+from world.initialization import initialize_unit, initialize_settlement
+from world.models.geography import Settlement
+from world.models.npcs import NPC
+from world.npc_columns import NPCColumns, count_per, random_per_group
+
+
+class TestNPCColumns(TestCase):
+    fixtures = ['simple_world']
+
+    def test_random_per_group(self):
+        groups = np.array([1, 2, 1, 2, 1, 3, 0])
+        quotas = np.array([2, 5, 2, 5, 2, 0, 0])
+        selected = random_per_group(groups, quotas, np.random.default_rng())
+        self.assertEqual(selected[groups == 1].sum(), 2)
+        self.assertTrue(selected[groups == 2].all())
+        self.assertFalse(selected[groups == 3].any())
+        self.assertFalse(selected[groups == 0].any())
+
+    def test_count_per(self):
+        counts = count_per(
+            np.array([2, 5, 9]), np.array([5, 5, 0, 9, 7, 5]),
+            np.array([True, True, True, True, True, False])
+        )
+        self.assertEqual(counts.tolist(), [0, 2, 1])
+
+    def test_take_hits_and_save(self):
+        settlement = Settlement.objects.get(name="Small Valley")
+        settlement.population_default = 20
+        initialize_settlement(settlement)
+        settlement.npc_set.update(wound_status=BattleSoldierInTurn.HEAVY_WOUND)
+        npc = settlement.npc_set.first()
+        npc.wound_status = BattleSoldierInTurn.LIGHT_WOUND
+        npc.hunger = 3
+        npc.save()
+
+        npcs = NPCColumns(settlement.npc_set.all())
+        npcs.hunger[npcs.id == npc.id] += 1
+        npcs.take_hits(np.ones(len(npcs), dtype=bool))
+        npcs.save()
+
+        npc.refresh_from_db()
+        self.assertEqual(npc.hunger, 4)
+        self.assertEqual(npc.wound_status, BattleSoldierInTurn.MEDIUM_WOUND)
+        self.assertEqual(
+            NPC.objects.filter(
+                origin=settlement,
+                wound_status=BattleSoldierInTurn.DEAD,
+                location=None,
+                residence=None,
+                able=False
+            ).count(),
+            19
+        )
+        settlement.update_population()
+        self.assertEqual(settlement.population, 1)
+
+    def test_unit_is_disbanded_when_all_soldiers_die(self):
+        unit = WorldUnit.objects.get(id=1)
+        initialize_unit(unit)
+        unit.soldier.update(wound_status=BattleSoldierInTurn.HEAVY_WOUND)
+
+        npcs = NPCColumns(unit.soldier.all())
+        npcs.take_hits(np.ones(len(npcs), dtype=bool))
+        npcs.save()
+
+        unit.refresh_from_db()
+        self.assertIsNone(unit.world)
+        self.assertEqual(unit.soldier.count(), 0)